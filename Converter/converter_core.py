@@ -1,11 +1,873 @@
 import subprocess
 import os
+import sys
+import io
+import json
+import csv
+import time
+import math
+import mmap
+import hashlib
 import shutil # For removing directories
 import tempfile # For creating temporary directories
+import signal
+import atexit
+import threading
+import functools
+import contextlib
+import logging
+import logging.handlers
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import requests # For direct image downloads
 from urllib.parse import urlparse
 
-def download_media_from_url(url, download_base_dir, media_type, progress_callback=None):
+try:
+    from PIL import Image, ImageOps # Optional: faster image thumbnails
+except ImportError:
+    Image = None
+    ImageOps = None
+
+try:
+    import av # Optional: converts small still images in-process (PyAV)
+except ImportError:
+    av = None
+
+# --- Video encoder preset tables ---
+# Each output container is mapped to the video/audio encoder we want ffmpeg to use for it.
+# Containers not listed here (e.g. dv, cavs, rm) have strict codec requirements, so ffmpeg's own defaults are kept.
+VIDEO_CONTAINER_ENCODERS = {
+    'mp4': ('libx264', 'aac'),
+    'm4v': ('libx264', 'aac'),
+    'mov': ('libx264', 'aac'),
+    'mkv': ('libx264', 'aac'),
+    'flv': ('libx264', 'aac'),
+    '3gp': ('libx264', 'aac'),
+    '3g2': ('libx264', 'aac'),
+    '3gpp': ('libx264', 'aac'),
+    'm2ts': ('libx264', 'aac'),
+    'mts': ('libx264', 'aac'),
+    'webm': ('libvpx-vp9', 'libopus'),
+    'ogg': ('libtheora', 'libvorbis'),
+    'avi': ('mpeg4', 'libmp3lame'),
+    'mpeg': ('mpeg2video', 'mp2'),
+    'mpg': ('mpeg2video', 'mp2'),
+}
+
+# Speed tiers exposed to callers: 'fast' favours encode time, 'small' favours output size.
+VIDEO_SPEED_TIERS = ('fast', 'balanced', 'small')
+
+# Quality level -> rate control options for each encoder (each encoder has its own quality scale).
+VIDEO_ENCODER_QUALITY = {
+    'libx264': {
+        'high': ['-crf', '18'],
+        'medium': ['-crf', '23'],
+        'low': ['-crf', '28'],
+    },
+    'libvpx-vp9': {
+        # -b:v 0 switches libvpx-vp9 to constant quality mode so -crf is honoured
+        'high': ['-crf', '24', '-b:v', '0'],
+        'medium': ['-crf', '31', '-b:v', '0'],
+        'low': ['-crf', '37', '-b:v', '0'],
+    },
+    'libtheora': {
+        'high': ['-q:v', '8'],
+        'medium': ['-q:v', '6'],
+        'low': ['-q:v', '4'],
+    },
+    'mpeg4': {
+        'high': ['-q:v', '2'],
+        'medium': ['-q:v', '4'],
+        'low': ['-q:v', '8'],
+    },
+    'mpeg2video': {
+        'high': ['-q:v', '2'],
+        'medium': ['-q:v', '4'],
+        'low': ['-q:v', '8'],
+    },
+}
+
+# Speed tier -> encoder specific speed knobs. '{threads}' is filled in with the thread budget for the job.
+VIDEO_ENCODER_SPEED_TIERS = {
+    'libx264': {
+        'fast': ['-preset', 'veryfast'],
+        'balanced': ['-preset', 'medium'],
+        'small': ['-preset', 'slow'],
+    },
+    'libvpx-vp9': {
+        # row-mt and tile columns let libvpx spread one frame over several cores;
+        # -deadline good with a higher -cpu-used trades a little size for a lot of speed.
+        'fast': ['-deadline', 'good', '-cpu-used', '5', '-row-mt', '1', '-tile-columns', '2', '-threads', '{threads}'],
+        'balanced': ['-deadline', 'good', '-cpu-used', '3', '-row-mt', '1', '-tile-columns', '2', '-threads', '{threads}'],
+        'small': ['-deadline', 'good', '-cpu-used', '1', '-row-mt', '1', '-tile-columns', '1', '-threads', '{threads}'],
+    },
+    'libtheora': {
+        'fast': [],
+        'balanced': [],
+        'small': [],
+    },
+    'mpeg4': {
+        'fast': [],
+        'balanced': ['-mbd', 'rd'],
+        'small': ['-mbd', 'rd', '-trellis', '1'],
+    },
+    'mpeg2video': {
+        'fast': [],
+        'balanced': ['-mbd', 'rd'],
+        'small': ['-mbd', 'rd', '-trellis', '1'],
+    },
+}
+
+# video_quality_preset -> (bounding box, quality level, default speed tier).
+# The default tiers keep the x264 behaviour these presets always had (e.g. best_crf used -preset veryfast).
+VIDEO_QUALITY_PRESETS = {
+    '1080p': ((1920, 1080), 'medium', 'balanced'),
+    '720p': ((1280, 720), 'medium', 'balanced'),
+    '480p': ((854, 480), 'medium', 'balanced'),  # Standard 16:9 480p
+    'best_crf': (None, 'high', 'fast'),  # Visually lossless, fast encode
+    'medium_crf': (None, 'medium', 'balanced'),  # Good quality, reasonable speed
+    'low_crf': (None, 'low', 'small'),  # Smaller file, slower encode, more compression
+}
+
+# --- Image encoder preset tables ---
+IMAGE_SPEED_TIERS = ('fast', 'balanced', 'small')
+
+# Image output format -> (encoder, {speed tier: encoder options}).
+# The figures in the notes are from benchmark_image_tiers() on one 720x477 photo at default
+# quality (ffmpeg 7.0, one core), so they only show the direction and rough size of each
+# tradeoff; run it on your own material before relying on them.
+IMAGE_FORMAT_TIERS = {
+    # libwebp -compression_level is the encoder "method" (0-6). Measured: fast 0.03s/77 KiB,
+    # balanced 0.06s/65 KiB, small 0.14s/63 KiB.
+    'webp': ('libwebp', {
+        'fast': ['-compression_level', '0'],
+        'balanced': ['-compression_level', '4'],
+        'small': ['-compression_level', '6'],
+    }),
+    # libaom spends almost all of its time in the search controlled by -cpu-used; row-mt keeps all
+    # cores busy. Its default 'good' usage clamps cpu-used to 6 (8 gave the same file), so 6 is the
+    # fastest setting. Measured: fast 0.67s/40.9 KiB, balanced 1.16s/40.8 KiB, small 1.89s/40.4 KiB.
+    'avif': ('libaom-av1', {
+        'fast': ['-cpu-used', '6', '-row-mt', '1', '-still-picture', '1'],
+        'balanced': ['-cpu-used', '5', '-row-mt', '1', '-still-picture', '1'],
+        'small': ['-cpu-used', '4', '-row-mt', '1', '-still-picture', '1'],
+    }),
+    # zlib level and row prediction. Level 1 without prediction is the cheapest encode and level 9
+    # with mixed prediction the slowest. Measured: fast 0.06s/853 KiB, balanced 0.11s/641 KiB, small 0.17s/640 KiB.
+    'png': ('png', {
+        'fast': ['-compression_level', '1', '-pred', 'none'],
+        'balanced': ['-compression_level', '6', '-pred', 'paeth'],
+        'small': ['-compression_level', '9', '-pred', 'mixed'],
+    }),
+    # ffmpeg's mjpeg encoder has no progressive mode; optimal Huffman tables and 4:2:0 chroma
+    # are its size optimizations. Measured: all tiers 0.02s; fast 74 KiB, balanced 72 KiB, small 62 KiB.
+    'jpg': ('mjpeg', {
+        'fast': ['-huffman', 'default'],
+        'balanced': ['-huffman', 'optimal'],
+        'small': ['-huffman', 'optimal', '-pix_fmt', 'yuvj420p'],
+    }),
+    # PackBits is the cheapest, LZW the widely compatible middle ground, Deflate the smallest and slowest.
+    # Measured: fast 0.02s/677 KiB, balanced 0.03s/666 KiB, small 0.05s/519 KiB.
+    'tiff': ('tiff', {
+        'fast': ['-compression_algo', 'packbits'],
+        'balanced': ['-compression_algo', 'lzw'],
+        'small': ['-compression_algo', 'deflate'],
+    }),
+}
+IMAGE_FORMAT_TIERS['jpeg'] = IMAGE_FORMAT_TIERS['jpg']
+
+# Output formats that are still images. Everything else is encoded as video and needs even frame dimensions.
+IMAGE_OUTPUT_FORMATS = ('png', 'jpg', 'jpeg', 'webp', 'gif', 'bmp', 'ico', 'tiff', 'psd', 'eps', 'avif', 'icns')
+
+# --- Audio tables ---
+# Output container -> source audio codecs it can take as a stream copy, without re-encoding
+AUDIO_COPY_COMPATIBLE = {
+    'mp3': ('mp3',),
+    'aac': ('aac',),
+    'm4a': ('aac', 'alac'),
+    'm4b': ('aac', 'alac'),
+    'flac': ('flac',),
+    'ogg': ('vorbis', 'opus', 'flac'),
+    'oga': ('vorbis', 'opus', 'flac'),
+    'weba': ('opus', 'vorbis'),
+    'wav': ('pcm_s16le', 'pcm_s24le', 'pcm_s32le', 'pcm_f32le', 'pcm_u8'),
+    'aif': ('pcm_s16be', 'pcm_s24be', 'pcm_s32be'),
+    'aiff': ('pcm_s16be', 'pcm_s24be', 'pcm_s32be'),
+    'aifc': ('pcm_s16be', 'pcm_s24be', 'pcm_s32be'),
+    'caf': ('aac', 'alac', 'mp3', 'opus', 'flac', 'pcm_s16le', 'pcm_s24le', 'pcm_s16be', 'pcm_s24be'),
+    'ac3': ('ac3',),
+    'amr': ('amr_nb',),
+    'wma': ('wmav1', 'wmav2'),
+}
+
+# Output formats whose file extension ffmpeg can't map to a muxer on its own
+FORMAT_MUXERS = {
+    'weba': 'webm',
+}
+
+# --- Batch grouping ---
+BATCH_GROUP_SIZE = 16 # Files per ffmpeg process; a failed group costs at most this many retries
+BATCH_SMALL_FILE_BYTES = 8 * 1024 * 1024 # Only files up to this size are grouped
+BATCH_MAX_COMMAND_CHARS = 30000 # Stay under the Windows command line limit (32767)
+DEDUP_PARTIAL_BYTES = 64 * 1024 # Same-size inputs compare a hash of their first and last bytes before a full hash
+
+# convert_media options that are handled before the ffmpeg command is built (build_ffmpeg_job_args doesn't take them)
+CONVERT_ONLY_OPTIONS = ('start_time', 'end_time', 'duration', 'gif_fps', 'gif_dither', 'gif_max_colors',
+                        'memory_limit', 'overwrite', 'scratch_dir', 'usage', 'log_level', 'log_file', 'resumable',
+                        'target_size')
+
+# swscale algorithms accepted by plan_video_filters(scaler=...). fast_bilinear is meant for drafts and previews.
+SCALER_FLAGS = ('fast_bilinear', 'bilinear', 'bicubic', 'lanczos', 'area', 'neighbor')
+
+# Filters that drop frames. The planner runs them before everything else so later filters see fewer frames.
+FRAME_REDUCING_FILTERS = ('fps', 'select', 'framestep')
+
+# --- GIF ---
+GIF_DITHER_MODES = ('sierra2_4a', 'floyd_steinberg', 'bayer', 'none')
+GIF_PALETTE_ANALYSIS_BOX = (320, 320) # Palettes are built from a small copy, so one palette fits every output size
+GIF_PALETTE_CACHE_MAX_FILES = 500 # Cached palettes (a few KB each) kept; the least recently used go first
+
+# --- Thumbnails ---
+THUMBNAIL_CACHE_MAX_FILES = 5000 # The least recently used thumbnails are deleted beyond this many...
+THUMBNAIL_CACHE_MAX_BYTES = 100 * 1024 * 1024 # ...or this much disk space
+
+# --- Large images ---
+LARGE_IMAGE_PIXELS = 50_000_000 # From this size on, JPEG sources are decoded at reduced resolution when the output is smaller
+LARGE_IMAGE_FILE_BYTES = 8 * 1024 * 1024 # Smaller files are converted without a size check unless a memory limit is set
+IMAGE_MEMORY_OVERHEAD_BYTES = 64 * 1024 * 1024 # ffmpeg itself, codec contexts and scaler line buffers
+LOWRES_CODECS = ('mjpeg',) # Decoders that can scale by 1/2, 1/4 or 1/8 while decoding (-lowres)
+
+# Approximate decoded size of one pixel per ffmpeg pixel format. Unknown formats count as 8 bytes.
+PIXEL_FORMAT_BYTES = {
+    'monob': 1, 'monow': 1, 'gray': 1, 'pal8': 1,
+    'yuv420p': 1.5, 'yuvj420p': 1.5, 'nv12': 1.5,
+    'yuv422p': 2, 'yuvj422p': 2, 'ya8': 2, 'gray16be': 2, 'gray16le': 2,
+    'yuv444p': 3, 'yuvj444p': 3, 'rgb24': 3, 'bgr24': 3, 'gbrp': 3,
+    'rgba': 4, 'bgra': 4, 'argb': 4, 'abgr': 4, 'rgb0': 4, 'bgr0': 4, 'gbrap': 4, 'ya16be': 4, 'ya16le': 4,
+    'rgb48be': 6, 'rgb48le': 6, 'gbrp16be': 6, 'gbrp16le': 6,
+    'rgba64be': 8, 'rgba64le': 8, 'gbrap16be': 8, 'gbrap16le': 8,
+}
+
+# --- Child processes and scheduling ---
+CHILD_NICENESS = 10 # ffmpeg/ffprobe/yt-dlp run this much nicer than the app (below normal on Windows); 0 keeps normal priority
+CHILD_IONICE = ('-c', '2', '-n', '7') # Linux: lowest best-effort I/O priority
+SCHEDULER_MEMORY_FRACTION = 0.75 # Share of the available memory the scheduler hands out to jobs
+VIDEO_MIN_THREADS = 4 # Concurrent video encodes get at least this many threads each (x264/VP9 scale well up to here)
+VIDEO_BUFFERED_FRAMES = 64 # Frames an encoder holds in flight (lookahead, reference and threading buffers)
+JOB_MEMORY_OVERHEAD_BYTES = 64 * 1024 * 1024 # ffmpeg itself, codec contexts and I/O buffers
+VIDEO_TIER_COST = {'fast': 1, 'balanced': 2, 'small': 4} # Relative encode cost per pixel and second
+
+# --- Child output ---
+FFMPEG_LOGLEVEL = 'error' # ffmpeg -loglevel unless a job asks for more (e.g. 'info' or 'verbose')
+FFMPEG_STATS_LOGLEVELS = ('info', 'verbose', 'debug', 'trace') # Job log levels that keep ffmpeg's frame=... progress lines
+LOG_TAIL_LINES = 200 # Lines kept per output stream of a child; error messages quote these
+LOG_MAX_LINE_CHARS = 4096 # Longer lines are split, so one runaway line can't grow the buffer
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024 # Job log files rotate at this size...
+LOG_FILE_BACKUPS = 3 # ...keeping this many old files
+
+# --- Resumable encodes ---
+RESUMABLE_SEGMENT_SECONDS = 300 # Video is encoded in pieces of this length; a crash loses at most one piece
+
+# --- Target size encodes ---
+TARGET_SIZE_SAMPLES = 3 # Samples encoded to measure the audio and container overhead at the planned bitrate
+TARGET_SIZE_SAMPLE_SECONDS = 4.0
+TARGET_SIZE_TOLERANCE = 0.05 # A result this far off the target (either way) gets one corrected encode
+TARGET_SIZE_MAXRATE_FACTOR = 1.5 # Peaks may go this far above the average bitrate...
+TARGET_SIZE_BUFFER_SECONDS = 2.0 # ...within a rate control buffer holding this many seconds at the average bitrate
+TARGET_SIZE_MIN_VIDEO_BITRATE = 50_000 # bits/s; smaller targets are refused rather than encoded into mush
+
+# --- Folder conversion ---
+# Input extensions per mode; folder conversion picks up only these files
+INPUT_EXTENSIONS = {
+    'image': ('png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'ico', 'tiff', 'psd', 'eps', 'avif', 'icns'),
+    'video': ('mp4', 'mov', 'avi', 'mkv', 'webm', '3gp', '3g2', '3gpp', 'cavs', 'dv', 'dvr', 'flv', 'm2ts', 'm4v',
+              'mpeg', 'mpg', 'mts', 'mxf', 'ogg', 'rm', 'rmvb'),
+    'audio': ('mp3', 'wav', 'aac', 'flac', 'ogg', 'aif', 'aiff', 'aifc', 'amr', 'au', 'caf', 'dss', 'm4a', 'm4b',
+              'oga', 'voc', 'weba', 'wma', 'ac3'),
+}
+# Output formats per mode that ffmpeg can write. psd, eps, icns, 3gpp, dvr, rmvb and dss have no muxer, so they are input-only.
+OUTPUT_FORMATS = {
+    'image': ('png', 'jpg', 'jpeg', 'webp', 'gif', 'bmp', 'ico', 'tiff', 'avif'),
+    'video': ('mp4', 'mov', 'avi', 'mkv', 'webm', '3gp', '3g2', 'cavs', 'dv', 'flv', 'm2ts', 'm4v', 'mpeg', 'mpg',
+              'mts', 'mxf', 'ogg', 'rm'),
+    'audio': ('mp3', 'wav', 'aac', 'flac', 'ogg', 'aif', 'aiff', 'aifc', 'amr', 'au', 'caf', 'm4a', 'm4b', 'oga',
+              'voc', 'weba', 'wma', 'ac3'),
+}
+SYNC_MANIFEST_NAME = '.mediaconverter-sync.json' # Kept in the output root; records what each output was made from
+SYNC_CHUNK_JOBS = 500 # Jobs per scheduler run; the manifest is saved after each, so an interrupted sync loses little
+# Options that don't change the output file, so changing them doesn't make outputs stale
+FINGERPRINT_IGNORED_OPTIONS = ('memory_limit', 'overwrite', 'scratch_dir', 'threads', 'usage', 'log_level', 'log_file',
+                               'resumable')
+
+# --- URL lists ---
+URL_LIST_MAX_DOWNLOADS = 6 # Concurrent downloads over all hosts
+URL_LIST_PER_HOST = 2 # Concurrent downloads from one host; more tends to get throttled or blocked
+
+# --- In-process backend (PyAV) ---
+INPROCESS_MAX_BYTES = 4 * 1024 * 1024 # Still images up to this size skip the ffmpeg process when PyAV is installed; 0 turns this off
+INPROCESS_FRAME_RATE = 25 # ffmpeg's default rate for image inputs, used as the encoder's time base
+FF_QP2LAMBDA = 118 # ffmpeg turns -q:v into global_quality = q * FF_QP2LAMBDA
+# Encoder options of the image tables, passed to the PyAV encoder by name
+INPROCESS_ENCODER_OPTIONS = {option for _, tiers in IMAGE_FORMAT_TIERS.values() for tier in tiers.values()
+                             for option in tier[::2] if option != '-pix_fmt'} | {'-crf'}
+
+# --- Playlists ---
+PLAYLIST_CONCURRENT_FRAGMENTS = 4 # HLS/DASH fragments yt-dlp fetches at once per item
+PLAYLIST_ARCHIVE_NAME = '.mediaconverter-archive.txt' # Converted entries, in yt-dlp's --download-archive format
+PLAYLIST_ENTRY_MARKER = 'mediaconverter-entry' # Marks the entry lines printed by list_playlist_entries
+
+# --- Download bandwidth ---
+DOWNLOAD_BURST_SECONDS = 0.5 # A limited bucket holds this many seconds of traffic, so bursts stay short
+DOWNLOAD_LIMIT_MAX_SLEEP = 0.25 # Waiting downloads re-check the limit this often, so a changed limit applies quickly
+
+# --- Priority lanes ---
+JOB_PRIORITIES = ('interactive', 'bulk') # See job_priority(); jobs outside both lanes are never held or paused
+PREEMPTED_PROGRAMS = ('ffmpeg',) # Bulk children that are paused while interactive jobs run (downloads and probes keep going)
+
+
+@functools.lru_cache(maxsize=None)
+def _which(program):
+    """
+    Cached shutil.which(), so priority wrappers aren't looked up for every child.
+    """
+    return shutil.which(program)
+
+
+def _child_command(command):
+    """
+    Sets ffmpeg's log level (unless the command sets one) and wraps the command in ionice/nice
+    (where available) so the child runs at lower CPU and I/O priority.
+
+    ffmpeg prints its frame=... progress lines whatever the log level, so they are turned off
+    with -nostats unless the job asked for a verbose log; otherwise they would push the
+    actual error out of the kept tail.
+    """
+    if command[0] == 'ffmpeg':
+        log_level = getattr(_job_local, 'log_level', None) or FFMPEG_LOGLEVEL
+        global_options = []
+        if '-v' not in command and '-loglevel' not in command:
+            global_options.extend(['-loglevel', log_level])
+        if log_level not in FFMPEG_STATS_LOGLEVELS and '-stats' not in command and '-nostats' not in command:
+            global_options.append('-nostats')
+        command = [command[0]] + global_options + command[1:]
+    session = getattr(_job_local, 'session', None)
+    if session is not None:
+        # A Converter session resolved the executables once
+        command = [session.executables.get(command[0]) or command[0]] + command[1:]
+    if os.name == 'nt' or not CHILD_NICENESS:
+        return command
+    if _which(command[0]) is None:
+        # Report the real program as missing, not the wrapper's exit code
+        raise FileNotFoundError(f"'{command[0]}' not found")
+    prefix = []
+    if _which('ionice'):
+        prefix.extend(['ionice', *CHILD_IONICE])
+    if _which('nice'):
+        prefix.extend(['nice', '-n', str(CHILD_NICENESS)])
+    return prefix + command
+
+
+# Per-thread state of the job being run: its usage records, log file, ffmpeg log level and Converter session
+_job_local = threading.local()
+
+
+@contextlib.contextmanager
+def _collect_child_usage():
+    """
+    Collects the usage records of every child started on this thread inside the block.
+    Records still count towards an enclosing collector (e.g. a benchmark around convert_media).
+    """
+    outer = getattr(_job_local, 'records', None)
+    records = []
+    _job_local.records = records
+    try:
+        yield records
+    finally:
+        _job_local.records = outer
+        if outer is not None:
+            outer.extend(records)
+
+
+@contextlib.contextmanager
+def _job_logging(log_file=None, log_level=None):
+    """
+    Sends the output of every child started on this thread inside the block to a rotating
+    log file (if given) and runs ffmpeg at log_level (if given).
+    """
+    outer = (getattr(_job_local, 'log', None), getattr(_job_local, 'log_level', None))
+    handler = None
+    if log_file:
+        log_directory = os.path.dirname(os.path.abspath(log_file))
+        os.makedirs(log_directory, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_FILE_MAX_BYTES,
+                                                       backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        _job_local.log = handler
+    if log_level:
+        _job_local.log_level = log_level
+    try:
+        yield
+    finally:
+        _job_local.log, _job_local.log_level = outer
+        if handler:
+            handler.close()
+
+
+def _log_line(handler, text):
+    """
+    Writes one line to a job's log file handler.
+    """
+    handler.handle(logging.makeLogRecord({'msg': text, 'levelno': logging.INFO, 'levelname': 'INFO'}))
+
+
+def _read_proc_io(pid):
+    """
+    Returns the bytes a process read and wrote (rchar/wchar, page cache hits included) from /proc, or None.
+    """
+    try:
+        with open(f'/proc/{pid}/io', encoding='ascii') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(fields['rchar']), int(fields['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _wait_child(process):
+    """
+    Waits for a child and returns (returncode, usage). On POSIX the usage includes CPU time and
+    peak memory from wait4(), and on Linux the I/O counters, read before the child is reaped.
+    """
+    usage = {}
+    if not hasattr(os, 'wait4'):
+        return process.wait(), usage
+
+    if hasattr(os, 'waitid'):
+        try:
+            # Wait for the exit without reaping, so /proc/<pid>/io is still there
+            os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            io_counters = _read_proc_io(process.pid)
+            if io_counters:
+                usage['read_bytes'], usage['write_bytes'] = io_counters
+        except OSError:
+            pass
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        return process.wait(), usage
+    process.returncode = os.waitstatus_to_exitcode(status)
+    usage['user_seconds'] = rusage.ru_utime
+    usage['system_seconds'] = rusage.ru_stime
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    usage['peak_rss_bytes'] = rusage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    return process.returncode, usage
+
+
+def _pause_child(process):
+    """
+    Stops a child until _resume_child(). Windows can't stop a process, so it is dropped to idle priority instead.
+    """
+    if process.returncode is not None:
+        return # Already reaped; its PID may belong to another process by now
+    try:
+        if os.name == 'nt':
+            import ctypes
+            ctypes.windll.kernel32.SetPriorityClass(int(process._handle), subprocess.IDLE_PRIORITY_CLASS)
+        else:
+            os.kill(process.pid, signal.SIGSTOP)
+    except (OSError, AttributeError):
+        pass # Already exited
+
+
+def _resume_child(process):
+    """
+    Undoes _pause_child().
+    """
+    if process.returncode is not None:
+        return
+    try:
+        if os.name == 'nt':
+            import ctypes
+            priority_class = subprocess.BELOW_NORMAL_PRIORITY_CLASS if CHILD_NICENESS else subprocess.NORMAL_PRIORITY_CLASS
+            ctypes.windll.kernel32.SetPriorityClass(int(process._handle), priority_class)
+        else:
+            os.kill(process.pid, signal.SIGCONT)
+    except (OSError, AttributeError):
+        pass
+
+
+class PriorityLanes:
+    """
+    Lets interactive conversions run ahead of bulk work in the same process.
+
+    While any interactive job runs, bulk ffmpeg children (PREEMPTED_PROGRAMS) are paused with
+    SIGSTOP (on Windows: dropped to idle priority) and new ones wait before they start, so a
+    one-off conversion gets the cores to itself. When the last interactive job ends, the paused
+    children continue with SIGCONT and the waiting ones start. A thread's own interactive lane
+    never holds back its bulk children. Jobs choose their lane with job_priority(); the
+    module-level priority_lanes is the one _run_child uses.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._interactive = 0
+        self._bulk_children = set()
+        self._local = threading.local() # Interactive lanes held by the current thread
+
+    @property
+    def interactive_jobs(self):
+        """The number of interactive jobs running."""
+        return self._interactive
+
+    @contextlib.contextmanager
+    def interactive(self):
+        """
+        Counts an interactive job as running for the duration of the block.
+        """
+        with self._condition:
+            self._interactive += 1
+            self._local.depth = getattr(self._local, 'depth', 0) + 1
+            if self._interactive == 1:
+                for process in self._bulk_children:
+                    _pause_child(process)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._interactive -= 1
+                self._local.depth -= 1
+                if not self._interactive:
+                    for process in self._bulk_children:
+                        _resume_child(process)
+                    self._condition.notify_all()
+
+    def start_bulk(self, start):
+        """
+        Starts a bulk child once no interactive job of another thread is running.
+
+        Args:
+            start (callable): Starts the child and returns its Popen object.
+
+        Returns:
+            subprocess.Popen: The child. Call finish_bulk() once it has exited.
+        """
+        with self._condition:
+            while self._interactive > getattr(self._local, 'depth', 0):
+                self._condition.wait()
+            process = start()
+            self._bulk_children.add(process)
+        return process
+
+    def finish_bulk(self, process):
+        """
+        Stops tracking a bulk child that has exited.
+        """
+        with self._condition:
+            self._bulk_children.discard(process)
+
+    def resume_all(self):
+        """
+        Continues every paused child, e.g. before the app exits, so none is left stopped.
+        """
+        with self._condition:
+            for process in self._bulk_children:
+                _resume_child(process)
+            self._bulk_children.clear()
+            self._interactive = 0
+            self._condition.notify_all()
+
+
+priority_lanes = PriorityLanes()
+atexit.register(priority_lanes.resume_all)
+
+
+@contextlib.contextmanager
+def job_priority(priority):
+    """
+    Runs the conversions started on this thread inside the block in a priority lane.
+
+    'interactive' jobs (e.g. a single conversion the user is waiting for) pause bulk work while
+    they run; 'bulk' jobs (folders, URL lists, playlists) give way to them. Worker threads started
+    by ConversionScheduler, convert_url_list and Converter.submit inherit the lane.
+
+    Args:
+        priority (str): One of JOB_PRIORITIES, or None to leave the lane unchanged.
+    """
+    if priority is not None and priority not in JOB_PRIORITIES:
+        raise ValueError(f"Unknown job priority '{priority}'. Expected one of: {', '.join(JOB_PRIORITIES)}")
+    outer = getattr(_job_local, 'priority', None)
+    _job_local.priority = priority or outer
+    try:
+        if priority == 'interactive':
+            with priority_lanes.interactive():
+                yield
+        else:
+            yield
+    finally:
+        _job_local.priority = outer
+
+
+def _run_child(command, capture_stdout=False, line_callback=None):
+    """
+    Runs an ffmpeg/ffprobe/yt-dlp child at lower priority, keeps the tail of its output and records its resource use.
+
+    Behaves like subprocess.run(command, check=True, capture_output=True, text=True), except that
+    only the last LOG_TAIL_LINES lines of each stream are kept in memory: stdout and stderr of the
+    result (and of the CalledProcessError raised on a non-zero exit) are those tails. Every line
+    also goes to the job's log file, if one is set (see convert_media's log_file). Raises
+    FileNotFoundError if the program isn't installed. The usage record ('program', 'wall_seconds',
+    and where the platform reports them 'user_seconds', 'system_seconds', 'peak_rss_bytes',
+    'read_bytes', 'write_bytes') goes to the job collecting usage on this thread, if any.
+
+    Args:
+        command (list): The command to run.
+        capture_stdout (bool): Keep all of stdout (for ffprobe's JSON). Use only for bounded output.
+        line_callback (callable, optional): Called with every output line as it arrives, so
+            callers can pick out what they need instead of buffering everything.
+    """
+    options = {}
+    if os.name == 'nt' and CHILD_NICENESS:
+        options['creationflags'] = subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    child_command = _child_command(command)
+    bulk = getattr(_job_local, 'priority', None) == 'bulk' and command[0] in PREEMPTED_PROGRAMS
+    start = functools.partial(subprocess.Popen, child_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              text=True, **options)
+    # Bulk encodes wait for interactive jobs and are paused while one runs (see PriorityLanes)
+    process = priority_lanes.start_bulk(start) if bulk else start()
+    started = time.perf_counter()
+
+    # Drain both pipes while waiting, so a chatty child can't block on a full pipe
+    tails = {'stdout': deque(maxlen=LOG_TAIL_LINES), 'stderr': deque(maxlen=LOG_TAIL_LINES)}
+    captured = []
+    log = getattr(_job_local, 'log', None)
+    if log:
+        _log_line(log, f"$ {' '.join(command)}")
+
+    def drain(name, stream):
+        for chunk in iter(lambda: stream.readline(LOG_MAX_LINE_CHARS), ''):
+            if capture_stdout and name == 'stdout':
+                captured.append(chunk)
+            line = chunk.rstrip('\n')
+            tails[name].append(line)
+            if log:
+                _log_line(log, f"[{command[0]}] {line}")
+            if line_callback:
+                line_callback(line)
+
+    readers = [threading.Thread(target=drain, args=(name, stream), daemon=True)
+               for name, stream in (('stdout', process.stdout), ('stderr', process.stderr))]
+    for reader in readers:
+        reader.start()
+    try:
+        returncode, usage = _wait_child(process)
+    finally:
+        if bulk:
+            priority_lanes.finish_bulk(process)
+    for reader in readers:
+        reader.join()
+    process.stdout.close()
+    process.stderr.close()
+    stdout = ''.join(captured) if capture_stdout else '\n'.join(tails['stdout'])
+    stderr = '\n'.join(tails['stderr'])
+
+    usage['program'] = command[0]
+    usage['wall_seconds'] = time.perf_counter() - started
+    records = getattr(_job_local, 'records', None)
+    if records is not None:
+        records.append(usage)
+
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, command, stdout, stderr)
+    return subprocess.CompletedProcess(command, returncode, stdout, stderr)
+
+
+def summarize_usage(records, wall_seconds=None):
+    """
+    Sums up the usage records of one job's children.
+
+    Args:
+        records (list): Usage records from _run_child.
+        wall_seconds (float, optional): Wall time of the whole job. Defaults to the sum of the children's.
+
+    Returns:
+        dict: 'children', 'wall_seconds', 'user_seconds', 'system_seconds', 'read_bytes' and
+            'write_bytes' (sums) and 'peak_rss_bytes' (the largest child's).
+    """
+    usage = {
+        'children': len(records),
+        'wall_seconds': wall_seconds if wall_seconds is not None else sum(r['wall_seconds'] for r in records),
+    }
+    for key in ('user_seconds', 'system_seconds', 'read_bytes', 'write_bytes'):
+        usage[key] = sum(r.get(key, 0) for r in records)
+    usage['peak_rss_bytes'] = max((r.get('peak_rss_bytes', 0) for r in records), default=0)
+    return usage
+
+
+def format_usage(usage):
+    """
+    Returns a one-line description of a job's usage, e.g. for the status bar.
+    """
+    cpu_seconds = usage.get('user_seconds', 0) + usage.get('system_seconds', 0)
+    return (f"{usage.get('wall_seconds', 0):.1f}s, CPU {cpu_seconds:.1f}s, "
+            f"peak {usage.get('peak_rss_bytes', 0) / 2 ** 20:.0f} MiB, "
+            f"read {usage.get('read_bytes', 0) / 2 ** 20:.1f} MiB, wrote {usage.get('write_bytes', 0) / 2 ** 20:.1f} MiB")
+
+
+class ResourceReport:
+    """
+    Collects the usage of many jobs and sums it up per output format and preset/tier, to size
+    worker pools and spot settings that are too expensive. Safe to use from several threads.
+    """
+
+    def __init__(self):
+        self.jobs = []
+        self._lock = threading.Lock()
+
+    def add(self, input_path, output_format, options, usage):
+        """
+        Records one job's usage (from convert_media(usage=...)).
+        """
+        key = '/'.join([output_format.lower()] + [str(options[name]) for name in
+                       ('video_quality_preset', 'video_speed_tier', 'image_speed_tier') if options.get(name)])
+        with self._lock:
+            self.jobs.append({'input_path': input_path, 'key': key, **usage})
+
+    def summary(self):
+        """
+        Returns a dict of format/preset key -> 'jobs', the usage sums, 'peak_rss_bytes' (largest job)
+        and 'cpu_seconds_per_job'.
+        """
+        totals = {}
+        with self._lock:
+            jobs = list(self.jobs)
+        for job in jobs:
+            total = totals.setdefault(job['key'], {'jobs': 0, 'wall_seconds': 0.0, 'user_seconds': 0.0, 'system_seconds': 0.0,
+                                                   'read_bytes': 0, 'write_bytes': 0, 'peak_rss_bytes': 0})
+            total['jobs'] += 1
+            for name in ('wall_seconds', 'user_seconds', 'system_seconds', 'read_bytes', 'write_bytes'):
+                total[name] += job.get(name, 0)
+            total['peak_rss_bytes'] = max(total['peak_rss_bytes'], job.get('peak_rss_bytes', 0))
+        for total in totals.values():
+            total['cpu_seconds_per_job'] = (total['user_seconds'] + total['system_seconds']) / total['jobs']
+        return totals
+
+    def format_summary(self):
+        """
+        Returns the summary as text, most CPU-hungry settings first.
+        """
+        lines = []
+        for key, total in sorted(self.summary().items(), key=lambda item: item[1]['cpu_seconds_per_job'], reverse=True):
+            lines.append(f"{key}: {total['jobs']} job(s), {total['cpu_seconds_per_job']:.1f}s CPU per job, "
+                         f"{total['wall_seconds']:.1f}s wall in total, peak {total['peak_rss_bytes'] / 2 ** 20:.0f} MiB")
+        return '\n'.join(lines)
+
+
+class BandwidthLimiter:
+    """
+    A token bucket that limits the combined throughput of the downloads using it.
+
+    Downloads call consume() with each chunk they receive and are held back while the bucket is
+    in debt. The rate can be changed at any time with set_rate(), also while downloads run.
+    yt-dlp runs in its own process and can't draw from the bucket, so it gets a fixed
+    --limit-rate when it starts: its share of the rate among the downloads running at that time
+    (see share()).
+    """
+
+    def __init__(self, rate=None):
+        """
+        Args:
+            rate (float, optional): Bytes per second. None or 0 means unlimited.
+        """
+        self._lock = threading.Lock()
+        self._rate = None
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._streams = 0
+        self.set_rate(rate)
+
+    @property
+    def rate(self):
+        """The current limit in bytes per second, or None when unlimited."""
+        return self._rate
+
+    def set_rate(self, rate):
+        """
+        Changes the limit. Downloads that are waiting pick up the new rate within DOWNLOAD_LIMIT_MAX_SLEEP.
+
+        Args:
+            rate (float): Bytes per second. None or 0 means unlimited.
+        """
+        with self._lock:
+            self._refill()
+            self._rate = float(rate) if rate else None
+            if self._rate is None:
+                self._tokens = 0.0
+            else:
+                self._tokens = min(self._tokens, self._rate * DOWNLOAD_BURST_SECONDS)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self._rate is not None:
+            self._tokens = min(self._rate * DOWNLOAD_BURST_SECONDS, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def consume(self, amount):
+        """
+        Takes amount bytes from the bucket, waiting until the bucket is out of debt.
+        """
+        with self._lock:
+            if self._rate is None:
+                return
+            self._refill()
+            self._tokens -= amount
+        while True:
+            with self._lock:
+                if self._rate is None:
+                    return
+                self._refill()
+                if self._tokens >= 0:
+                    return
+                wait = min(-self._tokens / self._rate, DOWNLOAD_LIMIT_MAX_SLEEP)
+            time.sleep(wait)
+
+    @contextlib.contextmanager
+    def stream(self):
+        """
+        Counts a download as running for the duration of the block, for share().
+        """
+        with self._lock:
+            self._streams += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._streams -= 1
+
+    def share(self):
+        """
+        Returns one running download's share of the rate in bytes per second, or None when unlimited.
+        """
+        with self._lock:
+            if self._rate is None:
+                return None
+            return self._rate / max(1, self._streams)
+
+
+# Shared by every download of the process; see set_download_limit
+download_limiter = BandwidthLimiter()
+
+
+def set_download_limit(bytes_per_second):
+    """
+    Limits the combined bandwidth of all downloads. Takes effect immediately, also for running downloads.
+
+    Args:
+        bytes_per_second (float): The limit. None or 0 removes it.
+    """
+    download_limiter.set_rate(bytes_per_second)
+
+
+def download_media_from_url(url, download_base_dir, media_type, progress_callback=None, usage=None, log_file=None,
+                            rate_limit=None, concurrent_fragments=None):
     """
     Downloads media from a URL using yt-dlp or requests (for direct images).
     Downloads into a type-specific subfolder within the base download directory.
@@ -15,10 +877,27 @@ def download_media_from_url(url, download_base_dir, media_type, progress_callbac
         download_base_dir (str): The base directory where the media will be downloaded (e.g., temp dir).
         media_type (str): The type of media ('image', 'video', 'audio') to create a subfolder.
         progress_callback (callable, optional): A function to call with progress updates.
+        usage (dict, optional): Filled in with the download's resource use (see summarize_usage).
+        log_file (str, optional): Rotating log file that receives yt-dlp's full output.
+        rate_limit (float, optional): Limit for this download in bytes per second. The shared
+            download_limiter (set_download_limit) applies on top of it.
+        concurrent_fragments (int, optional): HLS/DASH fragments yt-dlp downloads at once.
 
     Returns:
         tuple: (bool, str) - True for success, False for failure, and the path to the downloaded file.
     """
+    started = time.perf_counter()
+    with _collect_child_usage() as records, _job_logging(log_file), download_limiter.stream():
+        result = _download_media(url, download_base_dir, media_type, progress_callback, rate_limit, concurrent_fragments)
+    if usage is not None:
+        usage.update(summarize_usage(records, time.perf_counter() - started))
+    return result
+
+
+def _download_media(url, download_base_dir, media_type, progress_callback, rate_limit=None, concurrent_fragments=None):
+    """
+    Downloads media from a URL. See download_media_from_url.
+    """
     # Create type-specific subfolder within the base download directory
     download_dir = os.path.join(download_base_dir, media_type)
     if not os.path.isdir(download_dir):
@@ -38,20 +917,23 @@ def download_media_from_url(url, download_base_dir, media_type, progress_callbac
         # It looks like a direct image link without complex redirect parameters
         if progress_callback:
             progress_callback(f"Attempting direct image download for: {url}...")
-        return _download_direct_image(url, download_dir, progress_callback)
+        return _download_direct_image(url, download_dir, progress_callback, rate_limit)
     else:
         # Assume it needs yt-dlp for video, audio, or complex image URLs (like from hosting sites)
         if progress_callback:
             progress_callback(f"Attempting yt-dlp download for: {url}...")
-        return _download_via_yt_dlp(url, download_dir, media_type, progress_callback)
+        return _download_via_yt_dlp(url, download_dir, media_type, progress_callback, rate_limit, concurrent_fragments)
 
 
-def _download_direct_image(url, download_dir, progress_callback):
+def _download_direct_image(url, download_dir, progress_callback, rate_limit=None):
     """
-    Downloads an image directly using the requests library.
+    Downloads an image directly using the requests library, within the shared and the per-download bandwidth limits.
     """
+    job_limiter = BandwidthLimiter(rate_limit)
     try:
-        response = requests.get(url, stream=True, timeout=10)
+        session = getattr(_job_local, 'session', None)
+        http = session.http if session is not None else requests # A Converter session reuses its connections
+        response = http.get(url, stream=True, timeout=10)
         response.raise_for_status() # Raise an exception for HTTP errors
 
         # Infer filename from URL or use a generic one
@@ -83,6 +965,8 @@ def _download_direct_image(url, download_dir, progress_callback):
             for chunk in response.iter_content(chunk_size=8192):
                 if not chunk:
                     continue
+                job_limiter.consume(len(chunk))
+                download_limiter.consume(len(chunk))
                 f.write(chunk)
                 downloaded_size += len(chunk)
                 if progress_callback:
@@ -109,7 +993,7 @@ def _download_direct_image(url, download_dir, progress_callback):
     except Exception as e:
         return False, f"Error downloading image from {url}: {e}"
 
-def _download_via_yt_dlp(url, download_dir, media_type, progress_callback):
+def _download_via_yt_dlp(url, download_dir, media_type, progress_callback, rate_limit=None, concurrent_fragments=None):
     """
     Downloads media using yt-dlp.
     """
@@ -138,16 +1022,29 @@ def _download_via_yt_dlp(url, download_dir, media_type, progress_callback):
         # For images, yt-dlp generally works for direct image links or image-hosting pages it recognizes.
         command.extend(['--format', 'best']) # Try to get the best available format
 
+    # yt-dlp can't share the token bucket, so it gets the smaller of its share and the per-download limit
+    limits = [limit for limit in (download_limiter.share(), rate_limit) if limit]
+    if limits:
+        command.extend(['--limit-rate', str(max(1, int(min(limits))))])
+    if concurrent_fragments and concurrent_fragments > 1:
+        command.extend(['--concurrent-fragments', str(concurrent_fragments)])
+
     try:
         if progress_callback:
             progress_callback(f"Attempting to download from URL: {url} using yt-dlp...")
 
-        process = subprocess.run(command, check=True, capture_output=True, text=True)
+        # Only the lines naming the output are needed, so pick them out while yt-dlp runs
+        destination_lines = []
+        def remember_destination(line):
+            if "Destination:" in line or "Writing video to:" in line:
+                destination_lines.append(line)
+
+        process = _run_child(command, line_callback=remember_destination)
 
         downloaded_file_path = None
         # Parse yt-dlp output to find the downloaded file path
         # Look for lines indicating "Destination:" or "Writing video to:"
-        for line in process.stdout.splitlines() + process.stderr.splitlines():
+        for line in destination_lines:
             if "Destination:" in line:
                 downloaded_file_path = line.split("Destination:")[1].strip()
                 break
@@ -183,8 +1080,8 @@ def _download_via_yt_dlp(url, download_dir, media_type, progress_callback):
     except subprocess.CalledProcessError as e:
         error_msg = (
             f"Error during download: yt-dlp exited with code {e.returncode}.\n"
-            f"yt-dlp stdout:\n{e.stdout}\n"
-            f"yt-dlp stderr:\n{e.stderr}\n"
+            f"yt-dlp stdout (last lines):\n{e.stdout}\n"
+            f"yt-dlp stderr (last lines):\n{e.stderr}\n"
             "Please check the URL and ensure yt-dlp is installed and accessible."
         )
         return False, error_msg
@@ -194,120 +1091,2894 @@ def _download_via_yt_dlp(url, download_dir, media_type, progress_callback):
         return False, f"An unexpected error occurred during download: {e}"
 
 
-def convert_media(input_path, output_directory, output_format, progress_callback=None,
-                  image_quality=None, scale_width=None, scale_height=None, scale_percentage=None,
-                  video_quality_preset=None):
+def _ffmpeg_min(terms):
     """
-    Core function to convert a media file using ffmpeg, with optional image/video adjustments.
+    Nests ffmpeg's two-argument min() over a list of expressions.
+    """
+    expression = terms[-1]
+    for term in reversed(terms[:-1]):
+        expression = f"min({term},{expression})"
+    return expression
+
+
+def plan_video_filters(output_format, scale_width=None, scale_height=None, scale_percentage=None,
+                       bounding_box=None, scaler=None, extra_filters=None, extra_scale=None):
+    """
+    Plans the -vf filter chain for a conversion.
+
+    All scaling requests (the user's rescale and a preset's bounding box) are merged into one
+    scale filter that keeps the aspect ratio. The bounding box only caps the size, so small
+    inputs are never upscaled just to fill a preset. Video outputs get even dimensions so the
+    encoder doesn't reject the frame after a full decode. Frame dropping filters (fps, select)
+    run first, then the scale, so the remaining filters work on as few frames and pixels as
+    possible. Only a scale_percentage above 100 is known to be an upscale and goes after the
+    other filters instead: the input size isn't known here, so a scale_width or scale_height
+    is always treated as a downscale, even when it turns out to be larger than the input.
 
     Args:
-        input_path (str): The absolute or relative path to the input media file.
-        output_directory (str): The directory where the converted file will be saved.
-                                This directory must exist.
-        output_format (str): The desired output format (e.g., 'mp4', 'png', 'mp3', 'gif').
-        progress_callback (callable, optional): A function to call with progress updates.
-        image_quality (int, optional): Quality for image output (1-100). Applies to JPG, WEBP.
+        output_format (str): The output format. Image formats may keep odd dimensions.
         scale_width (int, optional): Desired output width in pixels.
         scale_height (int, optional): Desired output height in pixels.
         scale_percentage (float, optional): Scale factor as a percentage (e.g., 50.0 for 50%).
-        video_quality_preset (str, optional): Preset for video quality (e.g., '1080p', '720p', '480p', 'best_crf', 'medium_crf').
+        bounding_box (tuple, optional): (width, height) the output must fit in, e.g. from a quality preset.
+        scaler (str, optional): swscale algorithm, one of SCALER_FLAGS.
+        extra_filters (list, optional): Other filters to apply. Exact duplicates are dropped.
+        extra_scale (float, optional): Factor applied on top of everything else (e.g. 0.5 for draft previews).
 
     Returns:
-        tuple: (bool, str) - True for success, False for failure, and a message.
+        list: Filter strings in the order they should be applied.
     """
-    # Ensure the output directory exists. If not, create it.
-    if not os.path.isdir(output_directory):
-        try:
-            os.makedirs(output_directory)
-            if progress_callback:
-                progress_callback(f"Created output directory: {output_directory}")
-        except OSError as e:
-            return False, f"Error creating output directory '{output_directory}': {e}"
+    if scaler is not None and scaler not in SCALER_FLAGS:
+        raise ValueError(f"Unknown scaler '{scaler}'. Expected one of: {', '.join(SCALER_FLAGS)}")
 
-    # Extract the base name of the input file without its extension
-    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    even = output_format.lower() not in IMAGE_OUTPUT_FORMATS
+    scale_filter = None
+    upscale = False
 
-    # Construct the full path for the output file
-    final_output_path = os.path.join(output_directory, f"{base_name}.{output_format}")
+    if scale_width is not None and scale_height is not None:
+        # Both dimensions are known up front, so fit them in the bounding box right here
+        width, height = scale_width, scale_height
+        if bounding_box:
+            factor = min(1, bounding_box[0] / width, bounding_box[1] / height)
+            width, height = width * factor, height * factor
+        if extra_scale:
+            width, height = width * extra_scale, height * extra_scale
+        if even:
+            width, height = max(2, int(width) // 2 * 2), max(2, int(height) // 2 * 2)
+        scale_filter = f"scale={int(width)}:{int(height)}"
+    else:
+        # One scale factor for both axes keeps the aspect ratio
+        terms = []
+        if scale_percentage is not None:
+            if scale_percentage != 100:
+                terms.append(str(scale_percentage / 100))
+                upscale = scale_percentage > 100 and not bounding_box
+        elif scale_width is not None:
+            terms.append(f"{scale_width}/iw")
+        elif scale_height is not None:
+            terms.append(f"{scale_height}/ih")
+        if bounding_box:
+            terms.extend([f"{bounding_box[0]}/iw", f"{bounding_box[1]}/ih", "1"])
+        factors = [_ffmpeg_min(terms)] if terms else []
+        if extra_scale:
+            factors.append(str(extra_scale))
+        if factors:
+            factor = '*'.join(factors)
+            if even:
+                scale_filter = f"scale=w='trunc(iw*{factor}/2)*2':h='trunc(ih*{factor}/2)*2'"
+            else:
+                scale_filter = f"scale=w='trunc(iw*{factor})':h='trunc(ih*{factor})'"
 
-    # Start building the ffmpeg command
-    command = ['ffmpeg', '-i', input_path]
+    if scale_filter and scaler:
+        scale_filter += f":flags={scaler}"
 
-    # --- Add image/video specific options ---
-    filter_complex = []
-    output_options = []
+    frame_filters = []
+    filters = []
+    for extra_filter in extra_filters or []:
+        if extra_filter in frame_filters or extra_filter in filters:
+            continue
+        if extra_filter.split('=')[0] in FRAME_REDUCING_FILTERS:
+            frame_filters.append(extra_filter)
+        else:
+            filters.append(extra_filter)
+    if scale_filter:
+        if upscale:
+            filters.append(scale_filter)
+        else:
+            filters.insert(0, scale_filter)
+    return frame_filters + filters
 
-    # Scaling/Rescaling
-    if scale_percentage is not None:
-        # Scale by percentage. FFmpeg uses "scale=iw*percent/100:ih*percent/100"
-        filter_complex.append(f"scale=iw*{scale_percentage/100}:ih*{scale_percentage/100}")
-    elif scale_width is not None or scale_height is not None:
-        # Scale by pixels. Use -1 for auto-scaling the other dimension
-        width_arg = str(scale_width) if scale_width is not None else "-1"
-        height_arg = str(scale_height) if scale_height is not None else "-1"
-        filter_complex.append(f"scale={width_arg}:{height_arg}")
-
-    # Image Quality (for formats that support it, like JPG, WEBP)
-    if image_quality is not None and output_format.lower() in ['jpg', 'jpeg', 'webp']:
-        # For JPG, -q:v (or -qscale:v) sets quality (2-31, lower is better, 2 is best).
-        # For WEBP, -q:v sets quality (0-100, higher is better).
-        # We'll map 1-100 to appropriate FFmpeg values.
-        if output_format.lower() in ['jpg', 'jpeg']:
+
+def _encoder_available(encoder):
+    """
+    Returns False if the active Converter session knows ffmpeg lacks the encoder (e.g. an LGPL build
+    without libx264). Without a session every encoder is assumed to be there.
+    """
+    session = getattr(_job_local, 'session', None)
+    return session is None or session.has_encoder(encoder)
+
+
+def _default_thread_count():
+    """
+    Returns the number of encoder threads to use for a single job.
+    """
+    return os.cpu_count() or 1
+
+
+def _video_bitrate_options(bitrate):
+    """
+    Returns the rate control options for an average video bitrate, with peaks capped by maxrate/bufsize.
+    """
+    bitrate = int(bitrate)
+    return ['-b:v', str(bitrate), '-maxrate', str(int(bitrate * TARGET_SIZE_MAXRATE_FACTOR)),
+            '-bufsize', str(int(bitrate * TARGET_SIZE_BUFFER_SECONDS))]
+
+
+def build_video_encoder_options(output_format, quality='medium', speed_tier='balanced', threads=None, bitrate=None):
+    """
+    Builds the encoder options for a video output container from the preset tables.
+
+    Args:
+        output_format (str): The output container (e.g., 'mp4', 'webm').
+        quality (str): Quality level ('high', 'medium', 'low').
+        speed_tier (str): Speed tier ('fast', 'balanced', 'small').
+        threads (int, optional): Thread budget for the encoder. Defaults to all cores.
+        bitrate (int, optional): Average video bitrate in bits/s. Replaces the quality level's
+            constant quality options (see convert_media's target_size).
+
+    Returns:
+        list: ffmpeg output options. Empty if the container has no encoder mapping and no bitrate is given.
+    """
+    encoders = VIDEO_CONTAINER_ENCODERS.get(output_format.lower())
+    if encoders is None:
+        return _video_bitrate_options(bitrate) if bitrate else []
+    if speed_tier not in VIDEO_SPEED_TIERS:
+        raise ValueError(f"Unknown speed tier '{speed_tier}'. Expected one of: {', '.join(VIDEO_SPEED_TIERS)}")
+
+    video_encoder, audio_encoder = encoders
+    tier_options = VIDEO_ENCODER_SPEED_TIERS[video_encoder][speed_tier]
+
+    options = []
+    if _encoder_available(video_encoder):
+        options.extend(['-c:v', video_encoder])
+        if not bitrate:
+            options.extend(VIDEO_ENCODER_QUALITY[video_encoder][quality])
+        options.extend(arg.format(threads=threads or _default_thread_count()) for arg in tier_options)
+    else:
+        tier_options = [] # ffmpeg picks its default encoder for the container
+    if bitrate:
+        options.extend(_video_bitrate_options(bitrate))
+    if threads and not any('{threads}' in arg for arg in tier_options):
+        # Encoders that pick their own thread count (e.g. x264) only get a limit when a budget is given
+        options.extend(['-threads', str(threads)])
+    if _encoder_available(audio_encoder):
+        options.extend(['-c:a', audio_encoder])
+    return options
+
+
+def build_image_encoder_options(output_format, image_quality=None, speed_tier='balanced'):
+    """
+    Builds the encoder options for an image output format from the image preset tables.
+
+    Args:
+        output_format (str): The output image format (e.g., 'webp', 'avif', 'png').
+        image_quality (int, optional): Quality (1-100). Applies to JPG, WEBP and AVIF.
+        speed_tier (str): Speed tier ('fast', 'balanced', 'small').
+
+    Returns:
+        list: ffmpeg output options.
+    """
+    if speed_tier not in IMAGE_SPEED_TIERS:
+        raise ValueError(f"Unknown speed tier '{speed_tier}'. Expected one of: {', '.join(IMAGE_SPEED_TIERS)}")
+
+    output_format = output_format.lower()
+    options = []
+    if output_format in IMAGE_FORMAT_TIERS and _encoder_available(IMAGE_FORMAT_TIERS[output_format][0]):
+        encoder, tiers = IMAGE_FORMAT_TIERS[output_format]
+        options.extend(['-c:v', encoder])
+        options.extend(tiers[speed_tier])
+
+    # Image Quality (for formats that support it, like JPG, WEBP, AVIF)
+    # For JPG, -q:v (or -qscale:v) sets quality (2-31, lower is better, 2 is best).
+    # For WEBP, -q:v sets quality (0-100, higher is better).
+    # For AVIF, -crf sets quality (0-63, lower is better).
+    # We'll map 1-100 to appropriate FFmpeg values.
+    if image_quality is not None:
+        if output_format in ['jpg', 'jpeg']:
             # Invert quality for JPG: 100 (best) -> 2 (FFmpeg), 1 (worst) -> 31 (FFmpeg)
             ffmpeg_quality = 2 + ((100 - image_quality) / 100) * 29
-            output_options.extend(['-q:v', str(int(ffmpeg_quality))])
-        elif output_format.lower() == 'webp':
-            output_options.extend(['-q:v', str(image_quality)])
-
-    # Video Quality Presets
-    if video_quality_preset:
-        if video_quality_preset == '1080p':
-            filter_complex.append("scale=1920:1080")
-            output_options.extend(['-crf', '23', '-preset', 'medium']) # Good balance
-        elif video_quality_preset == '720p':
-            filter_complex.append("scale=1280:720")
-            output_options.extend(['-crf', '23', '-preset', 'medium'])
-        elif video_quality_preset == '480p':
-            filter_complex.append("scale=854:480") # Standard 16:9 480p
-            output_options.extend(['-crf', '23', '-preset', 'medium'])
-        elif video_quality_preset == 'best_crf':
-            output_options.extend(['-crf', '18', '-preset', 'veryfast']) # Visually lossless, fast encode
-        elif video_quality_preset == 'medium_crf':
-            output_options.extend(['-crf', '23', '-preset', 'medium']) # Good quality, reasonable speed
-        elif video_quality_preset == 'low_crf':
-            output_options.extend(['-crf', '28', '-preset', 'slow']) # Smaller file, slower encode, more compression
+            options.extend(['-q:v', str(int(ffmpeg_quality))])
+        elif output_format == 'webp':
+            options.extend(['-q:v', str(image_quality)])
+        elif output_format == 'avif':
+            # 100 (best) -> 8, 1 (worst) -> 63
+            options.extend(['-crf', str(int(8 + ((100 - image_quality) / 99) * 55))])
+    return options
 
-    # Apply filter_complex if any filters were added
-    if filter_complex:
-        command.extend(['-vf', ','.join(filter_complex)])
 
-    # Add other output options
-    command.extend(output_options)
+def benchmark_image_tiers(input_path, output_directory, output_formats=None, image_quality=None, progress_callback=None):
+    """
+    Encodes an image with every speed tier of each format and reports time and size.
 
-    # Finally, add the output file path
-    command.append(final_output_path)
+    Args:
+        input_path (str): The image to encode.
+        output_directory (str): Directory for the benchmark outputs (one subfolder per tier).
+        output_formats (list, optional): Formats to benchmark. Defaults to all formats with tiers.
+        image_quality (int, optional): Quality (1-100) used for every encode.
+        progress_callback (callable, optional): A function to call with progress updates.
 
-    try:
-        if progress_callback:
-            progress_callback(f"Attempting to convert '{input_path}' to '{final_output_path}'...")
-            progress_callback(f"FFmpeg command: {' '.join(command)}") # For debugging
+    Returns:
+        list: One dict per encode with 'format', 'tier', 'success', 'seconds' and 'bytes'.
+    """
+    if output_formats is None:
+        output_formats = ['webp', 'avif', 'png', 'jpg', 'tiff']
 
-        process = subprocess.run(command, check=True, capture_output=True, text=True)
+    results = []
+    for output_format in output_formats:
+        for tier in IMAGE_SPEED_TIERS:
+            tier_directory = os.path.join(output_directory, f"{output_format}_{tier}")
+            started = time.perf_counter()
+            success, message = convert_media(input_path, tier_directory, output_format,
+                                             image_quality=image_quality, image_speed_tier=tier, overwrite=True)
+            elapsed = time.perf_counter() - started
+            size = os.path.getsize(message) if success else None
+            results.append({'format': output_format, 'tier': tier, 'success': success, 'seconds': elapsed, 'bytes': size})
+            if progress_callback:
+                if success:
+                    progress_callback(f"{output_format}/{tier}: {elapsed:.2f}s, {size / 1024:.1f} KiB")
+                else:
+                    progress_callback(f"{output_format}/{tier}: failed - {message}")
+    return results
 
-        if progress_callback:
-            progress_callback("Conversion successful!")
-        return True, final_output_path
 
-    except subprocess.CalledProcessError as e:
-        error_msg = (
-            f"Error during conversion: FFmpeg exited with code {e.returncode}.\n"
-            f"FFmpeg stdout:\n{e.stdout}\n"
-            f"FFmpeg stderr:\n{e.stderr}\n"
-            "Please check the input file, output format, and FFmpeg's error messages."
-        )
-        return False, error_msg
-    except FileNotFoundError:
+def build_ffmpeg_job_args(input_path, output_path, output_format,
+                          image_quality=None, scale_width=None, scale_height=None, scale_percentage=None,
+                          video_quality_preset=None, video_speed_tier=None, image_speed_tier=None, scaler=None,
+                          audio_only=False, copy_audio=False,
+                          input_options=None, extra_output_options=None, extra_scale=None, input_index=None, threads=None,
+                          video_bitrate=None):
+    """
+    Builds the input and output arguments of one conversion job. Several jobs can share one
+    ffmpeg process by concatenating their input arguments and then their output arguments.
+
+    Args:
+        input_path (str): The input media file.
+        output_path (str): The file ffmpeg should write.
+        output_format (str): The desired output format (e.g., 'mp4', 'png', 'mp3', 'gif').
+        audio_only (bool): Map only the first audio stream and drop video, subtitle and data streams.
+        copy_audio (bool): Stream copy the audio instead of re-encoding it (audio_only jobs).
+        input_options (list, optional): Options placed before '-i' (e.g., input seeking).
+        extra_output_options (list, optional): Options placed after the encoder options (e.g., '-t').
+        extra_scale (float, optional): Extra downscale factor on top of the requested size (draft previews).
+        input_index (int, optional): Index of this job's input in a shared ffmpeg process.
+            When given, the output maps its streams from that input explicitly.
+        threads (int, optional): Thread budget for the decoder and video encoder. Defaults to all cores.
+        video_bitrate (int, optional): Average video bitrate in bits/s instead of the preset's constant quality.
+        See convert_media for the remaining arguments.
+
+    Returns:
+        tuple: (list, list) - The input arguments (ending with '-i input_path') and the output arguments.
+
+    Raises:
+        ValueError: If a preset, speed tier or scaler is unknown.
+    """
+    input_args = list(input_options or [])
+    if threads:
+        input_args.extend(['-threads', str(threads)]) # Decoder threads; the encoder's come from the tier tables
+    input_args.extend(['-i', input_path])
+    stream_input = input_index if input_index is not None else 0
+
+    # --- Add image/video specific options ---
+    output_args = []
+    output_options = []
+    bounding_box = None
+
+    # Image encoder, speed tier and quality
+    if image_quality is not None or image_speed_tier is not None:
+        output_options.extend(build_image_encoder_options(output_format, image_quality, image_speed_tier or 'balanced'))
+
+    # Video Quality Presets and encoder speed tiers
+    if video_quality_preset or video_speed_tier or video_bitrate:
+        if video_quality_preset and video_quality_preset not in VIDEO_QUALITY_PRESETS:
+            raise ValueError(f"Unknown video quality preset '{video_quality_preset}'.")
+        bounding_box, quality, default_tier = VIDEO_QUALITY_PRESETS.get(video_quality_preset, (None, 'medium', 'balanced'))
+        output_options.extend(build_video_encoder_options(output_format, quality, video_speed_tier or default_tier, threads,
+                                                          video_bitrate))
+
+    # Scaling/Rescaling: the rescale inputs and the preset's size are merged into a single scale filter
+    filter_complex = plan_video_filters(output_format, scale_width, scale_height, scale_percentage,
+                                        bounding_box=bounding_box, scaler=scaler, extra_scale=extra_scale)
+
+    # Apply filter_complex if any filters were added
+    if filter_complex:
+        output_args.extend(['-vf', ','.join(filter_complex)])
+
+    # Audio mode: only the audio is mapped, so ffmpeg never decodes video or cover art
+    if audio_only:
+        output_options.extend(['-map', f"{stream_input}:a:0", '-vn', '-sn', '-dn'])
+        if copy_audio:
+            output_options.extend(['-c:a', 'copy'])
+    elif input_index is not None:
+        # In a shared process ffmpeg would otherwise pick streams from any input
+        if output_format.lower() in IMAGE_OUTPUT_FORMATS:
+            output_options.extend(['-map', f"{stream_input}:v:0"])
+        else:
+            output_options.extend(['-map', f"{stream_input}:v:0?", '-map', f"{stream_input}:a:0?"])
+
+    if output_format.lower() in FORMAT_MUXERS:
+        output_options.extend(['-f', FORMAT_MUXERS[output_format.lower()]])
+
+    # Add other output options
+    output_args.extend(output_options)
+    output_args.extend(extra_output_options or [])
+
+    # Finally, add the output file path
+    output_args.append(output_path)
+    return input_args, output_args
+
+
+def build_ffmpeg_command(input_path, output_path, output_format, **options):
+    """
+    Builds the ffmpeg command for a conversion. Shared by convert_media and preview_conversion
+    so that previews are encoded exactly like the real job.
+
+    Args:
+        input_path (str): The input media file.
+        output_path (str): The file ffmpeg should write.
+        output_format (str): The desired output format (e.g., 'mp4', 'png', 'mp3', 'gif').
+        **options: See build_ffmpeg_job_args.
+
+    Returns:
+        list: The ffmpeg command.
+
+    Raises:
+        ValueError: If a preset, speed tier or scaler is unknown.
+    """
+    input_args, output_args = build_ffmpeg_job_args(input_path, output_path, output_format, **options)
+    # -nostdin: never wait on an interactive prompt (e.g. "overwrite?") in a background job
+    return ['ffmpeg', '-nostdin'] + input_args + output_args
+
+
+def make_scratch_dir(prefix, scratch_dir=None):
+    """
+    Creates a private temporary directory for intermediates (preview samples, clip segments, downloads).
+
+    Args:
+        prefix (str): Prefix of the directory name.
+        scratch_dir (str, optional): Where to create it, e.g. a tmpfs mount for small intermediates.
+            Defaults to the system temp directory.
+
+    Returns:
+        str: The path of the new directory. The caller removes it.
+    """
+    if scratch_dir:
+        os.makedirs(scratch_dir, exist_ok=True)
+    return tempfile.mkdtemp(prefix=prefix, dir=scratch_dir or None)
+
+
+def output_part_path(final_path):
+    """
+    Returns a unique hidden '.part' path next to final_path. The extension is kept so ffmpeg still picks the right muxer.
+    """
+    directory, file_name = os.path.split(final_path)
+    base_name, extension = os.path.splitext(file_name)
+    return os.path.join(directory, f".{base_name}.{os.getpid()}-{os.urandom(4).hex()}.part{extension}")
+
+
+def publish_output(part_path, final_path, overwrite=False):
+    """
+    Renames a finished '.part' file to its final name in one step, so readers never see a half-written output.
+
+    Without overwrite, an existing file is kept and the output gets the first free name
+    ('name (1).ext', 'name (2).ext', ...). A hard link claims the name atomically, so two
+    jobs finishing at once can't take the same name.
+
+    Returns:
+        str: The path the output was published under.
+    """
+    if overwrite:
+        os.replace(part_path, final_path)
+        return final_path
+
+    base_name, extension = os.path.splitext(final_path)
+    candidate = final_path
+    number = 0
+    while True:
+        try:
+            os.link(part_path, candidate)
+            os.remove(part_path)
+            return candidate
+        except FileExistsError:
+            pass
+        except OSError:
+            # No hard links on this filesystem (e.g. FAT): rename if the name is still free
+            if not os.path.exists(candidate):
+                os.replace(part_path, candidate)
+                return candidate
+        number += 1
+        candidate = f"{base_name} ({number}){extension}"
+
+
+def convert_media(input_path, output_directory, output_format, progress_callback=None,
+                  image_quality=None, scale_width=None, scale_height=None, scale_percentage=None,
+                  video_quality_preset=None, video_speed_tier=None, image_speed_tier=None, scaler=None,
+                  start_time=None, end_time=None, duration=None, audio_only=False,
+                  gif_fps=None, gif_dither=None, gif_max_colors=None, memory_limit=None,
+                  overwrite=False, scratch_dir=None, threads=None, usage=None, log_level=None, log_file=None,
+                  resumable=False, target_size=None):
+    """
+    Core function to convert a media file using ffmpeg, with optional image/video adjustments.
+
+    Args:
+        input_path (str): The absolute or relative path to the input media file.
+        output_directory (str): The directory where the converted file will be saved.
+                                This directory must exist.
+        output_format (str): The desired output format (e.g., 'mp4', 'png', 'mp3', 'gif').
+        progress_callback (callable, optional): A function to call with progress updates.
+        image_quality (int, optional): Quality for image output (1-100). Applies to JPG, WEBP, AVIF.
+        scale_width (int, optional): Desired output width in pixels.
+        scale_height (int, optional): Desired output height in pixels.
+        scale_percentage (float, optional): Scale factor as a percentage (e.g., 50.0 for 50%).
+        video_quality_preset (str, optional): Preset for video quality (e.g., '1080p', '720p', '480p', 'best_crf', 'medium_crf').
+        video_speed_tier (str, optional): Encoder speed tier ('fast', 'balanced', 'small'). Overrides the preset's default tier.
+        image_speed_tier (str, optional): Image encoder speed tier ('fast', 'balanced', 'small').
+        scaler (str, optional): swscale algorithm for rescaling (e.g., 'fast_bilinear' for drafts).
+        start_time (float, optional): Clip start in seconds. Input-side seeking is used, so the skipped part isn't decoded.
+        end_time (float, optional): Clip end in seconds.
+        duration (float, optional): Clip length in seconds (alternative to end_time).
+            A clip into the input's own container with no other adjustments is cut without re-encoding
+            (only the partial GOPs at the edges are re-encoded if the cut points aren't keyframes).
+        audio_only (bool): Audio mode. Only the audio stream is mapped, and it is stream copied
+            when the output container accepts the source codec (e.g. AAC into m4a, Opus into weba).
+        gif_fps (float, optional): Frame rate for GIF output (lower is smaller and faster).
+        gif_dither (str, optional): GIF dither mode, one of GIF_DITHER_MODES. Defaults to 'sierra2_4a'.
+        gif_max_colors (int, optional): GIF palette size (2-256). Defaults to 256.
+            GIF output uses a two-stage palettegen/paletteuse pipeline; the palette is cached, so
+            re-rendering at another size or dither skips the analysis pass.
+        memory_limit (int, optional): Memory ceiling in bytes for image outputs. Images whose estimated
+            peak memory (see estimate_image_memory) is above it are refused before ffmpeg starts.
+            Large JPEG sources are decoded at reduced resolution when the output is smaller.
+        overwrite (bool): Replace an existing output file. By default the output gets the next free
+            name instead ('name (1).ext'). Either way the output is written to a hidden '.part' file
+            in output_directory and renamed when complete, so a half-written file never looks finished.
+        scratch_dir (str, optional): Directory for intermediates such as clip segments. Defaults to output_directory.
+        threads (int, optional): Thread budget for decoding and video encoding (see ConversionScheduler). Defaults to all cores.
+        usage (dict, optional): Filled in with the job's resource use: wall time, CPU time, peak
+            memory and I/O of its ffmpeg/ffprobe children (see summarize_usage).
+        log_level (str, optional): ffmpeg -loglevel for the job (e.g. 'info', 'verbose'). Defaults to FFMPEG_LOGLEVEL.
+        log_file (str, optional): Rotating log file that receives the full output of the job's
+            children. Either way only the last lines are kept in memory and quoted in errors.
+        resumable (bool): For video outputs longer than two RESUMABLE_SEGMENT_SECONDS segments:
+            encode the video in segments, checkpointed in a hidden '.resume' folder in
+            output_directory, and join them at the end. If the process dies, calling
+            convert_media again with the same input and options skips the finished segments.
+        target_size (int, optional): Output size in bytes for video outputs, instead of the preset's
+            constant quality. A few short samples at the estimated bitrate measure the audio and
+            container overhead, then the file is encoded once with an average bitrate capped by
+            maxrate/bufsize. Only a result more than TARGET_SIZE_TOLERANCE off the target is encoded
+            again, with a corrected bitrate (resumable encodes are not corrected).
+
+    Returns:
+        tuple: (bool, str) - True and the output path, or False and an error message.
+    """
+    # Ensure the output directory exists. If not, create it.
+    if not os.path.isdir(output_directory):
+        try:
+            os.makedirs(output_directory)
+            if progress_callback:
+                progress_callback(f"Created output directory: {output_directory}")
+        except OSError as e:
+            return False, f"Error creating output directory '{output_directory}': {e}"
+
+    # Extract the base name of the input file without its extension
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+
+    # Construct the full path for the output file
+    final_output_path = os.path.join(output_directory, f"{base_name}.{output_format}")
+    if os.path.abspath(final_output_path) == os.path.abspath(input_path):
+        return False, f"The output file would overwrite the input file '{input_path}'. Please choose another output directory or format."
+
+    # ffmpeg writes next to the final file, so publishing it is a rename on the same filesystem
+    part_path = output_part_path(final_output_path)
+    started = time.perf_counter()
+    try:
+        with _collect_child_usage() as records, _job_logging(log_file, log_level):
+            success, message = _run_conversion(input_path, part_path, output_format, progress_callback,
+                                               image_quality, scale_width, scale_height, scale_percentage,
+                                               video_quality_preset, video_speed_tier, image_speed_tier, scaler,
+                                               start_time, end_time, duration, audio_only,
+                                               gif_fps, gif_dither, gif_max_colors, memory_limit, scratch_dir, threads,
+                                               os.path.join(output_directory, f".{base_name}.{output_format}.resume") if resumable else None,
+                                               target_size)
+        if usage is not None:
+            usage.update(summarize_usage(records, time.perf_counter() - started))
+        if not success:
+            return False, message
+        try:
+            return True, publish_output(part_path, final_output_path, overwrite)
+        except OSError as e:
+            return False, f"Error moving the finished file to '{final_output_path}': {e}"
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+
+def _run_conversion(input_path, output_path, output_format, progress_callback,
+                    image_quality, scale_width, scale_height, scale_percentage,
+                    video_quality_preset, video_speed_tier, image_speed_tier, scaler,
+                    start_time, end_time, duration, audio_only,
+                    gif_fps, gif_dither, gif_max_colors, memory_limit, scratch_dir, threads, checkpoint_dir=None,
+                    target_size=None):
+    """
+    Runs one conversion into output_path (convert_media's '.part' file). See convert_media for the arguments.
+    checkpoint_dir is set for resumable conversions.
+    """
+    if target_size is not None and (audio_only or output_format.lower() in IMAGE_OUTPUT_FORMATS):
+        return False, "A target size is only supported for video output."
+    # Clipping
+    input_options = None
+    clip_options = None
+    if start_time is not None or end_time is not None or duration is not None:
+        start_time = start_time or 0.0
+        if duration is None and end_time is not None:
+            duration = end_time - start_time
+        if duration is not None and duration <= 0:
+            return False, "The clip end must be after its start."
+
+        adjustments = (image_quality, scale_width, scale_height, scale_percentage,
+                       video_quality_preset, video_speed_tier, image_speed_tier, scaler, target_size)
+        same_container = output_format.lower() == os.path.splitext(input_path)[1].lower().lstrip('.')
+        if same_container and output_format.lower() != 'gif' and not audio_only and all(option is None for option in adjustments):
+            if progress_callback:
+                progress_callback(f"Clipping '{input_path}' to '{output_path}'...")
+            return _smart_cut(input_path, output_path, start_time, duration, progress_callback, scratch_dir)
+
+        input_options = ['-ss', f"{start_time:.6f}"]
+        if duration is not None:
+            clip_options = ['-t', f"{duration:.6f}"]
+
+    if output_format.lower() == 'gif':
+        if progress_callback:
+            progress_callback(f"Attempting to convert '{input_path}' to '{output_path}'...")
+        success, message = _convert_gif(input_path, output_path, progress_callback,
+                                        scale_width=scale_width, scale_height=scale_height, scale_percentage=scale_percentage,
+                                        scaler=scaler, fps=gif_fps, dither=gif_dither, max_colors=gif_max_colors,
+                                        start_time=start_time, duration=duration)
+        if success and progress_callback:
+            progress_callback("Conversion successful!")
+        return success, message
+
+    # Large images: check the memory estimate up front and let JPEGs decode at reduced resolution
+    global_options = []
+    if output_format.lower() in IMAGE_OUTPUT_FORMATS and not audio_only:
+        try:
+            large_file = os.path.getsize(input_path) >= LARGE_IMAGE_FILE_BYTES
+        except OSError:
+            large_file = False
+        if memory_limit is not None or large_file:
+            success, plan = estimate_image_memory(input_path, scale_width, scale_height, scale_percentage, memory_limit)
+            if success:
+                if memory_limit is not None and plan['bytes'] > memory_limit:
+                    return False, _memory_limit_message(input_path, plan, memory_limit)
+                if plan['lowres']:
+                    # The decoder already shrinks the frame, so the scale filter gets the final size in pixels
+                    input_options = (input_options or []) + ['-lowres', str(plan['lowres'])]
+                    scale_width, scale_height = plan['output_size']
+                    scale_percentage = None
+                    if progress_callback:
+                        progress_callback(f"Large image: decoding at 1/{2 ** plan['lowres']} resolution...")
+            elif memory_limit is not None:
+                return False, plan
+        if memory_limit is not None:
+            # Safety net if the estimate is off: allocations above the limit fail instead of exhausting memory
+            global_options = ['-max_alloc', str(int(memory_limit))]
+
+    # Audio mode: copy the audio bitstream if the target container accepts it
+    copy_audio = False
+    if audio_only:
+        success, probe_info = probe_media(input_path)
+        copy_audio = success and _audio_copy_compatible(probe_info, output_format)
+        if copy_audio and progress_callback:
+            progress_callback("Source audio fits the output format, copying it without re-encoding...")
+
+    build_options = dict(
+        image_quality=image_quality, scale_width=scale_width, scale_height=scale_height, scale_percentage=scale_percentage,
+        video_quality_preset=video_quality_preset, video_speed_tier=video_speed_tier, image_speed_tier=image_speed_tier,
+        scaler=scaler, audio_only=audio_only, copy_audio=copy_audio, threads=threads
+    )
+    if target_size is not None:
+        success, plan = _plan_target_bitrate(input_path, output_format, target_size, build_options,
+                                             start_time, duration, scratch_dir, progress_callback)
+        if not success:
+            return False, plan
+        build_options['video_bitrate'] = plan['video_bitrate']
+    try:
+        command = build_ffmpeg_command(input_path, output_path, output_format,
+                                       input_options=input_options, extra_output_options=clip_options, **build_options)
+    except ValueError as e:
+        return False, str(e)
+    command[2:2] = global_options
+
+    if checkpoint_dir and not audio_only and output_format.lower() not in IMAGE_OUTPUT_FORMATS:
+        result = _run_resumable(input_path, output_path, output_format, checkpoint_dir, progress_callback,
+                                build_options, command, start_time, duration)
+        if result is not None:
+            return result
+
+    if not global_options and _in_process_eligible(input_path, output_format, audio_only):
+        # Small stills: starting ffmpeg takes longer than the conversion itself
+        started, cpu_started = time.perf_counter(), time.thread_time()
+        try:
+            if _convert_in_process(command):
+                records = getattr(_job_local, 'records', None)
+                if records is not None:
+                    # Recorded like a child, so the job's usage still shows the work (CPU of this thread only)
+                    records.append({'program': 'pyav', 'wall_seconds': time.perf_counter() - started,
+                                    'user_seconds': time.thread_time() - cpu_started})
+                log = getattr(_job_local, 'log', None)
+                if log:
+                    _log_line(log, f"[pyav] {' '.join(command)}")
+                if progress_callback:
+                    progress_callback("Conversion successful!")
+                return True, output_path
+        except Exception as e:
+            log = getattr(_job_local, 'log', None)
+            if log:
+                _log_line(log, f"[pyav] failed, running ffmpeg instead: {e}")
+        try:
+            os.remove(output_path) # ffmpeg won't overwrite a partial output
+        except OSError:
+            pass
+
+    try:
+        if progress_callback:
+            progress_callback(f"Attempting to convert '{input_path}' to '{output_path}'...")
+            progress_callback(f"FFmpeg command: {' '.join(command)}") # For debugging
+
+        _run_child(command)
+
+        if target_size is not None:
+            corrected_bitrate = _corrected_target_bitrate(output_path, target_size, plan)
+            if corrected_bitrate:
+                if progress_callback:
+                    progress_callback(f"Output is {os.path.getsize(output_path) / (1024*1024):.1f} MiB, "
+                                      f"re-encoding at {corrected_bitrate / 1000:.0f} kbit/s to reach the target size...")
+                build_options['video_bitrate'] = corrected_bitrate
+                command = build_ffmpeg_command(input_path, output_path, output_format,
+                                               input_options=input_options, extra_output_options=clip_options, **build_options)
+                command[2:2] = global_options
+                os.remove(output_path) # ffmpeg won't overwrite the first attempt
+                _run_child(command)
+
+        if progress_callback:
+            progress_callback("Conversion successful!")
+        return True, output_path
+
+    except subprocess.CalledProcessError as e:
+        error_msg = (
+            f"Error during conversion: FFmpeg exited with code {e.returncode}.\n"
+            f"FFmpeg output (last lines):\n{e.stderr}\n"
+            "Please check the input file, output format, and FFmpeg's error messages."
+        )
+        return False, error_msg
+    except FileNotFoundError:
         return False, "Error: 'ffmpeg' command not found. Please ensure FFmpeg is installed and accessible in your system's PATH."
     except Exception as e:
         return False, f"An unexpected error occurred during conversion: {e}"
 
+
+def _plan_target_bitrate(input_path, output_format, target_size, build_options, start_time, duration,
+                         scratch_dir=None, progress_callback=None):
+    """
+    Estimates the video bitrate that makes a conversion come out at target_size bytes.
+
+    Short samples are encoded with the job's real settings: once as audio only, which gives the
+    audio's share of the budget, and once at a first-guess video bitrate. Encoders miss a requested
+    bitrate by a content-dependent factor (noise and motion push VP9 well above it, for example),
+    so the video bitrate is scaled by how far the samples missed.
+
+    Returns:
+        tuple: (bool, dict or str) - True and the plan ('video_bitrate', 'audio_rate' and 'duration'),
+               or False and an error message.
+    """
+    success, probe_info = probe_media(input_path)
+    if not success:
+        return False, probe_info
+    input_duration = _media_duration(probe_info)
+    if not input_duration:
+        return False, f"Could not determine the duration of '{input_path}', which a target size needs."
+    start = start_time or 0.0
+    length = min(input_duration - start, duration) if duration is not None else input_duration - start
+    if length <= 0:
+        return False, "The clip range is outside the input."
+
+    if progress_callback:
+        progress_callback(f"Encoding samples to plan a {target_size / (1024*1024):.1f} MiB output...")
+    target_rate = target_size * 8 / length
+    sample_options = dict(build_options, start_time=start_time, duration=duration, scratch_dir=scratch_dir)
+    audio_rate = 0.0
+    if any(stream.get('codec_type') == 'audio' for stream in probe_info.get('streams', [])):
+        success, projection = preview_conversion(input_path, output_format, sample_count=TARGET_SIZE_SAMPLES,
+                                                 sample_seconds=TARGET_SIZE_SAMPLE_SECONDS,
+                                                 **dict(sample_options, audio_only=True))
+        if not success:
+            return False, projection
+        audio_rate = projection['sample_bytes'] * 8 / projection['sampled_seconds']
+    if target_rate - audio_rate < TARGET_SIZE_MIN_VIDEO_BITRATE:
+        return False, (f"The target size is too small for {length:.0f}s of video: the audio alone needs "
+                       f"about {audio_rate * length / 8 / (1024*1024):.1f} MiB.")
+
+    first_guess = target_rate - audio_rate
+    success, projection = preview_conversion(input_path, output_format, sample_count=TARGET_SIZE_SAMPLES,
+                                             sample_seconds=TARGET_SIZE_SAMPLE_SECONDS,
+                                             **dict(sample_options, video_bitrate=first_guess))
+    if not success:
+        return False, projection
+    sample_video_rate = projection['sample_bytes'] * 8 / projection['sampled_seconds'] - audio_rate
+    video_bitrate = max(first_guess * first_guess / max(sample_video_rate, 1.0), TARGET_SIZE_MIN_VIDEO_BITRATE)
+    if progress_callback:
+        progress_callback(f"Encoding at {video_bitrate / 1000:.0f} kbit/s for the target size...")
+    return True, {'video_bitrate': video_bitrate, 'audio_rate': audio_rate, 'duration': length}
+
+
+def _corrected_target_bitrate(output_path, target_size, plan):
+    """
+    Returns a corrected video bitrate if the output missed target_size by more than TARGET_SIZE_TOLERANCE, otherwise None.
+    """
+    actual_size = os.path.getsize(output_path)
+    if abs(actual_size - target_size) <= target_size * TARGET_SIZE_TOLERANCE:
+        return None
+    # Only the video part scales with the bitrate; the audio measured by the samples stays the same
+    wanted_video_rate = target_size * 8 / plan['duration'] - plan['audio_rate']
+    actual_video_rate = actual_size * 8 / plan['duration'] - plan['audio_rate']
+    if actual_video_rate <= 0:
+        return None
+    corrected = max(plan['video_bitrate'] * wanted_video_rate / actual_video_rate, TARGET_SIZE_MIN_VIDEO_BITRATE)
+    # Already at the lowest bitrate: encoding again would give the same file
+    return corrected if corrected != plan['video_bitrate'] else None
+
+
+def _split_filter_chain(chain):
+    """
+    Splits a -vf chain into (name, arguments) pairs. One level of quoting and escaping is removed,
+    as ffmpeg's graph parser does before the arguments reach the filter.
+    """
+    filters, current, quoted, escaped = [], [], False, False
+    for char in chain:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == '\\' and not quoted:
+            escaped = True
+        elif char == "'":
+            quoted = not quoted
+        elif char == ',' and not quoted:
+            filters.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    filters.append(''.join(current))
+    return [tuple(part.strip().partition('=')[::2]) for part in filters if part.strip()]
+
+
+def _in_process_eligible(input_path, output_format, audio_only):
+    """
+    Returns True if a conversion should try the in-process backend: PyAV is installed, the output
+    is a still image and the input is at most INPROCESS_MAX_BYTES.
+    """
+    if av is None or not INPROCESS_MAX_BYTES or audio_only or output_format.lower() not in IMAGE_OUTPUT_FORMATS:
+        return False
+    try:
+        return os.path.getsize(input_path) <= INPROCESS_MAX_BYTES
+    except OSError:
+        return False
+
+
+def _convert_in_process(command):
+    """
+    Runs an ffmpeg still-image command with PyAV instead of starting ffmpeg.
+
+    The command is carried out as ffmpeg would: the same encoder with the same options, the -vf
+    chain as a libavfilter graph, and a format filter at the end that picks the encoder's pixel
+    format (or -pix_fmt). Only commands made of options understood here are run (-threads, -c:v,
+    -pix_fmt, -q:v, -vf, -f and the encoder options of the image tables), and only for inputs
+    with a single frame. Anything else returns False before the output is written, so the
+    caller runs ffmpeg.
+
+    Args:
+        command (list): An ffmpeg command from build_ffmpeg_command.
+
+    Returns:
+        bool: True once the output is written, False if the command needs ffmpeg.
+
+    Raises:
+        av.FFmpegError: If decoding, filtering or encoding fails.
+    """
+    arguments = [argument for argument in command[1:] if argument != '-nostdin']
+    if '-i' not in arguments or arguments.count('-i') > 1:
+        return False
+    split = arguments.index('-i')
+    input_options, input_path = arguments[:split], arguments[split + 1]
+    output_options, output_path = arguments[split + 2:-1], arguments[-1]
+    if len(input_options) % 2 or len(output_options) % 2:
+        return False
+
+    decoder_threads = None
+    for option, value in zip(input_options[::2], input_options[1::2]):
+        if option != '-threads':
+            return False
+        decoder_threads = int(value)
+
+    encoder, pixel_format, muxer, encoder_threads, filters, encoder_options = None, None, None, None, [], {}
+    for option, value in zip(output_options[::2], output_options[1::2]):
+        if option == '-c:v':
+            encoder = value
+        elif option == '-pix_fmt':
+            pixel_format = value
+        elif option == '-vf':
+            filters = _split_filter_chain(value)
+        elif option == '-f':
+            muxer = value
+        elif option == '-threads':
+            encoder_threads = int(value)
+        elif option == '-q:v':
+            encoder_options['flags'] = '+qscale'
+            encoder_options['global_quality'] = str(int(float(value) * FF_QP2LAMBDA))
+        elif option in INPROCESS_ENCODER_OPTIONS:
+            encoder_options[option[1:]] = value
+        else:
+            return False
+    if encoder is None:
+        return False # ffmpeg would pick the muxer's default encoder
+    try:
+        codec = av.codec.Codec(encoder, 'w')
+    except Exception:
+        return False # PyAV's libav was built without this encoder
+    pixel_formats = [pixel_format] if pixel_format else [f.name for f in codec.video_formats or []]
+    full_range = [name for name in pixel_formats if name.startswith('yuvj')]
+    if full_range:
+        # Like the ffmpeg CLI: mjpeg also lists the limited-range formats, but only opens with
+        # them when told the range is full, so negotiating yuv444p would fail
+        pixel_formats = full_range
+
+    with av.open(input_path) as container:
+        if not container.streams.video:
+            return False
+        stream = container.streams.video[0]
+        if decoder_threads:
+            stream.codec_context.thread_count = decoder_threads
+        frames = []
+        for frame in container.decode(stream):
+            frames.append(frame)
+            if len(frames) > 1:
+                return False # Animated input: ffmpeg decides what an image output gets
+        if not frames:
+            return False
+
+        graph = av.filter.Graph()
+        previous = graph.add_buffer(template=stream)
+        if pixel_formats:
+            filters = filters + [('format', '|'.join(pixel_formats))]
+        for name, filter_arguments in filters:
+            node = graph.add(name, filter_arguments)
+            previous.link_to(node)
+            previous = node
+        sink = graph.add('buffersink')
+        previous.link_to(sink)
+        graph.configure()
+        graph.push(frames[0])
+        frame = graph.pull()
+
+    with av.open(output_path, mode='w', format=muxer) as output:
+        output_stream = output.add_stream(encoder, rate=INPROCESS_FRAME_RATE, options=encoder_options)
+        output_stream.width = frame.width
+        output_stream.height = frame.height
+        output_stream.pix_fmt = frame.format.name
+        if encoder_threads:
+            output_stream.codec_context.thread_count = encoder_threads
+        frame.pts = 0
+        for packet in output_stream.encode(frame):
+            output.mux(packet)
+        for packet in output_stream.encode(None):
+            output.mux(packet)
+    return True
+
+
+def _run_resumable(input_path, output_path, output_format, checkpoint_dir, progress_callback,
+                   build_options, command, start_time, duration):
+    """
+    Encodes a video in RESUMABLE_SEGMENT_SECONDS segments with checkpoints and joins them into output_path.
+
+    Each video segment is encoded on its own (accurate input seeking, so segments meet exactly)
+    and renamed into checkpoint_dir when complete; manifest.json records the finished pieces and a
+    fingerprint of the input and of the options that shape the output (settings_fingerprint, so
+    not threads). A later call with the same fingerprint skips the finished pieces; a different
+    fingerprint starts over. The audio is encoded in one piece, because encoders like AAC add
+    priming samples at every start, which would click at the joins.
+    The pieces are joined with the concat demuxer without re-encoding, and checkpoint_dir is
+    removed once the output is complete.
+
+    Args:
+        command (list): The single-pass ffmpeg command; its audio encoder is used for the audio piece.
+        See _run_conversion for the other arguments.
+
+    Returns:
+        tuple or None: (bool, str) like convert_media, or None if the input isn't suited (no video
+            stream, unknown duration or shorter than two segments) and should run in one pass.
+    """
+    success, probe_info = probe_media(input_path)
+    if not success or _video_stream(probe_info) is None:
+        return None
+    media_duration = _media_duration(probe_info)
+    if media_duration is None:
+        return None
+    start = start_time or 0.0
+    end = min(media_duration, start + duration) if duration is not None else media_duration
+    segment_count = math.ceil((end - start) / RESUMABLE_SEGMENT_SECONDS)
+    if segment_count < 2:
+        return None
+    has_audio = any(stream.get('codec_type') == 'audio' for stream in probe_info.get('streams', []))
+    extension = output_format.lower()
+
+    # Only what shapes the output counts; a resume with another thread count reuses the pieces
+    fingerprint = hashlib.sha1(json.dumps([_file_identity(input_path), settings_fingerprint(extension, **build_options),
+                                           start, end, RESUMABLE_SEGMENT_SECONDS], default=str).encode('utf-8')).hexdigest()
+    manifest_path = os.path.join(checkpoint_dir, 'manifest.json')
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get('fingerprint') != fingerprint:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True) # Pieces of another input or other options
+        manifest = {'fingerprint': fingerprint, 'done': {}}
+
+    def finished(name):
+        path = os.path.join(checkpoint_dir, name)
+        return name in manifest['done'] and os.path.isfile(path) and os.path.getsize(path) == manifest['done'][name]
+
+    def encode_piece(name, piece_command):
+        # Written under a temporary name, so a crash mid-piece never leaves a piece that looks finished
+        temp_path = os.path.join(checkpoint_dir, f"partial_{name}")
+        _run_child(piece_command + [temp_path])
+        os.replace(temp_path, os.path.join(checkpoint_dir, name))
+        manifest['done'][name] = os.path.getsize(os.path.join(checkpoint_dir, name))
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+    try:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        video_names = [f"video_{index:05d}.{extension}" for index in range(segment_count)]
+        for index, name in enumerate(video_names):
+            if finished(name):
+                if progress_callback:
+                    progress_callback(f"Segment {index + 1}/{segment_count} already encoded, skipping.")
+                continue
+            if progress_callback:
+                progress_callback(f"Encoding segment {index + 1}/{segment_count}...")
+            segment_start = start + index * RESUMABLE_SEGMENT_SECONDS
+            segment_duration = min(RESUMABLE_SEGMENT_SECONDS, end - segment_start)
+            piece_command = build_ffmpeg_command(input_path, '', output_format,
+                                                 input_options=['-ss', f"{segment_start:.6f}"],
+                                                 extra_output_options=['-t', f"{segment_duration:.6f}", '-an', '-sn', '-dn'],
+                                                 **build_options)[:-1]
+            encode_piece(name, ['ffmpeg', '-y'] + piece_command[1:]) # -y: replace a piece left by a crash
+
+        audio_name = f"audio.{extension}"
+        if has_audio and not finished(audio_name):
+            if progress_callback:
+                progress_callback("Encoding audio...")
+            audio_options = command[command.index('-c:a'):command.index('-c:a') + 2] if '-c:a' in command else []
+            encode_piece(audio_name, ['ffmpeg', '-nostdin', '-y', '-ss', f"{start:.6f}", '-i', input_path,
+                                      '-t', f"{end - start:.6f}", '-map', '0:a:0', '-vn', '-sn', '-dn'] + audio_options)
+
+        if progress_callback:
+            progress_callback(f"Joining {segment_count} segments...")
+        list_path = os.path.join(checkpoint_dir, 'segments.txt')
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"file '{name}'\n" for name in video_names)
+        join_command = ['ffmpeg', '-nostdin', '-f', 'concat', '-safe', '0', '-i', list_path]
+        if has_audio:
+            join_command += ['-i', os.path.join(checkpoint_dir, audio_name), '-map', '0:v:0', '-map', '1:a:0']
+        join_command += ['-c', 'copy']
+        if extension in FORMAT_MUXERS:
+            join_command += ['-f', FORMAT_MUXERS[extension]]
+        _run_child(join_command + [output_path])
+    except subprocess.CalledProcessError as e:
+        return False, (
+            f"Error during conversion: FFmpeg exited with code {e.returncode}.\n"
+            f"FFmpeg output (last lines):\n{e.stderr}\n"
+            "Finished segments are kept; run the conversion again to resume."
+        )
+    except FileNotFoundError:
+        return False, "Error: 'ffmpeg' command not found. Please ensure FFmpeg is installed and accessible in your system's PATH."
+    except OSError as e:
+        return False, f"Error writing segment checkpoints in '{checkpoint_dir}': {e}"
+
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    if progress_callback:
+        progress_callback("Conversion successful!")
+    return True, output_path
+
+
+def _partial_digest(path, size):
+    """
+    Returns a hash of the first and last DEDUP_PARTIAL_BYTES of a file, which tells most same-size files apart.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        digest.update(f.read(DEDUP_PARTIAL_BYTES))
+        if size > DEDUP_PARTIAL_BYTES:
+            f.seek(max(DEDUP_PARTIAL_BYTES, size - DEDUP_PARTIAL_BYTES))
+            digest.update(f.read(DEDUP_PARTIAL_BYTES))
+    return digest.hexdigest()
+
+
+def _full_digest(path):
+    """
+    Returns a hash of a whole file. The file is memory-mapped, so hashing doesn't copy it through Python buffers.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        digest.update(mapped)
+    return digest.hexdigest()
+
+
+def find_duplicate_inputs(input_paths):
+    """
+    Finds inputs with identical content, however they are named.
+
+    Files are compared by size first; only files of the same size are hashed, first partially
+    (start and end) and then in full if the partial hashes match. The same file listed twice, or
+    reached through a hard link, is recognized without reading it.
+
+    Args:
+        input_paths (list): The input media files.
+
+    Returns:
+        list: For each input, the index of the first input with the same content (its own index
+              if it is the first, or if it can't be read; convert_media reports those).
+    """
+    originals = list(range(len(input_paths)))
+    by_size = {}
+    for index, input_path in enumerate(input_paths):
+        try:
+            st = os.stat(input_path)
+        except OSError:
+            continue
+        # Empty files can't be mapped and fail to convert anyway
+        if st.st_size > 0:
+            by_size.setdefault(st.st_size, []).append((index, (st.st_dev, st.st_ino)))
+
+    for size, candidates in by_size.items():
+        if len(candidates) < 2:
+            continue
+        by_digest = {}
+        by_file = {}
+        for index, file_id in candidates:
+            if file_id in by_file:
+                originals[index] = by_file[file_id]
+                continue
+            by_file[file_id] = index
+            try:
+                by_digest.setdefault(_partial_digest(input_paths[index], size), []).append(index)
+            except OSError:
+                pass
+        for partial_matches in by_digest.values():
+            if len(partial_matches) < 2:
+                continue
+            first_by_hash = {}
+            for index in partial_matches:
+                try:
+                    full_hash = _full_digest(input_paths[index])
+                except (OSError, ValueError):
+                    continue
+                first_index = first_by_hash.setdefault(full_hash, index)
+                if first_index != index:
+                    originals[index] = first_index
+    # Hard links and repeats point at the first copy, which may itself be a duplicate of an earlier input
+    for index, original in enumerate(originals):
+        originals[index] = originals[original]
+    return originals
+
+
+def _copy_output(source_path, output_directory, input_path, output_format, overwrite=False):
+    """
+    Publishes an already converted output under the name input_path would get, as a hard link
+    where the filesystem allows it and as a copy otherwise.
+
+    Returns:
+        str: The path the output was published under.
+    """
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    output_path = os.path.join(output_directory, f"{base_name}.{output_format}")
+    if overwrite and os.path.abspath(output_path) == os.path.abspath(source_path):
+        return source_path
+    part_path = output_part_path(output_path)
+    try:
+        os.link(source_path, part_path)
+    except OSError:
+        shutil.copy2(source_path, part_path)
+    try:
+        return publish_output(part_path, output_path, overwrite)
+    except OSError:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+
+def convert_batch(input_paths, output_directory, output_format, progress_callback=None,
+                  group_size=BATCH_GROUP_SIZE, small_file_bytes=BATCH_SMALL_FILE_BYTES, report=None, deduplicate=True,
+                  **conversion_options):
+    """
+    Converts many files, running groups of small audio/image jobs in one ffmpeg process each.
+
+    For thousands of short clips or icons, starting ffmpeg costs more than the encode itself, so
+    small files are grouped into one invocation with several inputs and outputs. A group is capped
+    at group_size files (and a safe command line length), so a failure only costs one group: if a
+    group fails, or one of its outputs is missing, the affected files are converted one by one.
+    Larger files, video outputs and clips always go through convert_media individually.
+
+    Inputs with the same content under different names are converted once (see
+    find_duplicate_inputs); the other copies get a hard link (or a copy) of that output under
+    their own name.
+
+    Args:
+        input_paths (list): The input media files.
+        output_directory (str): The directory where the converted files will be saved.
+        output_format (str): The desired output format.
+        progress_callback (callable, optional): A function to call with progress updates.
+        group_size (int): Maximum number of files per ffmpeg process.
+        small_file_bytes (int): Files up to this size are grouped.
+        report (ResourceReport, optional): Receives every file's resource use. A group's usage
+            is split evenly between its files (their 'shared_process' is True).
+        deduplicate (bool): Convert inputs with identical content only once.
+        **conversion_options: convert_media options applied to every file. Audio is not probed
+            for stream copy in grouped jobs; small files are simply re-encoded. With a memory_limit,
+            a group's estimated image memory stays under the limit as well.
+
+    Returns:
+        list: One (input_path, success, message) tuple per input, in input order.
+    """
+    if not os.path.isdir(output_directory):
+        try:
+            os.makedirs(output_directory)
+        except OSError as e:
+            return [(path, False, f"Error creating output directory '{output_directory}': {e}") for path in input_paths]
+
+    results = [None] * len(input_paths)
+    originals = find_duplicate_inputs(input_paths) if deduplicate else list(range(len(input_paths)))
+    clip = any(conversion_options.get(key) is not None for key in ('start_time', 'end_time', 'duration'))
+    # GIF has its own two-stage pipeline, so it is never grouped
+    groupable_format = conversion_options.get('audio_only') or \
+        (output_format.lower() in IMAGE_OUTPUT_FORMATS and output_format.lower() != 'gif')
+    job_options = {key: value for key, value in conversion_options.items() if key not in CONVERT_ONLY_OPTIONS}
+    overwrite = conversion_options.get('overwrite', False)
+    # All inputs of a group are decoded by the same process, so their memory estimates add up
+    memory_limit = conversion_options.get('memory_limit') if output_format.lower() in IMAGE_OUTPUT_FORMATS else None
+
+    # Sort the inputs into groups of small jobs and single jobs
+    singles = []
+    groups = []
+    current_group = []
+    current_chars = 0
+    current_bytes = 0
+    claimed_outputs = set()
+    for index, input_path in enumerate(input_paths):
+        if originals[index] != index:
+            continue
+        base_name = os.path.splitext(os.path.basename(input_path))[0]
+        output_path = os.path.join(output_directory, f"{base_name}.{output_format}")
+        try:
+            small = os.path.getsize(input_path) <= small_file_bytes
+        except OSError:
+            small = False
+        # Anything unusual (existing output, duplicate name, output over input) is left to convert_media to report
+        if clip or not groupable_format or not small or output_path in claimed_outputs or \
+           os.path.exists(output_path) or os.path.abspath(output_path) == os.path.abspath(input_path):
+            singles.append(index)
+            continue
+        job_bytes = 0
+        if memory_limit is not None:
+            # Images that need a reduced-resolution decode, or can't be estimated, go through convert_media
+            success, plan = estimate_image_memory(input_path, conversion_options.get('scale_width'),
+                                                  conversion_options.get('scale_height'),
+                                                  conversion_options.get('scale_percentage'), memory_limit)
+            if not success or plan['lowres'] or plan['bytes'] > memory_limit:
+                singles.append(index)
+                continue
+            job_bytes = plan['bytes']
+        claimed_outputs.add(output_path)
+
+        job_chars = len(input_path) + len(output_path) + 200 # Rough size of the job's arguments
+        if current_group and (len(current_group) >= group_size or current_chars + job_chars > BATCH_MAX_COMMAND_CHARS or
+                              (memory_limit is not None and current_bytes + job_bytes > memory_limit)):
+            groups.append(current_group)
+            current_group = []
+            current_chars = 0
+            current_bytes = 0
+        current_group.append((index, output_path, output_part_path(output_path)))
+        current_chars += job_chars
+        current_bytes += job_bytes
+    if current_group:
+        groups.append(current_group)
+
+    fallback = []
+    for group_number, group in enumerate(groups, start=1):
+        command_inputs = []
+        command_outputs = []
+        try:
+            for input_index, (index, output_path, part_path) in enumerate(group):
+                input_args, output_args = build_ffmpeg_job_args(input_paths[index], part_path, output_format,
+                                                                input_index=input_index, **job_options)
+                command_inputs.extend(input_args)
+                command_outputs.extend(output_args)
+        except ValueError as e:
+            for index, _, _ in group:
+                results[index] = (input_paths[index], False, str(e))
+            continue
+
+        if progress_callback:
+            progress_callback(f"Converting group {group_number}/{len(groups)} ({len(group)} files) in one FFmpeg process...")
+        command = ['ffmpeg', '-nostdin'] + command_inputs + command_outputs
+        started = time.perf_counter()
+        try:
+            with _collect_child_usage() as records:
+                _run_child(command)
+            group_failed = False
+        except subprocess.CalledProcessError:
+            group_failed = True
+        except FileNotFoundError:
+            for index, _, _ in group:
+                results[index] = (input_paths[index], False, "Error: 'ffmpeg' command not found. Please ensure FFmpeg is installed and accessible in your system's PATH.")
+            continue
+
+        group_usage = summarize_usage(records, time.perf_counter() - started)
+        file_usage = {key: value if key in ('children', 'peak_rss_bytes') else value / len(group) for key, value in group_usage.items()}
+        file_usage['shared_process'] = True
+        for index, output_path, part_path in group:
+            if not group_failed and os.path.exists(part_path) and os.path.getsize(part_path) > 0:
+                try:
+                    results[index] = (input_paths[index], True, publish_output(part_path, output_path, overwrite))
+                    if report is not None:
+                        report.add(input_paths[index], output_format, conversion_options, file_usage)
+                    continue
+                except OSError:
+                    pass
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            fallback.append(index)
+
+    if fallback and progress_callback:
+        progress_callback(f"Retrying {len(fallback)} file(s) from failed groups one at a time...")
+
+    for index in sorted(singles + fallback):
+        usage = {}
+        success, message = convert_media(input_paths[index], output_directory, output_format, usage=usage, **conversion_options)
+        results[index] = (input_paths[index], success, message)
+        if report is not None:
+            report.add(input_paths[index], output_format, conversion_options, usage)
+        if not success and progress_callback:
+            progress_callback(f"Failed: {input_paths[index]}")
+
+    duplicates = [index for index, original in enumerate(originals) if original != index]
+    if duplicates and progress_callback:
+        progress_callback(f"Linking {len(duplicates)} duplicate input(s) to their converted copies...")
+    for index in duplicates:
+        _, success, message = results[originals[index]]
+        if not success:
+            results[index] = (input_paths[index], False, message)
+            continue
+        try:
+            results[index] = (input_paths[index], True,
+                              _copy_output(message, output_directory, input_paths[index], output_format, overwrite))
+        except OSError as e:
+            results[index] = (input_paths[index], False, f"Error copying '{message}' for duplicate input: {e}")
+
+    if progress_callback:
+        succeeded = sum(1 for result in results if result[1])
+        progress_callback(f"Batch finished: {succeeded}/{len(results)} files converted.")
+    return results
+
+
+def available_memory_bytes():
+    """
+    Returns the memory available to new processes in bytes, or None if it can't be determined.
+    """
+    try:
+        with open('/proc/meminfo', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    if os.name == 'nt':
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                        ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                        ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                        ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                        ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+        return None
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def estimate_job_resources(input_path, output_format, **conversion_options):
+    """
+    Estimates what one conversion needs from the machine, for scheduling.
+
+    Video jobs are probed: their memory is a window of decoded frames plus overhead, and their
+    cost is resolution x duration x the speed tier's relative cost. Image jobs use
+    estimate_image_memory for large files. Audio jobs are cheap and aren't probed.
+
+    Args:
+        input_path (str): The input media file.
+        output_format (str): The desired output format.
+        **conversion_options: The convert_media options for the job.
+
+    Returns:
+        dict: 'kind' ('video', 'image' or 'audio'), 'memory' (bytes) and 'cost' (relative work units).
+    """
+    resources = {'kind': 'audio', 'memory': JOB_MEMORY_OVERHEAD_BYTES, 'cost': 1.0}
+    try:
+        file_bytes = os.path.getsize(input_path)
+    except OSError:
+        file_bytes = 0
+
+    if output_format.lower() in IMAGE_OUTPUT_FORMATS:
+        resources['kind'] = 'image'
+        if file_bytes >= LARGE_IMAGE_FILE_BYTES:
+            success, plan = estimate_image_memory(input_path, conversion_options.get('scale_width'),
+                                                  conversion_options.get('scale_height'),
+                                                  conversion_options.get('scale_percentage'))
+            if success:
+                resources['memory'] = plan['bytes']
+                resources['cost'] = plan['source_size'][0] * plan['source_size'][1] / 1e6
+        return resources
+    if conversion_options.get('audio_only'):
+        resources['cost'] = file_bytes / 1e6 # Audio encode time roughly follows the input size
+        return resources
+
+    success, probe_info = probe_media(input_path)
+    video = _video_stream(probe_info) if success else None
+    if video is None or not video.get('width') or not video.get('height'):
+        resources['cost'] = file_bytes / 1e6
+        return resources
+
+    width, height = int(video['width']), int(video['height'])
+    duration = _media_duration(probe_info) or 60.0
+    start = conversion_options.get('start_time') or 0.0
+    if conversion_options.get('duration') is not None:
+        duration = min(duration - start, conversion_options['duration'])
+    elif conversion_options.get('end_time') is not None:
+        duration = min(duration, conversion_options['end_time']) - start
+    preset = VIDEO_QUALITY_PRESETS.get(conversion_options.get('video_quality_preset'), (None, 'medium', 'balanced'))
+    tier = conversion_options.get('video_speed_tier') or preset[2]
+
+    resources['kind'] = 'video'
+    resources['memory'] = int(width * height * PIXEL_FORMAT_BYTES.get(video.get('pix_fmt'), 1.5) * VIDEO_BUFFERED_FRAMES +
+                              JOB_MEMORY_OVERHEAD_BYTES)
+    resources['cost'] = width * height * max(duration, 1.0) * VIDEO_TIER_COST.get(tier, 2) / 1e6
+    return resources
+
+
+class ConversionScheduler:
+    """
+    Runs many conversions at once without overloading the machine.
+
+    Jobs are admitted while there are free cores and memory for them, most expensive first, so
+    the long encodes don't end up running alone at the end. Image and audio jobs take one core
+    each. Video jobs split the cores between them: each concurrent encode gets at least
+    VIDEO_MIN_THREADS threads and passes its share to ffmpeg as -threads, which is faster than
+    several encodes that each start a thread per core. A job that doesn't fit the budget runs
+    once nothing else is running. The children run at lower CPU and I/O priority (CHILD_NICENESS),
+    so the desktop stays responsive. Every job's resource use is collected in self.report.
+    """
+
+    def __init__(self, cores=None, memory_bytes=None, max_jobs=None):
+        """
+        Args:
+            cores (int, optional): Cores to use. Defaults to all cores.
+            memory_bytes (int, optional): Memory budget for all running jobs.
+                Defaults to SCHEDULER_MEMORY_FRACTION of the currently available memory.
+            max_jobs (int, optional): Maximum number of concurrent jobs. Defaults to the number of cores.
+        """
+        self.cores = cores or _default_thread_count()
+        if memory_bytes is None:
+            available = available_memory_bytes()
+            memory_bytes = int(available * SCHEDULER_MEMORY_FRACTION) if available else None
+        self.memory_bytes = memory_bytes
+        self.max_jobs = max_jobs or self.cores
+        self.report = ResourceReport()
+
+    def run(self, jobs, progress_callback=None):
+        """
+        Runs the jobs and waits for all of them.
+
+        Args:
+            jobs (list): One dict of convert_media keyword arguments per job. 'input_path',
+                'output_directory' and 'output_format' are required; any other convert_media
+                option can be set per job.
+            progress_callback (callable, optional): A function to call with progress updates.
+
+        Returns:
+            list: One (input_path, success, message) tuple per job, in job order.
+        """
+        plans = [estimate_job_resources(job['input_path'], job['output_format'],
+                                        **{key: value for key, value in job.items()
+                                           if key not in ('input_path', 'output_format')})
+                 for job in jobs]
+        video_jobs = sum(1 for plan in plans if plan['kind'] == 'video')
+        video_slots = max(1, min(video_jobs, self.cores // VIDEO_MIN_THREADS))
+        for plan in plans:
+            plan['cores'] = max(1, self.cores // video_slots) if plan['kind'] == 'video' else 1
+
+        results = [None] * len(jobs)
+        pending = sorted(range(len(jobs)), key=lambda index: plans[index]['cost'], reverse=True)
+        condition = threading.Condition()
+        load = {'jobs': 0, 'cores': 0, 'memory': 0}
+
+        session = getattr(_job_local, 'session', None)
+        priority = getattr(_job_local, 'priority', None)
+
+        def run_job(index):
+            _job_local.session = session # Jobs started from a Converter session keep using it
+            _job_local.priority = priority
+            job = dict(jobs[index])
+            if plans[index]['kind'] == 'video':
+                job.setdefault('threads', plans[index]['cores'])
+            usage = job.setdefault('usage', {})
+            try:
+                success, message = convert_media(**job)
+            except Exception as e:
+                success, message = False, f"An unexpected error occurred during conversion: {e}"
+            self.report.add(job['input_path'], job['output_format'], job, usage)
+            with condition:
+                results[index] = (job['input_path'], success, message)
+                finished = sum(1 for result in results if result is not None)
+            if progress_callback:
+                progress_callback(f"{'Finished' if success else 'Failed'} ({finished}/{len(jobs)}): {job['input_path']}")
+            with condition:
+                load['jobs'] -= 1
+                load['cores'] -= plans[index]['cores']
+                load['memory'] -= plans[index]['memory']
+                condition.notify_all()
+
+        with condition:
+            while pending or load['jobs']:
+                for index in list(pending):
+                    if load['jobs'] >= self.max_jobs:
+                        break
+                    plan = plans[index]
+                    fits = load['cores'] + plan['cores'] <= self.cores and \
+                        (self.memory_bytes is None or load['memory'] + plan['memory'] <= self.memory_bytes)
+                    if not fits and load['jobs']:
+                        continue # Smaller jobs further down the queue may still fit
+                    pending.remove(index)
+                    load['jobs'] += 1
+                    load['cores'] += plan['cores']
+                    load['memory'] += plan['memory']
+                    threading.Thread(target=run_job, args=(index,), daemon=True).start()
+                condition.wait()
+
+        if progress_callback:
+            succeeded = sum(1 for result in results if result[1])
+            progress_callback(f"All jobs finished: {succeeded}/{len(results)} converted.")
+        return results
+
+
+def settings_fingerprint(output_format, **conversion_options):
+    """
+    Hashes the options that decide what an output file looks like.
+
+    Options that only affect how a job runs (FINGERPRINT_IGNORED_OPTIONS) are left out, as are
+    options left at None, so adding a new option to convert_media doesn't make every existing
+    output stale.
+
+    Args:
+        output_format (str): The output format.
+        **conversion_options: The convert_media options.
+
+    Returns:
+        str: A hex digest that changes whenever the output would.
+    """
+    settings = {key: value for key, value in conversion_options.items()
+                if key not in FINGERPRINT_IGNORED_OPTIONS and value is not None}
+    settings['output_format'] = output_format.lower()
+    return hashlib.sha1(json.dumps(settings, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _walk_media_files(root, extensions, exclude=None):
+    """
+    Yields (path, stat) for every file below root with one of the extensions. Hidden entries
+    (scratch folders, partial outputs, the sync manifest) and the exclude directory are skipped.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirectories = []
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if exclude is None or os.path.normcase(os.path.abspath(entry.path)) != exclude:
+                        subdirectories.append(entry.path)
+                elif entry.is_file() and os.path.splitext(entry.name)[1][1:].lower() in extensions:
+                    yield entry.path, entry.stat()
+            except OSError:
+                continue
+        stack.extend(reversed(subdirectories))
+
+
+def _load_sync_manifest(path):
+    """
+    Reads a sync manifest. A missing or unreadable manifest is empty, so every output gets checked again.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        return manifest['files'] if manifest.get('version') == 1 else {}
+    except (OSError, ValueError, KeyError, AttributeError):
+        return {}
+
+
+def _save_sync_manifest(path, files):
+    """
+    Writes a sync manifest atomically, so an interrupted save keeps the previous one.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'files': files}, f, separators=(',', ':'))
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def convert_directory(input_root, output_root, output_format, progress_callback=None, mode=None, extensions=None,
+                      scheduler=None, **conversion_options):
+    """
+    Converts every media file below a folder, recreating the folder tree under output_root.
+
+    Outputs that are up to date are skipped: the output exists, is newer than its input, and the
+    sync manifest in output_root says it was made from an input of the same size and modification
+    time with the same settings (settings_fingerprint). Only the size and time of each file are
+    read for this, so re-syncing a large archive costs one directory walk plus the changed files.
+    The remaining files run through a ConversionScheduler in chunks of SYNC_CHUNK_JOBS, and the
+    manifest is saved after every chunk.
+
+    Args:
+        input_root (str): The folder to convert.
+        output_root (str): The folder that receives the mirrored tree. It may be inside input_root.
+        output_format (str): The desired output format.
+        progress_callback (callable, optional): A function to call with progress updates.
+        mode (str, optional): 'image', 'video' or 'audio'; picks the input extensions from INPUT_EXTENSIONS.
+            Defaults to all of them.
+        extensions (iterable, optional): Input extensions to use instead (without dots).
+        scheduler (ConversionScheduler, optional): The scheduler to run the jobs on. Defaults to a new one.
+        **conversion_options: Options passed to convert_media for every file.
+
+    Returns:
+        tuple: (bool, dict or str). On success the dict has 'results' (one (input_path, success, message)
+            tuple per converted file) and 'skipped' (the input paths that were up to date).
+            On failure, an error message.
+    """
+    if not os.path.isdir(input_root):
+        return False, f"Input folder not found: {input_root}"
+    try:
+        os.makedirs(output_root, exist_ok=True)
+    except OSError as e:
+        return False, f"Could not create output folder {output_root}: {e}"
+    if extensions is None:
+        extensions = INPUT_EXTENSIONS[mode] if mode else tuple(set().union(*INPUT_EXTENSIONS.values()))
+    extensions = {extension.lower().lstrip('.') for extension in extensions}
+    output_format = output_format.lower()
+    conversion_options['overwrite'] = True # Stale outputs are replaced in place
+    fingerprint = settings_fingerprint(output_format, **conversion_options)
+    manifest_path = os.path.join(output_root, SYNC_MANIFEST_NAME)
+    manifest = _load_sync_manifest(manifest_path)
+
+    if progress_callback:
+        progress_callback(f"Scanning {input_root}...")
+    jobs, sources, skipped, claimed = [], [], [], set()
+    results = []
+    exclude = os.path.normcase(os.path.abspath(output_root))
+    for input_path, input_stat in _walk_media_files(input_root, extensions, exclude):
+        relative_directory = os.path.relpath(os.path.dirname(input_path), input_root)
+        output_directory = os.path.normpath(os.path.join(output_root, relative_directory))
+        name = os.path.splitext(os.path.basename(input_path))[0]
+        key = os.path.join(relative_directory, f"{name}.{output_format}").replace(os.sep, '/')
+        if key.startswith('./'):
+            key = key[2:]
+        if os.path.normcase(key) in claimed:
+            # e.g. photo.png and photo.jpg in the same folder, both converted to webp
+            results.append((input_path, False, f"Skipped: another input in this folder already converts to {key}"))
+            continue
+        claimed.add(os.path.normcase(key))
+        source = f"{input_stat.st_size}|{input_stat.st_mtime_ns}"
+
+        entry = manifest.get(key)
+        if entry and entry.get('fingerprint') == fingerprint and entry.get('source') == source:
+            try:
+                if os.stat(os.path.join(output_directory, f"{name}.{output_format}")).st_mtime_ns >= input_stat.st_mtime_ns:
+                    skipped.append(input_path)
+                    continue
+            except OSError:
+                pass # The output is gone
+        jobs.append(dict(conversion_options, input_path=input_path, output_directory=output_directory,
+                         output_format=output_format))
+        sources.append((key, source))
+
+    if progress_callback:
+        progress_callback(f"{len(skipped)} files up to date, {len(jobs)} to convert.")
+    scheduler = scheduler or ConversionScheduler()
+    for start in range(0, len(jobs), SYNC_CHUNK_JOBS):
+        chunk_results = scheduler.run(jobs[start:start + SYNC_CHUNK_JOBS], progress_callback)
+        for (key, source), (input_path, success, message) in zip(sources[start:start + SYNC_CHUNK_JOBS], chunk_results):
+            if success:
+                manifest[key] = {'fingerprint': fingerprint, 'source': source}
+            else:
+                manifest.pop(key, None)
+        results.extend(chunk_results)
+        _save_sync_manifest(manifest_path, manifest)
+
+    return True, {'results': results, 'skipped': skipped}
+
+
+def parse_url_list(text, media_type=None):
+    """
+    Parses a list of URLs, one per line, each optionally followed by an output format.
+
+    The URL and format may be separated by a comma, tab or spaces, so both plain text lists and
+    CSV exports work. Blank lines, '#' comments and a 'url' header row are ignored.
+
+    Args:
+        text (str): The list.
+        media_type (str, optional): 'image', 'video' or 'audio'. Formats must be one of its
+            OUTPUT_FORMATS; without it, any output format is accepted.
+
+    Returns:
+        tuple: (entries, invalid) - a list of (url, output_format or None) tuples, and a list of
+            (line_number, line) tuples for lines that aren't http(s) URLs or name an unknown format.
+    """
+    if media_type:
+        output_formats = set(OUTPUT_FORMATS[media_type])
+    else:
+        output_formats = set().union(*OUTPUT_FORMATS.values())
+    entries, invalid = [], []
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = [field.strip() for field in next(csv.reader([line.replace('\t', ',')], skipinitialspace=True))]
+        if len(fields) == 1:
+            fields = line.split()
+        url = fields[0]
+        if url.lower() == 'url':
+            continue # Header row
+        output_format = fields[1].lower().lstrip('.') if len(fields) > 1 and fields[1] else None
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or not parsed.netloc or \
+                (output_format is not None and output_format not in output_formats):
+            invalid.append((line_number, line))
+            continue
+        entries.append((url, output_format))
+    return entries, invalid
+
+
+def convert_url_list(entries, output_directory, media_type, output_format, progress_callback=None,
+                     max_downloads=URL_LIST_MAX_DOWNLOADS, per_host=URL_LIST_PER_HOST, conversion_workers=None,
+                     download_rate_limit=None, concurrent_fragments=None, result_callback=None, **conversion_options):
+    """
+    Downloads many URLs at once and converts each file as soon as its download finishes.
+
+    Downloads are admitted while there are fewer than max_downloads in total and fewer than
+    per_host from the same host, in list order; a URL whose host is busy lets later URLs go
+    first. Finished downloads are queued for conversion on a separate pool, so downloading and
+    encoding overlap. Each download goes to its own scratch folder in output_directory, which is
+    removed once the file is converted.
+
+    Args:
+        entries (list): (url, output_format or None) tuples, e.g. from parse_url_list.
+        output_directory (str): The folder that receives the converted files.
+        media_type (str): 'image', 'video' or 'audio' (see download_media_from_url).
+        output_format (str): The output format for entries that don't name one.
+        progress_callback (callable, optional): A function to call with progress updates.
+        max_downloads (int, optional): Maximum number of concurrent downloads.
+        per_host (int, optional): Maximum number of concurrent downloads from one host.
+        conversion_workers (int, optional): Concurrent conversions. Defaults to one per core
+            (one per VIDEO_MIN_THREADS cores for video).
+        download_rate_limit (float, optional): Bandwidth limit per download in bytes per second.
+            All downloads together stay within the shared download_limiter.
+        concurrent_fragments (int, optional): HLS/DASH fragments yt-dlp downloads at once per URL.
+        result_callback (callable, optional): Called with (index, success, message) as each entry finishes.
+        **conversion_options: Options passed to convert_media for every file.
+
+    Returns:
+        list: One (url, success, message) tuple per entry, in entry order. The message is the
+            output path on success.
+    """
+    cores = _default_thread_count()
+    workers = conversion_workers or (max(1, cores // VIDEO_MIN_THREADS) if media_type == 'video' else cores)
+    if media_type == 'video':
+        conversion_options.setdefault('threads', max(1, cores // workers))
+    hosts = [(urlparse(url).hostname or '').lower() for url, _ in entries]
+    results = [None] * len(entries)
+    pending = list(range(len(entries)))
+    condition = threading.Condition()
+    load = {'downloads': 0, 'hosts': {}}
+    session = getattr(_job_local, 'session', None)
+    priority = getattr(_job_local, 'priority', None)
+    conversions = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='url-convert')
+
+    def finish(index, success, message):
+        with condition:
+            results[index] = (entries[index][0], success, message)
+            finished = sum(1 for result in results if result is not None)
+        if result_callback:
+            result_callback(index, success, message)
+        if progress_callback:
+            progress_callback(f"{'Finished' if success else 'Failed'} ({finished}/{len(entries)}): {entries[index][0]}")
+
+    def convert(index, download_dir, downloaded_path):
+        _job_local.session = session # Jobs started from a Converter session keep using it
+        _job_local.priority = priority
+        try:
+            success, message = convert_media(downloaded_path, output_directory, entries[index][1] or output_format,
+                                             **conversion_options)
+        except Exception as e:
+            success, message = False, f"An unexpected error occurred during conversion: {e}"
+        finally:
+            shutil.rmtree(download_dir, ignore_errors=True)
+        finish(index, success, message if success else f"Conversion failed: {message}")
+
+    def download(index):
+        _job_local.session = session
+        _job_local.priority = priority
+        download_dir = None
+        try:
+            download_dir = make_scratch_dir('.download_', output_directory)
+            success, result = download_media_from_url(entries[index][0], download_dir, media_type,
+                                                      log_file=conversion_options.get('log_file'),
+                                                      rate_limit=download_rate_limit,
+                                                      concurrent_fragments=concurrent_fragments)
+        except Exception as e:
+            success, result = False, f"An unexpected error occurred during download: {e}"
+        if success:
+            # Queued before this download is counted as done, so the pool is still open
+            conversions.submit(convert, index, download_dir, result)
+        else:
+            if download_dir:
+                shutil.rmtree(download_dir, ignore_errors=True)
+            finish(index, False, f"Download failed: {result}")
+        with condition:
+            load['downloads'] -= 1
+            load['hosts'][hosts[index]] -= 1
+            condition.notify_all()
+
+    try:
+        with condition:
+            while pending or load['downloads']:
+                for index in list(pending):
+                    if load['downloads'] >= max_downloads:
+                        break
+                    if load['hosts'].get(hosts[index], 0) >= per_host:
+                        continue # Later URLs from other hosts may still start
+                    pending.remove(index)
+                    load['downloads'] += 1
+                    load['hosts'][hosts[index]] = load['hosts'].get(hosts[index], 0) + 1
+                    threading.Thread(target=download, args=(index,), daemon=True).start()
+                condition.wait()
+    finally:
+        conversions.shutdown(wait=True)
+
+    if progress_callback:
+        succeeded = sum(1 for result in results if result[1])
+        progress_callback(f"All URLs finished: {succeeded}/{len(results)} converted.")
+    return results
+
+
+def list_playlist_entries(url):
+    """
+    Lists the entries of a playlist or channel without downloading them (yt-dlp --flat-playlist).
+
+    Only the playlist pages are fetched, so even long playlists are listed in seconds. A URL of a
+    single video gives one entry.
+
+    Args:
+        url (str): The playlist, channel or video URL.
+
+    Returns:
+        tuple: (bool, list or str) - True and a list of dicts with 'extractor', 'id', 'url' and
+            'title', or False and an error message.
+    """
+    command = [
+        'yt-dlp', url,
+        '--flat-playlist', '--yes-playlist', '--no-warnings',
+        '--print', f"{PLAYLIST_ENTRY_MARKER}\t%(ie_key,extractor_key)s\t%(id)s\t%(webpage_url,url)s\t%(title)s",
+    ]
+    entries = []
+    def remember_entry(line):
+        fields = line.split('\t', 4)
+        if len(fields) == 5 and fields[0] == PLAYLIST_ENTRY_MARKER and urlparse(fields[3]).scheme in ('http', 'https'):
+            entries.append({'extractor': fields[1], 'id': fields[2], 'url': fields[3], 'title': fields[4]})
+
+    try:
+        _run_child(command, line_callback=remember_entry)
+    except subprocess.CalledProcessError as e:
+        return False, f"Error listing playlist: yt-dlp exited with code {e.returncode}.\n{e.stderr}"
+    except FileNotFoundError:
+        return False, "Error: 'yt-dlp' command not found. Please ensure yt-dlp is installed and accessible in your system's PATH."
+    if not entries:
+        return False, f"No entries found at {url}."
+    return True, entries
+
+
+def _archive_key(entry):
+    """
+    Returns an entry's line in a download archive: the lowercased extractor and the ID, like yt-dlp's --download-archive.
+    """
+    return f"{entry['extractor'].lower()} {entry['id']}"
+
+
+def convert_playlist(url, output_directory, media_type, output_format, progress_callback=None,
+                     max_downloads=URL_LIST_MAX_DOWNLOADS, concurrent_fragments=PLAYLIST_CONCURRENT_FRAGMENTS,
+                     archive_path=None, **conversion_options):
+    """
+    Downloads and converts every entry of a playlist or channel.
+
+    The entries are listed with list_playlist_entries and run through convert_url_list, so several
+    items download at once (each with concurrent_fragments HLS/DASH fragments in flight) and each
+    is converted as soon as it arrives. Every converted entry is appended to an archive file in
+    yt-dlp's --download-archive format; entries already in it are skipped, so re-running a
+    playlist only fetches what is new or failed last time.
+
+    Args:
+        url (str): The playlist or channel URL.
+        output_directory (str): The folder that receives the converted files.
+        media_type (str): 'image', 'video' or 'audio' (see download_media_from_url).
+        output_format (str): The desired output format.
+        progress_callback (callable, optional): A function to call with progress updates.
+        max_downloads (int, optional): Maximum number of items downloading at once.
+        concurrent_fragments (int, optional): HLS/DASH fragments yt-dlp downloads at once per item.
+        archive_path (str, optional): The archive file. Defaults to PLAYLIST_ARCHIVE_NAME in output_directory.
+        **conversion_options: Options passed to convert_url_list and convert_media.
+
+    Returns:
+        tuple: (bool, dict or str). On success the dict has 'results' (one (url, success, message)
+            tuple per downloaded entry) and 'skipped' (the URLs already in the archive).
+            On failure, an error message.
+    """
+    try:
+        os.makedirs(output_directory, exist_ok=True)
+    except OSError as e:
+        return False, f"Could not create output folder {output_directory}: {e}"
+    if progress_callback:
+        progress_callback(f"Listing playlist entries of {url}...")
+    success, entries = list_playlist_entries(url)
+    if not success:
+        return False, entries
+
+    archive_path = archive_path or os.path.join(output_directory, PLAYLIST_ARCHIVE_NAME)
+    try:
+        with open(archive_path, encoding='utf-8') as f:
+            archived = {line.strip() for line in f}
+    except OSError:
+        archived = set()
+    pending = [entry for entry in entries if _archive_key(entry) not in archived]
+    skipped = [entry['url'] for entry in entries if _archive_key(entry) in archived]
+    if progress_callback:
+        progress_callback(f"{len(entries)} entries: {len(skipped)} already converted, {len(pending)} to download.")
+
+    archive_lock = threading.Lock()
+    def record_entry(index, success, message):
+        if not success:
+            return
+        with archive_lock:
+            try:
+                with open(archive_path, 'a', encoding='utf-8') as f:
+                    f.write(_archive_key(pending[index]) + '\n')
+            except OSError:
+                pass # The entry is converted again next time
+
+    # Every entry comes from the same site, so the per-host cap is the item limit here
+    results = convert_url_list([(entry['url'], None) for entry in pending], output_directory, media_type, output_format,
+                               progress_callback, max_downloads=max_downloads, per_host=max_downloads,
+                               concurrent_fragments=concurrent_fragments, result_callback=record_entry,
+                               **conversion_options)
+    return True, {'results': results, 'skipped': skipped}
+
+
+def write_url_report(report_path, results):
+    """
+    Writes the results of convert_url_list as a CSV file (url, status, output or error).
+
+    Args:
+        report_path (str): The CSV file to write.
+        results (list): (url, success, message) tuples.
+
+    Returns:
+        tuple: (bool, str) - True for success, False for failure, and the report path or an error message.
+    """
+    try:
+        with open(report_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['url', 'status', 'output_or_error'])
+            for url, success, message in results:
+                writer.writerow([url, 'converted' if success else 'failed', message])
+    except OSError as e:
+        return False, f"Could not write report {report_path}: {e}"
+    return True, report_path
+
+
+def probe_media(input_path):
+    """
+    Reads container and stream information with ffprobe.
+
+    Args:
+        input_path (str): The media file to inspect.
+
+    Returns:
+        tuple: (bool, dict or str) - True and ffprobe's 'format'/'streams' info, or False and an error message.
+            Inside a Converter session the info comes from its probe cache and must not be modified.
+    """
+    session = getattr(_job_local, 'session', None)
+    if session is not None:
+        return session.probe(input_path)
+    return _run_ffprobe(input_path)
+
+
+def _run_ffprobe(input_path):
+    """
+    Runs ffprobe for probe_media.
+    """
+    command = [
+        'ffprobe', '-v', 'error',
+        '-show_format', '-show_streams',
+        '-of', 'json',
+        input_path
+    ]
+    try:
+        process = _run_child(command, capture_stdout=True)
+        return True, json.loads(process.stdout)
+    except subprocess.CalledProcessError as e:
+        return False, f"Error probing '{input_path}': ffprobe exited with code {e.returncode}.\n{e.stderr}"
+    except FileNotFoundError:
+        return False, "Error: 'ffprobe' command not found. Please ensure FFmpeg is installed and accessible in your system's PATH."
+    except ValueError as e:
+        return False, f"Could not parse ffprobe output for '{input_path}': {e}"
+
+
+def _media_duration(probe_info):
+    """
+    Returns the duration in seconds from probe_media() info, or None if unknown.
+    """
+    try:
+        return float(probe_info['format']['duration'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _audio_copy_compatible(probe_info, output_format):
+    """
+    Returns True if the first audio stream in probe_media() info can be stream copied into output_format.
+    """
+    for stream in probe_info.get('streams', []):
+        if stream.get('codec_type') == 'audio':
+            return stream.get('codec_name') in AUDIO_COPY_COMPATIBLE.get(output_format.lower(), ())
+    return False
+
+
+def _planned_image_size(width, height, scale_width=None, scale_height=None, scale_percentage=None):
+    """
+    Returns the (width, height) plan_video_filters will produce for an image of the given size.
+    """
+    if scale_width is not None and scale_height is not None:
+        return int(scale_width), int(scale_height)
+    if scale_percentage is not None:
+        factor = scale_percentage / 100
+    elif scale_width is not None:
+        factor = scale_width / width
+    elif scale_height is not None:
+        factor = scale_height / height
+    else:
+        return width, height
+    return max(1, int(width * factor)), max(1, int(height * factor))
+
+
+def estimate_image_memory(input_path, scale_width=None, scale_height=None, scale_percentage=None,
+                          memory_limit=None, probe_info=None):
+    """
+    Estimates the peak memory ffmpeg needs to convert an image, without decoding it.
+
+    ffmpeg decodes a still image into one full frame, converts it to the output pixel format
+    and hands it to the encoder, so the estimate is the decoded frame plus two output-sized
+    buffers and a fixed overhead. JPEG sources can be decoded at 1/2, 1/4 or 1/8 resolution
+    (-lowres); that is chosen when the source is large (LARGE_IMAGE_PIXELS) or doesn't fit in
+    memory_limit, as long as the reduced frame is still at least as big as the output.
+
+    Args:
+        input_path (str): The image file.
+        scale_width (int, optional): Desired output width in pixels.
+        scale_height (int, optional): Desired output height in pixels.
+        scale_percentage (float, optional): Scale factor as a percentage.
+        memory_limit (int, optional): Memory ceiling in bytes the plan should try to meet.
+        probe_info (dict, optional): probe_media() info, if the caller already has it.
+
+    Returns:
+        tuple: (bool, dict or str) - True and a plan with 'source_size', 'output_size', 'lowres'
+            (0 for a full decode) and 'bytes', or False and an error message.
+    """
+    if probe_info is None:
+        success, probe_info = probe_media(input_path)
+        if not success:
+            return False, probe_info
+    stream = _video_stream(probe_info)
+    if stream is None or not stream.get('width') or not stream.get('height'):
+        return False, f"Could not read the image size of '{input_path}'."
+
+    width, height = int(stream['width']), int(stream['height'])
+    output_width, output_height = _planned_image_size(width, height, scale_width, scale_height, scale_percentage)
+    pixel_bytes = PIXEL_FORMAT_BYTES.get(stream.get('pix_fmt'), 8)
+    output_pixel_bytes = 4 if pixel_bytes <= 4 else 8
+
+    def peak_bytes(lowres):
+        decoded_pixels = -(-width >> lowres) * -(-height >> lowres) # The decoder rounds up
+        return int(decoded_pixels * pixel_bytes + 2 * output_width * output_height * output_pixel_bytes +
+                   IMAGE_MEMORY_OVERHEAD_BYTES)
+
+    lowres = 0
+    if stream.get('codec_name') in LOWRES_CODECS and \
+       (width * height >= LARGE_IMAGE_PIXELS or (memory_limit is not None and peak_bytes(0) > memory_limit)):
+        for factor in (3, 2, 1):
+            if -(-width >> factor) >= output_width and -(-height >> factor) >= output_height:
+                lowres = factor
+                break
+
+    return True, {
+        'source_size': (width, height),
+        'output_size': (output_width, output_height),
+        'lowres': lowres,
+        'bytes': peak_bytes(lowres),
+    }
+
+
+def _memory_limit_message(input_path, plan, memory_limit):
+    """
+    Returns the error message for an image that doesn't fit in the memory limit.
+    """
+    width, height = plan['source_size']
+    return (
+        f"'{input_path}' ({width}x{height}) needs about {plan['bytes'] / 2 ** 20:.0f} MiB to convert, "
+        f"more than the {memory_limit / 2 ** 20:.0f} MiB memory limit. "
+        "Choose a smaller output size (JPEG sources can then be decoded at reduced resolution) or raise the limit."
+    )
+
+
+def preview_conversion(input_path, output_format, progress_callback=None, sample_count=3, sample_seconds=3.0,
+                       draft=False, **conversion_options):
+    """
+    Encodes a few short samples spread over the input and projects the full job from them.
+
+    The samples are built with build_ffmpeg_command, so they use exactly the settings the real
+    conversion would. With draft=True they are encoded at half resolution with the fast tier and
+    fast_bilinear scaling instead: much quicker for catching bad settings, but the projections
+    are rough (size and time are scaled up by the pixel ratio).
+
+    Args:
+        input_path (str): The input media file (video or audio).
+        output_format (str): The desired output format.
+        progress_callback (callable, optional): A function to call with progress updates.
+        sample_count (int): How many points of the input to sample.
+        sample_seconds (float): Length of each sample in seconds.
+        draft (bool): Encode reduced resolution samples with the fastest settings.
+        **conversion_options: The convert_media options for the real job. A clip range
+            (start_time, end_time, duration) limits sampling to that range, and the samples
+            are written to scratch_dir if one is given.
+
+    Returns:
+        tuple: (bool, dict or str) - True and the projection, or False and an error message.
+        The projection has 'duration', 'sampled_seconds', 'sample_bytes', 'encode_speed'
+        (media seconds per wall second), 'projected_bytes', 'projected_seconds' and 'draft'.
+    """
+    if output_format.lower() in IMAGE_OUTPUT_FORMATS:
+        return False, "Preview is only available for video and audio output."
+
+    success, probe_info = probe_media(input_path)
+    if not success:
+        return False, probe_info
+    duration = _media_duration(probe_info)
+    if not duration:
+        return False, f"Could not determine the duration of '{input_path}'."
+
+    # The clip range narrows what gets sampled; the remaining options go to the command builder
+    conversion_options = dict(conversion_options)
+    range_start = conversion_options.pop('start_time', None) or 0.0
+    range_end = conversion_options.pop('end_time', None)
+    clip_duration = conversion_options.pop('duration', None)
+    scratch_dir = conversion_options.pop('scratch_dir', None)
+    for key in CONVERT_ONLY_OPTIONS:
+        conversion_options.pop(key, None)
+    if clip_duration is not None:
+        range_end = range_start + clip_duration
+    duration = min(duration, range_end if range_end is not None else duration) - range_start
+    if duration <= 0:
+        return False, "The clip range is outside the input."
+
+    if conversion_options.get('audio_only') and 'copy_audio' not in conversion_options:
+        conversion_options['copy_audio'] = _audio_copy_compatible(probe_info, output_format)
+
+    extra_scale = None
+    pixel_ratio = 1.0
+    if draft and not conversion_options.get('audio_only'):
+        conversion_options.update(video_speed_tier='fast', scaler='fast_bilinear')
+        extra_scale = 0.5
+        pixel_ratio = 0.25
+
+    # Short inputs are encoded whole; otherwise samples are centred on evenly spaced points
+    if duration <= sample_count * sample_seconds * 2:
+        sample_points = [(range_start, duration)]
+    else:
+        sample_points = [(range_start + max(0.0, duration * (i + 1) / (sample_count + 1) - sample_seconds / 2), sample_seconds)
+                         for i in range(sample_count)]
+
+    preview_dir = make_scratch_dir("media_converter_preview_", scratch_dir)
+    try:
+        sampled_seconds = 0.0
+        sample_bytes = 0
+        wall_seconds = 0.0
+        for index, (start, length) in enumerate(sample_points):
+            sample_path = os.path.join(preview_dir, f"sample_{index}.{output_format}")
+            try:
+                command = build_ffmpeg_command(input_path, sample_path, output_format,
+                                               input_options=['-ss', f"{start:.3f}"],
+                                               extra_output_options=['-t', f"{length:.3f}"],
+                                               extra_scale=extra_scale,
+                                               **conversion_options)
+            except ValueError as e:
+                return False, str(e)
+
+            if progress_callback:
+                progress_callback(f"Encoding preview sample {index + 1}/{len(sample_points)} at {start:.1f}s...")
+            started = time.perf_counter()
+            try:
+                _run_child(command)
+            except subprocess.CalledProcessError as e:
+                return False, (
+                    f"Preview failed: FFmpeg exited with code {e.returncode}.\n"
+                    f"FFmpeg stderr:\n{e.stderr}\n"
+                    "The full conversion would fail with these settings."
+                )
+            except FileNotFoundError:
+                return False, "Error: 'ffmpeg' command not found. Please ensure FFmpeg is installed and accessible in your system's PATH."
+            wall_seconds += time.perf_counter() - started
+            sampled_seconds += length
+            sample_bytes += os.path.getsize(sample_path)
+    finally:
+        shutil.rmtree(preview_dir, ignore_errors=True)
+
+    # Draft samples have a quarter of the pixels, so scale speed and size back up to full resolution
+    encode_speed = sampled_seconds / wall_seconds * pixel_ratio
+    projection = {
+        'duration': duration,
+        'sampled_seconds': sampled_seconds,
+        'sample_bytes': sample_bytes,
+        'encode_speed': encode_speed,
+        'projected_bytes': int(sample_bytes / sampled_seconds * duration / pixel_ratio),
+        'projected_seconds': duration / encode_speed,
+        'draft': draft,
+    }
+    if progress_callback:
+        progress_callback(
+            f"Preview: ~{projection['projected_bytes'] / (1024*1024):.1f} MiB, "
+            f"{encode_speed:.2f}x realtime, ~{projection['projected_seconds']:.0f}s total"
+        )
+    return True, projection
+
+
+# Source video codec -> encoder used to re-encode the partial GOPs at the edges of a smart cut
+SOURCE_CODEC_ENCODERS = {
+    'h264': 'libx264',
+    'hevc': 'libx265',
+    'vp9': 'libvpx-vp9',
+    'vp8': 'libvpx',
+    'av1': 'libaom-av1',
+    'mpeg4': 'mpeg4',
+    'mpeg2video': 'mpeg2video',
+}
+
+# Codecs that carry their parameter sets in-band in MPEG-TS, which lets re-encoded and copied segments be joined
+TS_SEGMENT_CODECS = ('h264', 'hevc', 'mpeg2video', 'mpeg4')
+
+
+def parse_timestamp(text):
+    """
+    Parses a time given as seconds ('90', '12.5') or as [hh:]mm:ss[.ms] ('1:30', '01:02:03.5').
+
+    Returns:
+        float: The time in seconds.
+
+    Raises:
+        ValueError: If the text is not a valid time.
+    """
+    parts = text.strip().split(':')
+    if not 1 <= len(parts) <= 3 or any(part == '' for part in parts):
+        raise ValueError(f"Invalid time '{text}'.")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    if seconds < 0:
+        raise ValueError(f"Invalid time '{text}'.")
+    return seconds
+
+
+def _video_stream(probe_info):
+    """
+    Returns the first real video stream from probe_media() info (cover art is skipped), or None.
+    """
+    for stream in probe_info.get('streams', []):
+        if stream.get('codec_type') == 'video' and not stream.get('disposition', {}).get('attached_pic'):
+            return stream
+    return None
+
+
+def _probe_keyframes(input_path, start, end):
+    """
+    Lists the keyframe times of the first video stream between start and end.
+    Reads packet flags only, so nothing is decoded.
+    """
+    command = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-read_intervals', f"{max(0.0, start - 1):.6f}%{end + 1:.6f}",
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        input_path
+    ]
+    keyframes = []
+    def collect_keyframe(line):
+        fields = line.strip().split(',')
+        if len(fields) >= 2 and 'K' in fields[1] and fields[0] not in ('', 'N/A'):
+            try:
+                keyframes.append(float(fields[0]))
+            except ValueError:
+                pass # Not a packet line (e.g. a warning on stderr)
+
+    # One line per packet can be a lot for long ranges, so parse while reading instead of buffering
+    _run_child(command, line_callback=collect_keyframe)
+    return sorted(keyframes)
+
+
+def _smart_cut(input_path, output_path, start, duration, progress_callback=None, scratch_dir=None):
+    """
+    Cuts [start, start + duration) out of a file without re-encoding it, where possible.
+
+    If both cut points fall on keyframes the clip is a plain stream copy. Otherwise only the
+    partial GOPs before the first and after the last keyframe inside the range are re-encoded
+    (with the source's codec), the whole GOPs in between are copied, and the pieces are joined.
+    Audio is stream copied for the whole range. The segments are written to scratch_dir
+    (by default a temporary folder next to the output).
+
+    Returns:
+        tuple: (bool, str) - True and the output path, or False and an error message.
+    """
+    success, probe_info = probe_media(input_path)
+    if not success:
+        return False, probe_info
+
+    total_duration = _media_duration(probe_info)
+    end = start + duration if duration is not None else total_duration
+    if end is None:
+        return False, f"Could not determine the duration of '{input_path}'."
+
+    copy_command = [
+        'ffmpeg', '-y', '-ss', f"{start:.6f}", '-i', input_path, '-t', f"{end - start:.6f}",
+        '-map', '0', '-c', 'copy', '-avoid_negative_ts', 'make_zero', output_path
+    ]
+
+    video = _video_stream(probe_info)
+    has_audio = any(stream.get('codec_type') == 'audio' for stream in probe_info.get('streams', []))
+    temp_dir = None
+    def finished():
+        # Every path copies the audio; make sure none of them lost it
+        if has_audio:
+            success, output_info = probe_media(output_path)
+            if not success or not any(stream.get('codec_type') == 'audio' for stream in output_info.get('streams', [])):
+                return False, f"Clipping failed: '{output_path}' has no audio stream, but the input has one."
+        return True, output_path
+
+    try:
+        if video is None:
+            # Audio only: audio packets are all keyframes
+            _run_child(copy_command)
+            return finished()
+
+        # Half a frame of tolerance when matching cut points to keyframes
+        try:
+            numerator, denominator = video.get('avg_frame_rate', '0/0').split('/')
+            tolerance = 0.5 * float(denominator) / float(numerator)
+        except (ValueError, ZeroDivisionError):
+            tolerance = 0.02
+
+        keyframes = _probe_keyframes(input_path, start, end)
+        start_aligned = any(abs(k - start) <= tolerance for k in keyframes)
+        end_aligned = (total_duration is not None and end >= total_duration - tolerance) or \
+                      any(abs(k - end) <= tolerance for k in keyframes)
+
+        if start_aligned and end_aligned:
+            if progress_callback:
+                progress_callback("Cut points are on keyframes, copying the clip without re-encoding...")
+            _run_child(copy_command)
+            return finished()
+
+        inner = [k for k in keyframes if start + tolerance < k < end - tolerance]
+        copy_start = start if start_aligned else (inner[0] if inner else None)
+        copy_end = end if end_aligned else (inner[-1] if inner else None)
+        encoder = SOURCE_CODEC_ENCODERS.get(video.get('codec_name'))
+        encode_options = []
+        if encoder:
+            encode_options.extend(['-c:v', encoder])
+            encode_options.extend(VIDEO_ENCODER_QUALITY.get(encoder, {}).get('high', []))
+        if video.get('pix_fmt'):
+            encode_options.extend(['-pix_fmt', video['pix_fmt']])
+
+        if encoder is None or copy_start is None or copy_end is None or copy_start >= copy_end:
+            # No whole GOP inside the range (or no matching encoder): re-encode the range
+            if progress_callback:
+                progress_callback("No whole GOP to copy, re-encoding the clip...")
+            command = ['ffmpeg', '-y', '-ss', f"{start:.6f}", '-i', input_path, '-t', f"{end - start:.6f}",
+                       '-map', '0:v:0', '-map', '0:a?']
+            command.extend(encode_options + ['-c:a', 'copy', output_path])
+            _run_child(command)
+            return finished()
+
+        if progress_callback:
+            progress_callback(f"Smart cut: re-encoding {copy_start - start + end - copy_end:.2f}s at the edges, copying {copy_end - copy_start:.2f}s...")
+
+        temp_dir = make_scratch_dir(".clip_", scratch_dir or os.path.dirname(output_path))
+        segment_ext = 'ts' if video.get('codec_name') in TS_SEGMENT_CODECS else 'mkv'
+        segments = []
+        for index, (segment_start, segment_end, copy) in enumerate([
+            (start, copy_start, False),
+            (copy_start, copy_end, True),
+            (copy_end, end, False),
+        ]):
+            if segment_end - segment_start <= 0:
+                continue
+            segment_path = os.path.join(temp_dir, f"segment_{index}.{segment_ext}")
+            command = ['ffmpeg', '-y', '-ss', f"{segment_start:.6f}", '-i', input_path, '-t', f"{segment_end - segment_start:.6f}"]
+            if copy:
+                command.extend(['-map', '0:v:0', '-an', '-sn', '-dn', '-c:v', 'copy'])
+            else:
+                command.extend(['-map', '0:v:0', '-an', '-sn', '-dn'] + encode_options)
+            command.append(segment_path)
+            _run_child(command)
+            segments.append(segment_path)
+
+        list_path = os.path.join(temp_dir, "segments.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for segment_path in segments:
+                escaped = segment_path.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        # Join the video segments and copy the audio for the whole range alongside them
+        command = [
+            'ffmpeg', '-y',
+            '-f', 'concat', '-safe', '0', '-i', list_path,
+            '-ss', f"{start:.6f}", '-t', f"{end - start:.6f}", '-i', input_path,
+            '-map', '0:v', '-map', '1:a?', '-c', 'copy',
+            output_path
+        ]
+        _run_child(command)
+        return finished()
+
+    except subprocess.CalledProcessError as e:
+        return False, (
+            f"Error during clipping: {e.cmd[0]} exited with code {e.returncode}.\n"
+            f"{e.cmd[0]} stderr:\n{e.stderr}\n"
+            "Please check the input file and the clip start/end times."
+        )
+    except FileNotFoundError:
+        return False, "Error: 'ffmpeg' command not found. Please ensure FFmpeg is installed and accessible in your system's PATH."
+    except Exception as e:
+        return False, f"An unexpected error occurred during clipping: {e}"
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def default_cache_dir():
+    """
+    Returns the per-user cache directory for thumbnails and other reusable intermediates.
+    """
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'MediaConverter')
+
+
+def _touch_cache_entry(path):
+    """
+    Marks a cache file as just used, so _prune_cache keeps it longer.
+    """
+    try:
+        os.utime(path)
+    except OSError:
+        pass # Read-only cache or already pruned; it just ages normally
+
+
+def _prune_cache(cache_dir, max_files, max_bytes=None, keep=None):
+    """
+    Deletes the least recently used files of an on-disk cache until at most max_files files
+    (and max_bytes bytes, if given) are left. A file's modification time is its last use:
+    it is set when the file is written and refreshed by _touch_cache_entry on every hit.
+    keep (the entry about to be handed out) is never deleted.
+    """
+    entries = []
+    try:
+        with os.scandir(cache_dir) as scanned:
+            for entry in scanned:
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        entries.append((st.st_mtime_ns, st.st_size, entry.path))
+                except OSError:
+                    continue
+    except OSError:
+        return
+    count = len(entries)
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if count <= max_files and (max_bytes is None or total_bytes <= max_bytes):
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass # Pruned by another process at the same time
+        except OSError:
+            continue
+        count -= 1
+        total_bytes -= size
+
+
+def _file_identity(path):
+    """
+    Returns a string that changes whenever the file at path is replaced or modified.
+    """
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def _exif_thumbnail(img, size):
+    """
+    Returns the thumbnail embedded in a JPEG's EXIF data, or None if there is none or it is smaller than size.
+    """
+    exif_data = img.info.get('exif')
+    if not exif_data or not exif_data.startswith(b'Exif\x00\x00'):
+        return None
+    try:
+        ifd1 = img.getexif().get_ifd(0x0001) # IFD1 describes the embedded thumbnail
+        offset = ifd1.get(0x0201) # JPEGInterchangeFormat
+        length = ifd1.get(0x0202) # JPEGInterchangeFormatLength
+        if not offset or not length:
+            return None
+        # Offsets are relative to the TIFF header that follows the 6 byte "Exif\0\0" marker
+        thumb = Image.open(io.BytesIO(exif_data[6 + offset:6 + offset + length]))
+        thumb.load()
+    except Exception:
+        return None
+    if thumb.width < size[0] and thumb.height < size[1]:
+        return None
+    return thumb
+
+
+def _image_thumbnail(input_path, thumb_path, size):
+    """
+    Writes a thumbnail of an image with Pillow, avoiding a full-resolution decode where possible.
+    """
+    with Image.open(input_path) as img:
+        thumb = None
+        # The embedded thumbnail isn't rotated, so only use it for upright photos
+        if img.format == 'JPEG' and img.getexif().get(0x0112, 1) == 1:
+            thumb = _exif_thumbnail(img, size)
+        if thumb is None:
+            # draft() lets the JPEG decoder scale by 1/2, 1/4 or 1/8 while decoding
+            img.draft('RGB', size)
+            thumb = ImageOps.exif_transpose(img)
+        thumb.thumbnail(size)
+        if thumb.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+            thumb = thumb.convert('RGB') # e.g. CMYK JPEGs, which PNG can't store
+        thumb.save(thumb_path, 'PNG')
+
+
+def _video_thumbnail(input_path, thumb_path, t, size):
+    """
+    Writes a poster frame with ffmpeg, seeking on the input side and decoding keyframes only.
+    """
+    if t is None:
+        # Default to a frame a little way in; the very first frame is often black
+        success, probe_info = probe_media(input_path)
+        duration = _media_duration(probe_info) if success else None
+        t = min(duration * 0.1, 10.0) if duration else 0.0
+
+    scale_filter = plan_video_filters('png', bounding_box=size, scaler='fast_bilinear')
+    command = [
+        'ffmpeg', '-v', 'error',
+        '-noaccurate_seek', '-ss', f"{t:.3f}", # Input-side seek lands on the keyframe before t
+        '-skip_frame', 'nokey', # Only decode keyframes
+        '-i', input_path,
+        '-frames:v', '1',
+        '-an', '-sn',
+    ]
+    if scale_filter:
+        command.extend(['-vf', ','.join(scale_filter)])
+    command.extend(['-y', thumb_path])
+    _run_child(command)
+
+
+def thumbnail(input_path, t=None, size=(320, 180), cache_dir=None):
+    """
+    Returns a small PNG preview of an image or a poster frame of a video, using an on-disk cache.
+
+    Images are decoded with Pillow at reduced resolution (or the embedded EXIF thumbnail is used).
+    Videos are seeked on the input side and only keyframes are decoded, so a preview costs a
+    fraction of a full decode. Results are cached by file identity (path, size, modification time),
+    time and thumbnail size, so browsing the same folder again only costs a stat per file. The
+    cache keeps the most recently used THUMBNAIL_CACHE_MAX_FILES thumbnails, within
+    THUMBNAIL_CACHE_MAX_BYTES.
+
+    Args:
+        input_path (str): The image or video file.
+        t (float, optional): Position in seconds for video poster frames. Defaults to 10% in (at most 10s).
+        size (tuple): (width, height) the thumbnail must fit in.
+        cache_dir (str, optional): Thumbnail cache directory. Defaults to a folder under default_cache_dir().
+
+    Returns:
+        tuple: (bool, str) - True and the path to the thumbnail PNG, or False and an error message.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(default_cache_dir(), 'thumbnails')
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        key = hashlib.sha1(f"{_file_identity(input_path)}|{t}|{size[0]}x{size[1]}".encode('utf-8')).hexdigest()
+    except OSError as e:
+        return False, f"Error preparing thumbnail for '{input_path}': {e}"
+
+    thumb_path = os.path.join(cache_dir, f"{key}.png")
+    if os.path.exists(thumb_path):
+        _touch_cache_entry(thumb_path)
+        return True, thumb_path
+
+    # Write under a temporary name and rename, so a half-written file never becomes a cache hit
+    temp_path = os.path.join(cache_dir, f"{key}.{os.getpid()}.{os.urandom(4).hex()}.tmp.png")
+    extension = os.path.splitext(input_path)[1].lower().lstrip('.')
+    try:
+        written = False
+        if Image is not None and extension in IMAGE_OUTPUT_FORMATS:
+            try:
+                _image_thumbnail(input_path, temp_path, size)
+                written = True
+            except Exception:
+                pass # Formats Pillow can't read (e.g. AVIF without a plugin) fall through to ffmpeg
+        if not written:
+            _video_thumbnail(input_path, temp_path, t, size)
+        os.replace(temp_path, thumb_path)
+        _prune_cache(cache_dir, THUMBNAIL_CACHE_MAX_FILES, THUMBNAIL_CACHE_MAX_BYTES, keep=thumb_path)
+        return True, thumb_path
+    except subprocess.CalledProcessError as e:
+        return False, f"Error creating thumbnail: FFmpeg exited with code {e.returncode}.\n{e.stderr}"
+    except FileNotFoundError:
+        return False, "Error: 'ffmpeg' command not found. Please ensure FFmpeg is installed and accessible in your system's PATH."
+    except Exception as e:
+        return False, f"An unexpected error occurred while creating a thumbnail: {e}"
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _gif_palette(input_path, fps, max_colors, input_options, clip_options, cache_dir, progress_callback=None):
+    """
+    Returns the path to a cached palette for input_path, running the palettegen pass only on a cache miss.
+
+    The palette depends on the input, frame rate, colour count and clip range, but not on the
+    output size or dither mode: it is built from a small fast-scaled copy of the frames. The
+    cache keeps the GIF_PALETTE_CACHE_MAX_FILES most recently used palettes.
+    """
+    key_source = f"{_file_identity(input_path)}|{fps}|{max_colors}|{input_options}|{clip_options}"
+    palette_path = os.path.join(cache_dir, f"{hashlib.sha1(key_source.encode('utf-8')).hexdigest()}.png")
+    if os.path.exists(palette_path):
+        _touch_cache_entry(palette_path)
+        if progress_callback:
+            progress_callback("Reusing cached GIF palette...")
+        return palette_path
+
+    if progress_callback:
+        progress_callback("Analysing colours for the GIF palette...")
+    analysis_filters = plan_video_filters('gif', bounding_box=GIF_PALETTE_ANALYSIS_BOX, scaler='fast_bilinear',
+                                          extra_filters=[f"fps={fps}"] if fps else None)
+    analysis_filters.append(f"palettegen=max_colors={max_colors}:stats_mode=diff")
+
+    temp_path = os.path.join(cache_dir, f"{os.path.basename(palette_path)}.{os.getpid()}.{os.urandom(4).hex()}.tmp.png")
+    command = ['ffmpeg', '-nostdin', '-v', 'error'] + input_options + ['-i', input_path] + clip_options
+    command.extend(['-vf', ','.join(analysis_filters), '-y', temp_path])
+    try:
+        _run_child(command)
+        os.replace(temp_path, palette_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    _prune_cache(cache_dir, GIF_PALETTE_CACHE_MAX_FILES, keep=palette_path)
+    return palette_path
+
+
+def _convert_gif(input_path, output_path, progress_callback=None, scale_width=None, scale_height=None,
+                 scale_percentage=None, scaler=None, fps=None, dither=None, max_colors=None,
+                 start_time=None, duration=None, cache_dir=None):
+    """
+    Converts to GIF in two stages: palettegen (cached) and paletteuse.
+
+    A palette built for the actual content gives far smaller and cleaner GIFs than ffmpeg's
+    generic one-pass conversion. Only changed frame regions are re-encoded (diff_mode=rectangle).
+
+    Returns:
+        tuple: (bool, str) - True and the output path, or False and an error message.
+    """
+    dither = dither or 'sierra2_4a'
+    if dither not in GIF_DITHER_MODES:
+        return False, f"Unknown GIF dither mode '{dither}'. Expected one of: {', '.join(GIF_DITHER_MODES)}"
+    max_colors = max_colors or 256
+    if cache_dir is None:
+        cache_dir = os.path.join(default_cache_dir(), 'palettes')
+
+    input_options = ['-ss', f"{start_time:.6f}"] if start_time else []
+    clip_options = ['-t', f"{duration:.6f}"] if duration is not None else []
+
+    try:
+        render_filters = plan_video_filters('gif', scale_width, scale_height, scale_percentage,
+                                            scaler=scaler or 'lanczos', extra_filters=[f"fps={fps}"] if fps else None)
+    except ValueError as e:
+        return False, str(e)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        palette_path = _gif_palette(input_path, fps, max_colors, input_options, clip_options, cache_dir, progress_callback)
+
+        render_chain = ','.join(render_filters) if render_filters else 'null'
+        filter_graph = f"[0:v]{render_chain}[frames];[frames][1:v]paletteuse=dither={dither}:diff_mode=rectangle"
+        command = ['ffmpeg', '-nostdin'] + input_options + ['-i', input_path, '-i', palette_path] + clip_options
+        command.extend(['-lavfi', filter_graph, '-loop', '0', output_path])
+        if progress_callback:
+            progress_callback(f"FFmpeg command: {' '.join(command)}")
+        _run_child(command)
+        return True, output_path
+    except subprocess.CalledProcessError as e:
+        return False, (
+            f"Error during GIF conversion: FFmpeg exited with code {e.returncode}.\n"
+            f"FFmpeg stderr:\n{e.stderr}\n"
+            "Please check the input file and GIF options."
+        )
+    except FileNotFoundError:
+        return False, "Error: 'ffmpeg' command not found. Please ensure FFmpeg is installed and accessible in your system's PATH."
+    except Exception as e:
+        return False, f"An unexpected error occurred during GIF conversion: {e}"
+
+
+class Converter:
+    """
+    A conversion session that keeps long-lived resources between calls.
+
+    The module functions rediscover everything on every call. A Converter resolves the
+    ffmpeg/ffprobe/yt-dlp executables once, detects ffmpeg's encoders once (and falls back to
+    ffmpeg's defaults for encoders a build lacks), keeps a pooled HTTP session for direct
+    downloads, caches probe results by file identity and owns a worker pool. The methods take
+    the same arguments as the module functions.
+
+    Usage:
+        with Converter(max_workers=4) as converter:
+            success, output_path = converter.convert('clip.mov', 'out', 'mp4', video_quality_preset='720p')
+            futures = [converter.submit(path, 'out', 'webp') for path in paths]
+    """
+
+    def __init__(self, ffmpeg=None, ffprobe=None, yt_dlp=None, max_workers=None, probe_cache_size=1024):
+        """
+        Args:
+            ffmpeg (str, optional): Path to ffmpeg. Defaults to the one on PATH.
+            ffprobe (str, optional): Path to ffprobe. Defaults to the one on PATH.
+            yt_dlp (str, optional): Path to yt-dlp. Defaults to the one on PATH.
+            max_workers (int, optional): Size of the worker pool used by submit(). Defaults to the number of cores.
+            probe_cache_size (int): Number of probe results to keep.
+        """
+        self.executables = {
+            'ffmpeg': ffmpeg or shutil.which('ffmpeg'),
+            'ffprobe': ffprobe or shutil.which('ffprobe'),
+            'yt-dlp': yt_dlp or shutil.which('yt-dlp'),
+        }
+        self.http = requests.Session()
+        self.max_workers = max_workers or _default_thread_count()
+        self.probe_cache_size = probe_cache_size
+        self._probe_cache = OrderedDict()
+        self._encoders = None
+        self._encoders_queried = False
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Waits for submitted jobs and releases the worker pool and HTTP connections.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.http.close()
+
+    @contextlib.contextmanager
+    def _active(self):
+        """
+        Makes this session the one module functions use on the current thread.
+        """
+        outer = getattr(_job_local, 'session', None)
+        _job_local.session = self
+        try:
+            yield
+        finally:
+            _job_local.session = outer
+
+    def encoders(self):
+        """
+        Returns the set of encoder names ffmpeg supports (queried once per session), or None if the list couldn't be read.
+        """
+        with self._lock:
+            if self._encoders_queried:
+                return self._encoders
+        encoders = set()
+        try:
+            with self._active():
+                process = _run_child(['ffmpeg', '-hide_banner', '-encoders'], capture_stdout=True)
+            listing = process.stdout.split(' ------', 1)[-1] # The legend above the line has no encoders
+            for line in listing.splitlines():
+                fields = line.split()
+                if len(fields) >= 2:
+                    encoders.add(fields[1])
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            encoders = None # Unknown: don't rule anything out
+        with self._lock:
+            self._encoders = encoders
+            self._encoders_queried = True
+        return encoders
+
+    def has_encoder(self, encoder):
+        """
+        Returns True if ffmpeg has the encoder (or the encoder list couldn't be read).
+        """
+        encoders = self.encoders()
+        return encoders is None or encoder in encoders
+
+    def probe(self, input_path):
+        """
+        probe_media() with a cache keyed by file identity (path, size, modification time).
+        """
+        try:
+            key = _file_identity(input_path)
+        except OSError:
+            key = None
+        if key is not None:
+            with self._lock:
+                if key in self._probe_cache:
+                    self._probe_cache.move_to_end(key)
+                    return True, self._probe_cache[key]
+        with self._active():
+            success, info = _run_ffprobe(input_path)
+        if success and key is not None:
+            with self._lock:
+                self._probe_cache[key] = info
+                while len(self._probe_cache) > self.probe_cache_size:
+                    self._probe_cache.popitem(last=False)
+        return success, info
+
+    def convert(self, input_path, output_directory, output_format, progress_callback=None, **options):
+        """
+        convert_media() within this session.
+        """
+        with self._active():
+            return convert_media(input_path, output_directory, output_format, progress_callback, **options)
+
+    def convert_batch(self, input_paths, output_directory, output_format, progress_callback=None, **options):
+        """
+        convert_batch() within this session.
+        """
+        with self._active():
+            return convert_batch(input_paths, output_directory, output_format, progress_callback, **options)
+
+    def run_jobs(self, jobs, progress_callback=None, **scheduler_options):
+        """
+        Runs jobs with a ConversionScheduler within this session. See ConversionScheduler.run.
+        """
+        with self._active():
+            return ConversionScheduler(**scheduler_options).run(jobs, progress_callback)
+
+    def convert_directory(self, input_root, output_root, output_format, progress_callback=None, **options):
+        """
+        convert_directory() within this session.
+        """
+        with self._active():
+            return convert_directory(input_root, output_root, output_format, progress_callback, **options)
+
+    def convert_url_list(self, entries, output_directory, media_type, output_format, progress_callback=None, **options):
+        """
+        convert_url_list() within this session.
+        """
+        with self._active():
+            return convert_url_list(entries, output_directory, media_type, output_format, progress_callback, **options)
+
+    def convert_playlist(self, url, output_directory, media_type, output_format, progress_callback=None, **options):
+        """
+        convert_playlist() within this session.
+        """
+        with self._active():
+            return convert_playlist(url, output_directory, media_type, output_format, progress_callback, **options)
+
+    def download(self, url, download_base_dir, media_type, progress_callback=None, **options):
+        """
+        download_media_from_url() within this session.
+        """
+        with self._active():
+            return download_media_from_url(url, download_base_dir, media_type, progress_callback, **options)
+
+    def preview(self, input_path, output_format, progress_callback=None, **options):
+        """
+        preview_conversion() within this session.
+        """
+        with self._active():
+            return preview_conversion(input_path, output_format, progress_callback, **options)
+
+    def thumbnail(self, input_path, **options):
+        """
+        thumbnail() within this session.
+        """
+        with self._active():
+            return thumbnail(input_path, **options)
+
+    def submit(self, input_path, output_directory, output_format, **options):
+        """
+        Queues a convert() on the session's worker pool.
+
+        Returns:
+            concurrent.futures.Future: Resolves to convert()'s (bool, str) result.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='converter')
+            executor = self._executor
+        priority = getattr(_job_local, 'priority', None)
+
+        def run():
+            # The job keeps the submitting thread's priority lane
+            with job_priority(priority):
+                return self.convert(input_path, output_directory, output_format, **options)
+        return executor.submit(run)
@@ -0,0 +1,738 @@
+import os
+import sys
+import json
+import time
+import hmac
+import uuid
+import shutil
+import socket
+import argparse
+import ipaddress
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import requests # Workers talk to the coordinator over HTTP
+
+# Conversions run with the same core as the desktop app
+from converter_core import Converter, available_memory_bytes, make_scratch_dir, OUTPUT_FORMATS, \
+    output_part_path, publish_output
+
+# --- Farm protocol ---
+FARM_DEFAULT_PORT = 8765
+FARM_LEASE_SECONDS = 60 # A job goes back to the queue if its worker isn't heard from for this long
+FARM_MAX_ATTEMPTS = 3 # Leases per job before it is marked failed (a job that crashes every worker stops here)
+FARM_POLL_SECONDS = 2 # Idle workers ask for work this often
+FARM_CHUNK_BYTES = 1024 * 1024 # Inputs and outputs are streamed in chunks of this size
+FARM_REQUEST_TIMEOUT = 30 # Seconds a worker waits for the coordinator before retrying
+
+# convert_media options a submitted job may set. Paths, logging and threads belong to the worker.
+FARM_JOB_OPTIONS = ('image_quality', 'scale_width', 'scale_height', 'scale_percentage',
+                    'video_quality_preset', 'video_speed_tier', 'image_speed_tier', 'scaler',
+                    'start_time', 'end_time', 'duration', 'audio_only',
+                    'gif_fps', 'gif_dither', 'gif_max_colors', 'memory_limit', 'target_size')
+
+# Output formats a job may ask for: the formats ffmpeg can write (output names are built from these, so nothing else is accepted)
+FARM_OUTPUT_FORMATS = frozenset(extension for extensions in OUTPUT_FORMATS.values() for extension in extensions)
+
+
+def _is_loopback(host):
+    """
+    Returns True if host only accepts connections from this machine.
+    """
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False # Host names and '' (all interfaces) are reachable from outside
+
+
+def _check_output_format(output_format):
+    """
+    Returns output_format in lower case.
+
+    Raises:
+        ValueError: If it isn't one of FARM_OUTPUT_FORMATS.
+    """
+    output_format = str(output_format).lower()
+    if output_format not in FARM_OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format!r}")
+    return output_format
+
+
+class FarmCoordinator:
+    """
+    Hands out conversion jobs to worker processes over HTTP and collects their outputs.
+
+    Jobs are convert_media calls on files the coordinator can read. Workers register with their
+    number of slots and lease one job per free slot. A lease lasts FARM_LEASE_SECONDS and is
+    renewed by the worker's heartbeat; when a worker stops sending heartbeats its jobs go back to
+    the queue and another worker picks them up. Inputs are streamed to the worker and outputs
+    streamed back, so workers need no shared storage. A result is only accepted with the lease
+    token it was leased with, so a worker that was given up on can't overwrite a newer result.
+
+    Every request must carry the token as 'Authorization: Bearer <token>' if one is set; a
+    coordinator reachable from other machines must have one. Jobs can only read files below
+    input_root, since anyone who may submit jobs can read their inputs back.
+    """
+
+    def __init__(self, output_directory, host='127.0.0.1', port=FARM_DEFAULT_PORT, token=None,
+                 lease_seconds=FARM_LEASE_SECONDS, max_attempts=FARM_MAX_ATTEMPTS, input_root=None):
+        """
+        Args:
+            output_directory (str): Where finished outputs are saved.
+            host (str): Interface to listen on. Use '0.0.0.0' to accept workers from other machines
+                (this needs a token).
+            port (int): Port to listen on (0 picks a free port; see self.url).
+            token (str, optional): Shared secret that workers and clients must send.
+            lease_seconds (float): How long a lease lasts without a heartbeat.
+            max_attempts (int): Leases per job before it is marked failed.
+            input_root (str, optional): Only files below this folder can be submitted. Defaults to the current directory.
+
+        Raises:
+            ValueError: If host isn't a loopback address and no token is given.
+        """
+        if not token and not _is_loopback(host):
+            raise ValueError(f"A token is required to listen on {host or 'all interfaces'}; "
+                             "without one anyone who can reach the port could read files through the farm.")
+        os.makedirs(output_directory, exist_ok=True)
+        self.output_directory = output_directory
+        self.input_root = os.path.realpath(input_root or os.getcwd())
+        self.token = token
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.jobs = OrderedDict()
+        self.workers = {}
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+
+        handler = type('CoordinatorHandler', (_CoordinatorHandler,), {'coordinator': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host if host not in ('', '0.0.0.0') else '127.0.0.1'}:{self.server.server_address[1]}"
+
+    def start(self):
+        """
+        Starts serving and expiring leases in background threads.
+        """
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._expire_leases, daemon=True).start()
+        return self
+
+    def stop(self):
+        """
+        Stops the server. Jobs that haven't finished are left as they are.
+        """
+        self._stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def submit(self, input_path, output_format, overwrite=False, **options):
+        """
+        Queues a conversion.
+
+        Args:
+            input_path (str): The input media file, below input_root.
+            output_format (str): The desired output format (one of FARM_OUTPUT_FORMATS).
+            overwrite (bool): Replace an existing output instead of picking a free name.
+            **options: convert_media options (see FARM_JOB_OPTIONS).
+
+        Returns:
+            str: The job ID.
+
+        Raises:
+            ValueError: If the input doesn't exist or is outside input_root, or the format or an option isn't allowed.
+        """
+        # Symlinks are resolved first, so a link inside the root can't point outside it
+        real_path = os.path.realpath(str(input_path))
+        if os.path.commonpath([real_path, self.input_root]) != self.input_root:
+            raise ValueError(f"Input is outside the coordinator's input folder: {input_path}")
+        if not os.path.isfile(real_path):
+            raise ValueError(f"Input file not found: {input_path}")
+        output_format = _check_output_format(output_format)
+        unknown = [key for key in options if key not in FARM_JOB_OPTIONS]
+        if unknown:
+            raise ValueError(f"Options not allowed for farm jobs: {', '.join(unknown)}")
+        job_id = uuid.uuid4().hex
+        with self._condition:
+            self.jobs[job_id] = {
+                'id': job_id, 'input_path': real_path, 'output_format': output_format,
+                'options': options, 'overwrite': overwrite, 'state': 'pending', 'attempts': 0,
+                'worker': None, 'lease': None, 'expires': None, 'output': None, 'message': None,
+            }
+            self._condition.notify_all()
+        return job_id
+
+    def status(self):
+        """
+        Returns a snapshot of every job: its ID, input, state, attempts, worker and output or error message.
+        """
+        with self._condition:
+            return [{key: job[key] for key in ('id', 'input_path', 'output_format', 'state', 'attempts',
+                                                'worker', 'output', 'message')}
+                    for job in self.jobs.values()]
+
+    def wait(self, timeout=None):
+        """
+        Waits until every submitted job is done or failed.
+
+        Returns:
+            list: One (input_path, success, message) tuple per job, in submission order. The
+                message is the output path on success. Jobs still running at the timeout report
+                False and their state.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            while any(job['state'] in ('pending', 'running') for job in self.jobs.values()):
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return [(job['input_path'], job['state'] == 'done',
+                     job['output'] if job['state'] == 'done' else job['message'] or job['state'])
+                    for job in self.jobs.values()]
+
+    # --- Worker side of the protocol; called by the request handler ---
+
+    def _register(self, info):
+        worker_id = uuid.uuid4().hex
+        with self._condition:
+            self.workers[worker_id] = {'name': str(info.get('name', worker_id)), 'slots': max(1, int(info.get('slots', 1))),
+                                       'cores': info.get('cores'), 'memory': info.get('memory'), 'seen': time.monotonic()}
+        return {'worker_id': worker_id, 'lease_seconds': self.lease_seconds}
+
+    def _heartbeat(self, worker_id):
+        """
+        Renews all leases of a worker. Returns False for workers that were given up on.
+        """
+        with self._condition:
+            worker = self.workers.get(worker_id)
+            if worker is None:
+                return False
+            now = time.monotonic()
+            worker['seen'] = now
+            for job in self.jobs.values():
+                if job['state'] == 'running' and job['worker'] == worker_id:
+                    job['expires'] = now + self.lease_seconds
+            return True
+
+    def _lease(self, worker_id):
+        """
+        Leases the next pending job to a worker with a free slot. Returns None if there is none (or no free slot).
+        """
+        with self._condition:
+            worker = self.workers.get(worker_id)
+            if worker is None:
+                raise KeyError(worker_id)
+            worker['seen'] = time.monotonic()
+            running = sum(1 for job in self.jobs.values() if job['state'] == 'running' and job['worker'] == worker_id)
+            if running >= worker['slots']:
+                return None
+            for job in self.jobs.values():
+                if job['state'] != 'pending':
+                    continue
+                try:
+                    input_size = os.path.getsize(job['input_path'])
+                except OSError as e:
+                    job.update(state='failed', message=f"Input can't be read: {e}")
+                    self._condition.notify_all()
+                    continue
+                job.update(state='running', worker=worker_id, lease=uuid.uuid4().hex,
+                           expires=time.monotonic() + self.lease_seconds, attempts=job['attempts'] + 1)
+                return {'id': job['id'], 'lease': job['lease'], 'output_format': job['output_format'],
+                        'options': job['options'], 'input_name': os.path.basename(job['input_path']),
+                        'input_size': input_size}
+            return None
+
+    def _leased_job(self, job_id, lease):
+        """
+        Returns the job if lease is its current lease, else None. Call with the lock held.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job['state'] != 'running' or job['lease'] != lease:
+            return None
+        return job
+
+    def _receive_output(self, job_id, lease, stream, length):
+        """
+        Saves an uploaded output next to its final name and publishes it if the lease is still valid.
+        Returns the output path, or None if the lease is gone.
+        """
+        with self._condition:
+            job = self._leased_job(job_id, lease)
+            if job is None:
+                return None
+            base_name = os.path.splitext(os.path.basename(job['input_path']))[0]
+            final_path = os.path.join(self.output_directory, f"{base_name}.{job['output_format']}")
+        part_path = output_part_path(final_path)
+        try:
+            with open(part_path, 'wb') as f:
+                remaining = length
+                while remaining > 0:
+                    chunk = stream.read(min(FARM_CHUNK_BYTES, remaining))
+                    if not chunk:
+                        raise ConnectionError("Upload ended early")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            with self._condition:
+                job = self._leased_job(job_id, lease)
+                if job is None:
+                    return None # Reassigned while uploading; the new lease delivers the result
+                output_path = publish_output(part_path, final_path, job['overwrite'])
+                job.update(state='done', output=output_path, message=None, lease=None, expires=None)
+                self._condition.notify_all()
+                return output_path
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    def _fail(self, job_id, lease, message):
+        """
+        Records a failed attempt. The job is retried on another lease until max_attempts is reached.
+        """
+        with self._condition:
+            job = self._leased_job(job_id, lease)
+            if job is None:
+                return False
+            self._release(job, message)
+            return True
+
+    def _release(self, job, message):
+        """
+        Puts a job back in the queue, or fails it for good after max_attempts. Call with the lock held.
+        """
+        job.update(worker=None, lease=None, expires=None, message=message)
+        job['state'] = 'failed' if job['attempts'] >= self.max_attempts else 'pending'
+        self._condition.notify_all()
+
+    def _expire_leases(self):
+        """
+        Returns the jobs of workers that stopped sending heartbeats to the queue.
+        """
+        while not self._stopped.wait(min(self.lease_seconds / 4, 5)):
+            now = time.monotonic()
+            with self._condition:
+                for job in self.jobs.values():
+                    if job['state'] == 'running' and job['expires'] < now:
+                        self._release(job, f"Lease expired on worker {self.workers.get(job['worker'], {}).get('name')}")
+                for worker_id, worker in list(self.workers.items()):
+                    if now - worker['seen'] > 3 * self.lease_seconds:
+                        del self.workers[worker_id] # It registers again if it comes back
+
+
+class _CoordinatorHandler(BaseHTTPRequestHandler):
+    """
+    The coordinator's HTTP API. All bodies are JSON except job inputs and outputs, which are raw bytes.
+
+        POST /workers                    register {name, slots, cores, memory} -> {worker_id, lease_seconds}
+        POST /workers/<id>/heartbeat     renew the worker's leases (404: register again)
+        POST /workers/<id>/lease         next job for the worker, or 204
+        GET  /jobs/<id>/input?lease=     the job's input file
+        PUT  /jobs/<id>/output?lease=    the finished output
+        POST /jobs/<id>/fail?lease=      {message}
+        POST /jobs                       submit {input_path, output_format, overwrite, options} -> {id}
+        GET  /jobs                       status of all jobs
+    """
+    coordinator = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass # Requests are too frequent to log; job state is visible through GET /jobs
+
+    def _send_json(self, status, body=None):
+        data = json.dumps(body if body is not None else {}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+    def _route(self):
+        """
+        Checks the token and splits the path. Returns (parts, query) or None once an error was sent.
+        """
+        token = self.coordinator.token
+        # Constant-time comparison, so response times don't give the token away byte by byte
+        if token and not hmac.compare_digest(self.headers.get('Authorization', '').encode('utf-8'),
+                                             f"Bearer {token}".encode('utf-8')):
+            self._send_json(401, {'error': 'Missing or wrong token'})
+            return None
+        url = urlparse(self.path)
+        return [part for part in url.path.split('/') if part], {key: values[0] for key, values in parse_qs(url.query).items()}
+
+    def do_GET(self):
+        route = self._route()
+        if route is None:
+            return
+        parts, query = route
+        coordinator = self.coordinator
+        if parts == ['jobs']:
+            self._send_json(200, coordinator.status())
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'input':
+            with coordinator._condition:
+                job = coordinator._leased_job(parts[1], query.get('lease'))
+                input_path = job['input_path'] if job else None
+            if input_path is None:
+                self._send_json(409, {'error': 'Lease is not valid'})
+                return
+            try:
+                f = open(input_path, 'rb')
+            except OSError as e:
+                self._send_json(410, {'error': f"Input can't be read: {e}"})
+                return
+            with f:
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+                self.end_headers()
+                shutil.copyfileobj(f, self.wfile, FARM_CHUNK_BYTES)
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def do_PUT(self):
+        route = self._route()
+        if route is None:
+            return
+        parts, query = route
+        if len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'output':
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                output_path = self.coordinator._receive_output(parts[1], query.get('lease'), self.rfile, length)
+            except (OSError, ConnectionError) as e:
+                self.close_connection = True
+                self._send_json(500, {'error': f"Could not save output: {e}"})
+                return
+            if output_path is None:
+                self.close_connection = True # The body may not have been read
+                self._send_json(409, {'error': 'Lease is not valid'})
+            else:
+                self._send_json(200, {'output': output_path})
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        route = self._route()
+        if route is None:
+            return
+        parts, query = route
+        coordinator = self.coordinator
+        try:
+            body = self._read_json()
+        except ValueError:
+            self._send_json(400, {'error': 'Body is not JSON'})
+            return
+
+        if parts == ['workers']:
+            self._send_json(200, coordinator._register(body))
+        elif len(parts) == 3 and parts[0] == 'workers' and parts[2] == 'heartbeat':
+            self._send_json(200 if coordinator._heartbeat(parts[1]) else 404)
+        elif len(parts) == 3 and parts[0] == 'workers' and parts[2] == 'lease':
+            try:
+                job = coordinator._lease(parts[1])
+            except KeyError:
+                self._send_json(404, {'error': 'Unknown worker'})
+                return
+            if job is None:
+                self.send_response(204)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+            else:
+                self._send_json(200, job)
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'fail':
+            accepted = coordinator._fail(parts[1], query.get('lease'), str(body.get('message', 'Failed')))
+            self._send_json(200 if accepted else 409)
+        elif parts == ['jobs']:
+            try:
+                job_id = coordinator.submit(body.get('input_path', ''), body.get('output_format', ''),
+                                            bool(body.get('overwrite')), **(body.get('options') or {}))
+            except (ValueError, TypeError) as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            self._send_json(200, {'id': job_id})
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+
+class FarmWorker:
+    """
+    Pulls jobs from a FarmCoordinator and converts them with convert_media.
+
+    The worker registers with its slot count, cores and free memory, then runs one loop per slot:
+    lease a job, download its input into a scratch folder, convert it, and upload the output (or
+    report the failure). A heartbeat thread renews the leases of running jobs. If the coordinator
+    has forgotten the worker (e.g. after a restart), it registers again.
+    """
+
+    def __init__(self, coordinator_url, slots=None, name=None, token=None, scratch_dir=None, progress_callback=None):
+        """
+        Args:
+            coordinator_url (str): e.g. 'http://10.0.0.5:8765'.
+            slots (int, optional): Concurrent jobs. Defaults to one per 4 cores (at least one).
+            name (str, optional): Name shown in the coordinator's status. Defaults to host name and PID.
+            token (str, optional): The coordinator's shared secret.
+            scratch_dir (str, optional): Where inputs and outputs are kept while a job runs.
+            progress_callback (callable, optional): A function to call with progress updates.
+        """
+        self.url = coordinator_url.rstrip('/')
+        self.cores = os.cpu_count() or 1
+        self.slots = slots or max(1, self.cores // 4)
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.scratch_dir = scratch_dir
+        self.progress_callback = progress_callback
+        self.token = token
+        self.worker_id = None
+        self.lease_seconds = FARM_LEASE_SECONDS
+        self._register_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._local = threading.local()
+
+    @property
+    def http(self):
+        """
+        The calling thread's requests.Session. Sessions aren't thread-safe, so every slot and the heartbeat get their own.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            if self.token:
+                session.headers['Authorization'] = f"Bearer {self.token}"
+        return session
+
+    def _close_session(self):
+        session = getattr(self._local, 'session', None)
+        if session is not None:
+            session.close()
+            self._local.session = None
+
+    def _report(self, message):
+        if self.progress_callback:
+            self.progress_callback(message)
+
+    def _register(self, stale_id=None):
+        """
+        Registers with the coordinator, once for all slots even if several notice a lost registration at once.
+        """
+        with self._register_lock:
+            if self.worker_id != stale_id:
+                return
+            response = self.http.post(f"{self.url}/workers", json={
+                'name': self.name, 'slots': self.slots, 'cores': self.cores, 'memory': available_memory_bytes(),
+            }, timeout=FARM_REQUEST_TIMEOUT)
+            response.raise_for_status()
+            info = response.json()
+            self.worker_id, self.lease_seconds = info['worker_id'], info['lease_seconds']
+            self._report(f"Registered with {self.url} as {self.name} ({self.slots} slots)")
+
+    def stop(self):
+        """
+        Lets the slots finish their current job and stop.
+        """
+        self._stopped.set()
+
+    def run(self):
+        """
+        Works until stop() is called. Blocks the calling thread.
+        """
+        while not self._stopped.is_set():
+            try:
+                self._register(self.worker_id)
+                break
+            except requests.exceptions.RequestException as e:
+                self._report(f"Coordinator not reachable ({e}), retrying...")
+                self._stopped.wait(FARM_POLL_SECONDS)
+
+        with Converter() as converter:
+            threads = [threading.Thread(target=self._heartbeat_loop, daemon=True)]
+            threads += [threading.Thread(target=self._slot_loop, args=(converter,), daemon=True) for _ in range(self.slots)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+    def _heartbeat_loop(self):
+        try:
+            while not self._stopped.wait(self.lease_seconds / 3):
+                worker_id = self.worker_id
+                if worker_id is None:
+                    continue
+                try:
+                    response = self.http.post(f"{self.url}/workers/{worker_id}/heartbeat", timeout=FARM_REQUEST_TIMEOUT)
+                    if response.status_code == 404:
+                        self._register(worker_id)
+                except requests.exceptions.RequestException:
+                    pass # Leases run out if this keeps failing, and the jobs move to other workers
+        finally:
+            self._close_session()
+
+    def _slot_loop(self, converter):
+        try:
+            while not self._stopped.is_set():
+                worker_id = self.worker_id
+                try:
+                    response = self.http.post(f"{self.url}/workers/{worker_id}/lease", timeout=FARM_REQUEST_TIMEOUT)
+                    if response.status_code == 404:
+                        self._register(worker_id)
+                        continue
+                    response.raise_for_status()
+                except requests.exceptions.RequestException:
+                    self._stopped.wait(FARM_POLL_SECONDS)
+                    continue
+                if response.status_code == 204:
+                    self._stopped.wait(FARM_POLL_SECONDS)
+                    continue
+                self._run_job(converter, response.json())
+        finally:
+            self._close_session()
+
+    def _run_job(self, converter, job):
+        """
+        Runs one leased job: input download, conversion and output upload.
+        """
+        job_url = f"{self.url}/jobs/{job['id']}"
+        lease = {'lease': job['lease']}
+        work_dir = make_scratch_dir('.farm_', self.scratch_dir)
+        try:
+            input_path = os.path.join(work_dir, os.path.basename(job['input_name']) or 'input')
+            with self.http.get(f"{job_url}/input", params=lease, stream=True, timeout=FARM_REQUEST_TIMEOUT) as response:
+                response.raise_for_status()
+                with open(input_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=FARM_CHUNK_BYTES):
+                        f.write(chunk)
+
+            output_format = _check_output_format(job['output_format'])
+            self._report(f"Converting {job['input_name']} to {output_format}...")
+            options = {key: value for key, value in job['options'].items() if key in FARM_JOB_OPTIONS}
+            success, message = converter.convert(input_path, os.path.join(work_dir, 'output'), output_format,
+                                                 threads=max(1, self.cores // self.slots), **options)
+            if not success:
+                self.http.post(f"{job_url}/fail", params=lease, json={'message': message}, timeout=FARM_REQUEST_TIMEOUT)
+                self._report(f"Failed: {job['input_name']}")
+                return
+
+            with open(message, 'rb') as f:
+                response = self.http.put(f"{job_url}/output", params=lease, data=f, timeout=FARM_REQUEST_TIMEOUT,
+                                         headers={'Content-Type': 'application/octet-stream'})
+            if response.status_code == 409:
+                self._report(f"Lease of {job['input_name']} expired; result discarded")
+            else:
+                response.raise_for_status()
+                self._report(f"Finished: {job['input_name']} -> {response.json()['output']}")
+        except (requests.exceptions.RequestException, OSError, ValueError) as e:
+            try:
+                self.http.post(f"{job_url}/fail", params=lease, json={'message': f"Worker {self.name}: {e}"},
+                               timeout=FARM_REQUEST_TIMEOUT)
+            except requests.exceptions.RequestException:
+                pass # The lease runs out and the job is retried
+            self._report(f"Failed: {job['input_name']}: {e}")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _parse_option(text):
+    """
+    Parses a key=value command line option. Values are JSON where possible (numbers, true/false), else strings.
+    """
+    key, _, value = text.partition('=')
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def main(argv=None):
+    """
+    Command line entry point: 'coordinator', 'worker' and 'submit' subcommands.
+    """
+    parser = argparse.ArgumentParser(description="Distributed media conversion with converter_core.")
+    parser.add_argument('--token', default=os.environ.get('FARM_TOKEN'), help="Shared secret (default: $FARM_TOKEN)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    coordinator_parser = commands.add_parser('coordinator', help="Serve jobs to workers")
+    coordinator_parser.add_argument('output_directory')
+    coordinator_parser.add_argument('--host', default='127.0.0.1',
+                                    help="Interface to listen on; anything but loopback needs --token")
+    coordinator_parser.add_argument('--input-root', help="Only files below this folder can be submitted (default: current folder)")
+    coordinator_parser.add_argument('--port', type=int, default=FARM_DEFAULT_PORT)
+    coordinator_parser.add_argument('--lease-seconds', type=float, default=FARM_LEASE_SECONDS)
+
+    worker_parser = commands.add_parser('worker', help="Convert jobs from a coordinator")
+    worker_parser.add_argument('coordinator_url')
+    worker_parser.add_argument('--slots', type=int)
+    worker_parser.add_argument('--name')
+    worker_parser.add_argument('--scratch-dir')
+
+    submit_parser = commands.add_parser('submit', help="Queue files on a coordinator")
+    submit_parser.add_argument('coordinator_url')
+    submit_parser.add_argument('output_format')
+    submit_parser.add_argument('input_paths', nargs='+')
+    submit_parser.add_argument('--option', action='append', default=[], metavar='KEY=VALUE',
+                               help="convert_media option, e.g. --option video_speed_tier=fast")
+    submit_parser.add_argument('--overwrite', action='store_true')
+    submit_parser.add_argument('--wait', action='store_true', help="Wait until the submitted jobs finish")
+
+    args = parser.parse_args(argv)
+    if args.command == 'coordinator':
+        try:
+            coordinator = FarmCoordinator(args.output_directory, args.host, args.port, args.token, args.lease_seconds,
+                                          input_root=args.input_root)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        print(f"Coordinator listening on {coordinator.url}, serving inputs below {coordinator.input_root}, "
+              f"saving outputs to {args.output_directory}")
+        coordinator.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            coordinator.stop()
+        return 0
+
+    if args.command == 'worker':
+        worker = FarmWorker(args.coordinator_url, args.slots, args.name, args.token, args.scratch_dir, print)
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            worker.stop()
+        return 0
+
+    http = requests.Session()
+    if args.token:
+        http.headers['Authorization'] = f"Bearer {args.token}"
+    url = args.coordinator_url.rstrip('/')
+    options = dict(_parse_option(option) for option in args.option)
+    job_ids = []
+    for input_path in args.input_paths:
+        response = http.post(f"{url}/jobs", json={'input_path': os.path.abspath(input_path), 'output_format': args.output_format,
+                                                   'overwrite': args.overwrite, 'options': options}, timeout=FARM_REQUEST_TIMEOUT)
+        if response.status_code != 200:
+            print(f"Could not submit {input_path}: {response.json().get('error')}", file=sys.stderr)
+            continue
+        job_ids.append(response.json()['id'])
+    print(f"Submitted {len(job_ids)} jobs.")
+    if not args.wait:
+        return 0 if len(job_ids) == len(args.input_paths) else 1
+
+    while True:
+        jobs = [job for job in http.get(f"{url}/jobs", timeout=FARM_REQUEST_TIMEOUT).json() if job['id'] in job_ids]
+        if all(job['state'] in ('done', 'failed') for job in jobs):
+            break
+        time.sleep(FARM_POLL_SECONDS)
+    for job in jobs:
+        print(f"{job['state']}: {job['input_path']} -> {job['output'] or job['message']}")
+    return 0 if all(job['state'] == 'done' for job in jobs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
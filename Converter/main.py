@@ -5,12 +5,31 @@ import os
 import threading
 import tkinter as tk
 import json # For saving/loading settings
+import time
 import shutil # For removing temporary directories
-import tempfile # For creating temporary directories
 from urllib.parse import urlparse # To check for direct image links
 
 # Import the core conversion functions from the separate file
-from converter_core import convert_media, download_media_from_url
+from converter_core import Converter, parse_timestamp, make_scratch_dir, format_usage, default_cache_dir, GIF_DITHER_MODES, INPUT_EXTENSIONS, \
+    parse_url_list, write_url_report, set_download_limit, job_priority
+
+# Maps the labels shown in the video quality menu to the preset keys understood by convert_media
+VIDEO_QUALITY_PRESET_LABELS = {
+    "Default": None,
+    "1080p": "1080p",
+    "720p": "720p",
+    "480p": "480p",
+    "Best Quality (CRF 18)": "best_crf",
+    "Medium Quality (CRF 23)": "medium_crf",
+    "Low Quality (CRF 28)": "low_crf",
+}
+
+# Maps the labels shown in the encode speed menus to convert_media speed tiers
+SPEED_TIER_LABELS = {
+    "Fast": "fast",
+    "Balanced": "balanced",
+    "Small File": "small",
+}
 
 class MediaConverterApp(ctk.CTk):
     def __init__(self):
@@ -32,6 +51,14 @@ class MediaConverterApp(ctk.CTk):
         self.settings_file = "settings.json"
         self.load_settings()
 
+        # One conversion session for the app: executables, encoders and probe results are looked up once
+        self.converter = Converter()
+        set_download_limit(self.settings.get("download_limit_kib", 0) * 1024)
+
+        # An imported URL list; the link field shows url_list_text while the list is in use
+        self.url_list_entries = []
+        self.url_list_text = None
+
         # Set default appearance mode and color theme for a modern look
         ctk.set_appearance_mode("Dark") # Force Dark mode for a consistent modern feel
         ctk.set_default_color_theme("blue") # Default blue theme
@@ -175,16 +202,25 @@ class MediaConverterApp(ctk.CTk):
         )
         self.back_button.grid(row=0, column=0, padx=25, pady=(15, 0), sticky="nw")
 
+        # Input Preview - thumbnail of the selected input file
+        self.input_preview_label = ctk.CTkLabel(self.conversion_options_frame, text="", width=160, height=90, font=ctk.CTkFont(size=13), text_color="#A0A0A0")
+        self.input_preview_label.grid(row=0, column=1, rowspan=2, padx=(0, 25), pady=(15, 0), sticky="ne")
+        self.input_preview_image = None
+
 
         # Input File Section (Browse)
-        self.input_label = ctk.CTkLabel(self.conversion_options_frame, text="Input File (Browse):", font=ctk.CTkFont(family="Segoe UI", size=17, weight="bold"), text_color="#E0E0E0")
+        self.input_label = ctk.CTkLabel(self.conversion_options_frame, text="Input File or Folder (Browse):", font=ctk.CTkFont(family="Segoe UI", size=17, weight="bold"), text_color="#E0E0E0")
         self.input_label.grid(row=1, column=0, columnspan=2, padx=25, pady=(25, 8), sticky="w")
 
-        self.input_path_entry = ctk.CTkEntry(self.conversion_options_frame, placeholder_text="Select input media file...", height=40, corner_radius=10, font=ctk.CTkFont(size=14), fg_color="#4A4A4A", border_color="#6A6A6A", text_color="#E0E0E0")
+        self.input_path_entry = ctk.CTkEntry(self.conversion_options_frame, placeholder_text="Select input media file or folder...", height=40, corner_radius=10, font=ctk.CTkFont(size=14), fg_color="#4A4A4A", border_color="#6A6A6A", text_color="#E0E0E0")
         self.input_path_entry.grid(row=2, column=0, padx=25, pady=8, sticky="ew")
 
+        # Browse a single file, or a whole folder that is converted recursively
+        self.input_buttons_frame = ctk.CTkFrame(self.conversion_options_frame, fg_color="transparent")
+        self.input_buttons_frame.grid(row=2, column=1, padx=(0, 25), pady=8, sticky="e")
+
         self.browse_input_button = ctk.CTkButton(
-            self.conversion_options_frame,
+            self.input_buttons_frame,
             text="Browse",
             command=self.browse_input_file,
             width=110, height=40, corner_radius=10,
@@ -193,7 +229,17 @@ class MediaConverterApp(ctk.CTk):
             compound="left",
             fg_color="#6A6A6A", hover_color="#8A8A8A", border_width=2, border_color="#8A8A8A"
         )
-        self.browse_input_button.grid(row=2, column=1, padx=(0, 25), pady=8, sticky="e")
+        self.browse_input_button.grid(row=0, column=0)
+
+        self.browse_folder_button = ctk.CTkButton(
+            self.input_buttons_frame,
+            text="Folder",
+            command=self.browse_input_folder,
+            width=90, height=40, corner_radius=10,
+            font=ctk.CTkFont(family="Segoe UI", size=15, weight="bold"),
+            fg_color="#6A6A6A", hover_color="#8A8A8A", border_width=2, border_color="#8A8A8A"
+        )
+        self.browse_folder_button.grid(row=0, column=1, padx=(8, 0))
 
         # Input File Section (Paste Link - Enabled but with warning)
         self.link_input_label = ctk.CTkLabel(self.conversion_options_frame, text="Input File (Paste Link - Requires yt-dlp for most URLs):", font=ctk.CTkFont(family="Segoe UI", size=17, weight="bold"), text_color="#E0E0E0")
@@ -202,8 +248,12 @@ class MediaConverterApp(ctk.CTk):
         self.link_input_entry = ctk.CTkEntry(self.conversion_options_frame, placeholder_text="Paste direct file URL or video/audio platform link (e.g., YouTube)...", height=40, corner_radius=10, font=ctk.CTkFont(size=14), fg_color="#4A4A4A", border_color="#6A6A6A", text_color="#E0E0E0")
         self.link_input_entry.grid(row=4, column=0, padx=25, pady=8, sticky="ew")
 
+        # Paste one link (or a copied list of links), or import a list of links from a text/CSV file
+        self.link_buttons_frame = ctk.CTkFrame(self.conversion_options_frame, fg_color="transparent")
+        self.link_buttons_frame.grid(row=4, column=1, padx=(0, 25), pady=8, sticky="e")
+
         self.paste_link_button = ctk.CTkButton(
-            self.conversion_options_frame,
+            self.link_buttons_frame,
             text="Paste",
             command=self.paste_link,
             width=110, height=40, corner_radius=10,
@@ -212,7 +262,21 @@ class MediaConverterApp(ctk.CTk):
             compound="left",
             fg_color="#6A6A6A", hover_color="#8A8A8A", border_width=2, border_color="#8A8A8A"
         )
-        self.paste_link_button.grid(row=4, column=1, padx=(0, 25), pady=8, sticky="e")
+        self.paste_link_button.grid(row=0, column=0)
+
+        self.import_links_button = ctk.CTkButton(
+            self.link_buttons_frame,
+            text="List",
+            command=self.import_url_list,
+            width=90, height=40, corner_radius=10,
+            font=ctk.CTkFont(family="Segoe UI", size=15, weight="bold"),
+            fg_color="#6A6A6A", hover_color="#8A8A8A", border_width=2, border_color="#8A8A8A"
+        )
+        self.import_links_button.grid(row=0, column=1, padx=(8, 0))
+
+        # Download every entry of a pasted playlist or channel link instead of a single video
+        self.playlist_checkbox = ctk.CTkCheckBox(self.link_buttons_frame, text="Whole playlist", font=ctk.CTkFont(size=13), text_color="#E0E0E0", fg_color="#007ACC")
+        self.playlist_checkbox.grid(row=1, column=0, columnspan=2, pady=(6, 0), sticky="w")
 
 
         # Output Directory Section
@@ -262,7 +326,7 @@ class MediaConverterApp(ctk.CTk):
         self.image_options_frame.grid_columnconfigure(2, weight=0)
         self.image_options_frame.grid_columnconfigure(3, weight=1)
         self.image_options_frame.grid_columnconfigure(4, weight=0) # For percentage label
-        self.image_options_frame.grid_rowconfigure((0,1,2), weight=0) # Quality, Rescale Type, Rescale Values
+        self.image_options_frame.grid_rowconfigure((0,1,2,3,4), weight=0) # Quality, Rescale Type, Rescale Values, Speed, GIF
 
         # Image Quality Slider
         self.quality_label = ctk.CTkLabel(self.image_options_frame, text="Image Quality (1-100):", font=ctk.CTkFont(family="Segoe UI", size=15, weight="bold"), image=self.quality_icon, compound="left", text_color="#E0E0E0")
@@ -303,20 +367,56 @@ class MediaConverterApp(ctk.CTk):
 
         self.toggle_rescale_inputs() # Initialize visibility
 
+        # Image Encoder Speed Tier
+        self.image_speed_label = ctk.CTkLabel(self.image_options_frame, text="Encode Speed:", font=ctk.CTkFont(family="Segoe UI", size=15, weight="bold"), image=self.quality_icon, compound="left", text_color="#E0E0E0")
+        self.image_speed_label.grid(row=3, column=0, padx=(0,15), pady=(15, 8), sticky="w")
+        self.image_speed_option = ctk.CTkOptionMenu(
+            self.image_options_frame,
+            values=list(SPEED_TIER_LABELS),
+            width=220, height=40, corner_radius=10,
+            font=ctk.CTkFont(size=14),
+            fg_color="#4A4A4A",
+            button_color="#6A6A6A",
+            button_hover_color="#8A8A8A",
+            dropdown_fg_color="#4A4A4A",
+            dropdown_hover_color="#6A6A6A"
+        )
+        self.image_speed_option.grid(row=3, column=1, columnspan=2, padx=(0,25), pady=8, sticky="ew")
+        self.image_speed_option.set("Balanced")
+
+        # GIF Options (used when the output format is gif)
+        self.gif_label = ctk.CTkLabel(self.image_options_frame, text="GIF Options:", font=ctk.CTkFont(family="Segoe UI", size=15, weight="bold"), image=self.quality_icon, compound="left", text_color="#E0E0E0")
+        self.gif_label.grid(row=4, column=0, padx=(0,15), pady=(15, 8), sticky="w")
+        self.gif_fps_entry = ctk.CTkEntry(self.image_options_frame, placeholder_text="FPS (e.g., 12)", width=110, height=35, corner_radius=10, font=ctk.CTkFont(size=14), fg_color="#4A4A4A", border_color="#6A6A6A", text_color="#E0E0E0")
+        self.gif_fps_entry.grid(row=4, column=1, padx=(0,15), pady=8, sticky="w")
+        self.gif_dither_option = ctk.CTkOptionMenu(
+            self.image_options_frame,
+            values=list(GIF_DITHER_MODES),
+            width=160, height=35, corner_radius=10,
+            font=ctk.CTkFont(size=14),
+            fg_color="#4A4A4A",
+            button_color="#6A6A6A",
+            button_hover_color="#8A8A8A",
+            dropdown_fg_color="#4A4A4A",
+            dropdown_hover_color="#6A6A6A"
+        )
+        self.gif_dither_option.grid(row=4, column=2, columnspan=2, padx=(0,25), pady=8, sticky="w")
+        self.gif_dither_option.set(GIF_DITHER_MODES[0])
+
         # --- Video Specific Options (Initially hidden) ---
         self.video_options_frame = ctk.CTkFrame(self.conversion_options_frame, fg_color="transparent")
         self.video_options_frame.grid_columnconfigure(0, weight=0)
         self.video_options_frame.grid_columnconfigure(1, weight=1)
         self.video_options_frame.grid_columnconfigure(2, weight=0)
         self.video_options_frame.grid_columnconfigure(3, weight=1)
-        self.video_options_frame.grid_rowconfigure((0,1,2,3), weight=0) # Quality, Rescale Type, Rescale Values
+        self.video_options_frame.grid_rowconfigure((0,1,2,3,4,5), weight=0) # Quality, Rescale Type, Rescale Values, Speed, Preview, Clip
 
         # Video Quality Preset
         self.video_quality_label = ctk.CTkLabel(self.video_options_frame, text="Video Quality Preset:", font=ctk.CTkFont(family="Segoe UI", size=15, weight="bold"), image=self.video_quality_icon, compound="left", text_color="#E0E0E0")
         self.video_quality_label.grid(row=0, column=0, padx=(0,15), pady=(20, 8), sticky="w")
         self.video_quality_option = ctk.CTkOptionMenu(
             self.video_options_frame,
-            values=["Default", "1080p", "720p", "480p", "Best Quality (CRF 18)", "Medium Quality (CRF 23)", "Low Quality (CRF 28)"],
+            values=list(VIDEO_QUALITY_PRESET_LABELS),
             width=220, height=40, corner_radius=10,
             font=ctk.CTkFont(size=14),
             fg_color="#4A4A4A",
@@ -327,6 +427,52 @@ class MediaConverterApp(ctk.CTk):
         )
         self.video_quality_option.grid(row=0, column=1, padx=(0,25), pady=8, sticky="ew")
         self.video_quality_option.set("Default")
+        # Optional output size; replaces the preset's constant quality with a planned bitrate
+        self.target_size_entry = ctk.CTkEntry(self.video_options_frame, placeholder_text="Target size (MB)", width=130, height=35, corner_radius=10, font=ctk.CTkFont(size=14), fg_color="#4A4A4A", border_color="#6A6A6A", text_color="#E0E0E0")
+        self.target_size_entry.grid(row=0, column=2, padx=(0,15), pady=8, sticky="w")
+
+        # Encoder Speed Tier
+        self.video_speed_label = ctk.CTkLabel(self.video_options_frame, text="Encode Speed:", font=ctk.CTkFont(family="Segoe UI", size=15, weight="bold"), image=self.video_quality_icon, compound="left", text_color="#E0E0E0")
+        self.video_speed_label.grid(row=3, column=0, padx=(0,15), pady=(15, 8), sticky="w")
+        self.video_speed_option = ctk.CTkOptionMenu(
+            self.video_options_frame,
+            values=list(SPEED_TIER_LABELS),
+            width=220, height=40, corner_radius=10,
+            font=ctk.CTkFont(size=14),
+            fg_color="#4A4A4A",
+            button_color="#6A6A6A",
+            button_hover_color="#8A8A8A",
+            dropdown_fg_color="#4A4A4A",
+            dropdown_hover_color="#6A6A6A"
+        )
+        self.video_speed_option.grid(row=3, column=1, padx=(0,25), pady=8, sticky="ew")
+        self.video_speed_option.set("Balanced")
+
+        # Preview Button - encodes a few short samples to estimate output size and encode time
+        self.preview_button = ctk.CTkButton(
+            self.video_options_frame,
+            text="Preview Estimate",
+            command=self.start_preview_thread,
+            width=220, height=40, corner_radius=10,
+            font=ctk.CTkFont(family="Segoe UI", size=15, weight="bold"),
+            fg_color="#6A6A6A", hover_color="#8A8A8A", border_width=2, border_color="#8A8A8A"
+        )
+        self.preview_button.grid(row=4, column=1, padx=(0,25), pady=(15, 8), sticky="ew")
+        # Draft previews encode half-size samples with the fastest settings: quicker, but the figures are rough
+        self.preview_draft_checkbox = ctk.CTkCheckBox(self.video_options_frame, text="Quick draft", font=ctk.CTkFont(size=14), text_color="#E0E0E0", fg_color="#E67E22")
+        self.preview_draft_checkbox.grid(row=4, column=2, padx=(0,15), pady=(15, 8), sticky="w")
+        self.preview_draft_checkbox.select()
+
+        # Clip (trim) Options
+        self.clip_label = ctk.CTkLabel(self.video_options_frame, text="Clip (optional):", font=ctk.CTkFont(family="Segoe UI", size=15, weight="bold"), image=self.rescale_icon, compound="left", text_color="#E0E0E0")
+        self.clip_label.grid(row=5, column=0, padx=(0,15), pady=(15, 8), sticky="w")
+        self.clip_start_entry = ctk.CTkEntry(self.video_options_frame, placeholder_text="Start (e.g., 1:30)", width=130, height=35, corner_radius=10, font=ctk.CTkFont(size=14), fg_color="#4A4A4A", border_color="#6A6A6A", text_color="#E0E0E0")
+        self.clip_start_entry.grid(row=5, column=1, padx=(0,5), pady=8, sticky="w")
+        self.clip_end_entry = ctk.CTkEntry(self.video_options_frame, placeholder_text="End (e.g., 2:00)", width=130, height=35, corner_radius=10, font=ctk.CTkFont(size=14), fg_color="#4A4A4A", border_color="#6A6A6A", text_color="#E0E0E0")
+        self.clip_end_entry.grid(row=5, column=2, padx=(0,15), pady=8, sticky="w")
+        self.lossless_cut_checkbox = ctk.CTkCheckBox(self.video_options_frame, text="Lossless cut", font=ctk.CTkFont(size=14), text_color="#E0E0E0", fg_color="#E67E22")
+        self.lossless_cut_checkbox.grid(row=5, column=3, padx=(0,15), pady=8, sticky="w")
+        self.lossless_cut_checkbox.select()
 
         # Video Rescale Options
         self.video_rescale_label = ctk.CTkLabel(self.video_options_frame, text="Rescale Video:", font=ctk.CTkFont(family="Segoe UI", size=15, weight="bold"), image=self.rescale_icon, compound="left", text_color="#E0E0E0")
@@ -522,7 +668,9 @@ class MediaConverterApp(ctk.CTk):
         """Loads settings from settings.json or creates default settings."""
         default_settings = {
             "default_output_directory": os.path.join(os.path.expanduser("~"), "ConvertedMedia"),
-            "show_verbose_ffmpeg_output": False
+            "show_verbose_ffmpeg_output": False,
+            "scratch_directory": "", # Intermediates (clip segments, preview samples); empty uses the defaults
+            "download_limit_kib": 0 # Combined bandwidth of all downloads in KiB/s; 0 is unlimited
         }
         if os.path.exists(self.settings_file):
             try:
@@ -601,17 +749,27 @@ class MediaConverterApp(ctk.CTk):
         # Clear entries when going back
         self.input_path_entry.delete(0, ctk.END)
         self.link_input_entry.delete(0, ctk.END)
+        self.playlist_checkbox.deselect()
         self.output_dir_entry.delete(0, ctk.END)
         self.status_label.configure(text="") # Clear status message
+        self.clear_input_preview()
         
         # Reset image options when going back
         self.rescale_mode_var.set("none")
         self.toggle_rescale_inputs()
         self.quality_slider.set(90)
         self.update_quality_label()
+        self.image_speed_option.set("Balanced")
+        self.gif_fps_entry.delete(0, ctk.END)
+        self.gif_dither_option.set(GIF_DITHER_MODES[0])
 
         # Reset video options when going back
         self.video_quality_option.set("Default")
+        self.video_speed_option.set("Balanced")
+        self.target_size_entry.delete(0, ctk.END)
+        self.clip_start_entry.delete(0, ctk.END)
+        self.clip_end_entry.delete(0, ctk.END)
+        self.lossless_cut_checkbox.select()
         self.video_rescale_mode_var.set("none")
         self.toggle_video_rescale_inputs()
 
@@ -619,12 +777,9 @@ class MediaConverterApp(ctk.CTk):
     def browse_input_file(self):
         """Opens a file dialog for input media selection, filtered by current mode."""
         filetypes = [("All Files", "*.*")]
-        if self.current_mode == "image":
-            filetypes.insert(0, ("Image Files", "*.png *.jpg *.jpeg *.gif *.bmp *.webp *.ico *.tiff *.psd *.eps *.avif *.icns"))
-        elif self.current_mode == "video":
-            filetypes.insert(0, ("Video Files", "*.mp4 *.mov *.avi *.mkv *.webm *.3gp *.3g2 *.3gpp *.cavs *.dv *.dvr *.flv *.m2ts *.m4v *.mpeg *.mpg *.mts *.mxf *.ogg *.rm *.rmvb"))
-        elif self.current_mode == "audio":
-            filetypes.insert(0, ("Audio Files", "*.mp3 *.wav *.aac *.flac *.ogg *.aif *.aiff *.aifc *.amr *.au *.caf *.dss *.m4a *.m4b *.oga *.voc *.weba *.wma *.ac3"))
+        if self.current_mode in INPUT_EXTENSIONS:
+            patterns = " ".join(f"*.{extension}" for extension in INPUT_EXTENSIONS[self.current_mode])
+            filetypes.insert(0, (f"{self.current_mode.capitalize()} Files", patterns))
         file_path = filedialog.askopenfilename(
             title=f"Select Input {self.current_mode.capitalize()} File",
             filetypes=filetypes
@@ -634,6 +789,49 @@ class MediaConverterApp(ctk.CTk):
             self.input_path_entry.insert(0, file_path)
             self.link_input_entry.delete(0, ctk.END) # Clear link field if file is selected
             self.update_status("Input file selected from folder.")
+            self.show_input_preview(file_path)
+
+    def browse_input_folder(self):
+        """Opens a folder dialog; every file of the current mode below the folder is converted."""
+        folder_path = filedialog.askdirectory(title=f"Select Folder of {self.current_mode.capitalize()} Files")
+        if folder_path:
+            self.input_path_entry.delete(0, ctk.END)
+            self.input_path_entry.insert(0, folder_path)
+            self.link_input_entry.delete(0, ctk.END) # Clear link field if a folder is selected
+            self.clear_input_preview()
+            self.update_status("Input folder selected. Its subfolders are converted too, and up-to-date outputs are skipped.")
+
+    def show_input_preview(self, file_path):
+        """Shows a thumbnail of the selected input file. The thumbnail is made in a background thread."""
+        self.clear_input_preview()
+        self.input_preview_label.configure(text="Loading preview...")
+        threading.Thread(target=self._run_in_lane, args=("interactive", self._load_input_preview, file_path), daemon=True).start()
+
+    def _load_input_preview(self, file_path):
+        """Internal method to make the thumbnail off the GUI thread and hand it back to the GUI thread."""
+        success, result = self.converter.thumbnail(file_path, size=(160, 90))
+        self.after(0, self._set_input_preview, file_path, success, result)
+
+    def _set_input_preview(self, file_path, success, result):
+        """Displays a finished thumbnail, unless the user has picked another file in the meantime."""
+        if file_path != self.input_path_entry.get():
+            return
+        if not success:
+            self.input_preview_label.configure(text="No preview")
+            return
+        try:
+            preview_img = Image.open(result)
+            preview_img.load()
+        except Exception:
+            self.input_preview_label.configure(text="No preview")
+            return
+        self.input_preview_image = ctk.CTkImage(light_image=preview_img, dark_image=preview_img, size=preview_img.size)
+        self.input_preview_label.configure(image=self.input_preview_image, text="")
+
+    def clear_input_preview(self):
+        """Removes the input thumbnail."""
+        self.input_preview_image = None
+        self.input_preview_label.configure(image=None, text="")
 
     def browse_output_directory(self):
         """Opens a directory dialog for output path selection."""
@@ -647,9 +845,13 @@ class MediaConverterApp(ctk.CTk):
         """Attempts to paste content from clipboard to link entry."""
         try:
             clipboard_content = self.clipboard_get()
+            if len([line for line in clipboard_content.splitlines() if line.strip()]) > 1:
+                self.load_url_list(clipboard_content, "clipboard")
+                return
             self.link_input_entry.delete(0, ctk.END)
             self.link_input_entry.insert(0, clipboard_content)
             self.input_path_entry.delete(0, ctk.END) # Clear file field if link is pasted
+            self.clear_input_preview()
             self.update_status("URL pasted. Click 'Convert Media' to download and convert (requires yt-dlp).", "blue")
         except tk.TclError:
             self.update_status("Could not access clipboard. Please copy a URL first.", "error")
@@ -657,6 +859,40 @@ class MediaConverterApp(ctk.CTk):
             self.update_status(f"Error pasting link: {e}", "error")
 
 
+    def import_url_list(self):
+        """Opens a file dialog for a text or CSV file with one URL per line, optionally followed by an output format."""
+        file_path = filedialog.askopenfilename(
+            title="Select URL List",
+            filetypes=[("URL Lists", "*.txt *.csv"), ("All Files", "*.*")]
+        )
+        if not file_path:
+            return
+        try:
+            with open(file_path, encoding="utf-8-sig", errors="replace") as f:
+                text = f.read()
+        except OSError as e:
+            self.update_status(f"Error reading URL list: {e}", "error")
+            return
+        self.load_url_list(text, os.path.basename(file_path))
+
+    def load_url_list(self, text, source):
+        """Parses a URL list and shows it in the link field. Format overrides must be valid for the current mode."""
+        entries, invalid = parse_url_list(text, self.current_mode)
+        if not entries:
+            self.update_status(f"No valid URLs found in {source}.", "error")
+            return
+
+        self.url_list_entries = entries
+        self.url_list_text = f"[{len(entries)} URLs from {source}]"
+        self.link_input_entry.delete(0, ctk.END)
+        self.link_input_entry.insert(0, self.url_list_text)
+        self.input_path_entry.delete(0, ctk.END) # Clear file field if links are imported
+        self.clear_input_preview()
+        message = f"Imported {len(entries)} URLs. Click 'Convert Media' to download and convert them."
+        if invalid:
+            message += f" Ignored {len(invalid)} invalid lines (first: {invalid[0][1]})."
+        self.update_status(message, "error" if invalid else "blue")
+
     def open_settings(self):
         """Opens a new Toplevel window for settings."""
         if hasattr(self, "settings_window") and self.settings_window.winfo_exists():
@@ -665,7 +901,7 @@ class MediaConverterApp(ctk.CTk):
 
         self.settings_window = ctk.CTkToplevel(self)
         self.settings_window.title("Settings")
-        self.settings_window.geometry("480x350") # Adjusted size
+        self.settings_window.geometry("480x450") # Adjusted size
         self.settings_window.transient(self) # Make it appear on top of the main window
         self.settings_window.grab_set() # Make it modal (block interaction with main window)
         self.settings_window.protocol("WM_DELETE_WINDOW", self.close_settings) # Handle close button
@@ -692,15 +928,22 @@ class MediaConverterApp(ctk.CTk):
         )
         self.browse_default_output_button.grid(row=1, column=1, padx=(0, 25), pady=8, sticky="e")
 
-        # Verbose FFmpeg Output (Placeholder)
+        # Verbose FFmpeg Output
         self.verbose_label = ctk.CTkLabel(self.settings_window, text="Show Verbose FFmpeg Output:", font=ctk.CTkFont(size=15, weight="bold"), text_color="#E0E0E0")
         self.verbose_label.grid(row=2, column=0, columnspan=2, padx=25, pady=(20, 8), sticky="w")
 
-        self.verbose_checkbox = ctk.CTkCheckBox(self.settings_window, text="Enable detailed logs (Future feature)", state="disabled", font=ctk.CTkFont(size=14), text_color="#E0E0E0", fg_color="#007ACC")
+        self.verbose_checkbox = ctk.CTkCheckBox(self.settings_window, text="Enable detailed logs (written to a log file)", font=ctk.CTkFont(size=14), text_color="#E0E0E0", fg_color="#007ACC")
         self.verbose_checkbox.grid(row=3, column=0, columnspan=2, padx=25, pady=8, sticky="w")
-        # You would load/save the state of this checkbox here if it were functional
-        # if self.settings.get("show_verbose_ffmpeg_output", False):
-        #     self.verbose_checkbox.select()
+        if self.settings.get("show_verbose_ffmpeg_output", False):
+            self.verbose_checkbox.select()
+
+        # Download bandwidth limit, shared by all downloads
+        self.download_limit_label = ctk.CTkLabel(self.settings_window, text="Download Limit (KiB/s, 0 = unlimited):", font=ctk.CTkFont(size=15, weight="bold"), text_color="#E0E0E0")
+        self.download_limit_label.grid(row=4, column=0, columnspan=2, padx=25, pady=(20, 8), sticky="w")
+
+        self.download_limit_entry = ctk.CTkEntry(self.settings_window, placeholder_text="0", width=120, height=35, corner_radius=10, font=ctk.CTkFont(size=14), fg_color="#4A4A4A", border_color="#6A6A6A", text_color="#E0E0E0")
+        self.download_limit_entry.grid(row=5, column=0, padx=25, pady=8, sticky="w")
+        self.download_limit_entry.insert(0, str(self.settings.get("download_limit_kib", 0)))
 
         self.settings_save_button = ctk.CTkButton(
             self.settings_window,
@@ -711,7 +954,7 @@ class MediaConverterApp(ctk.CTk):
             height=45,
             fg_color="#007ACC", hover_color="#005C99", border_width=2, border_color="#004A77"
         )
-        self.settings_save_button.grid(row=4, column=0, columnspan=2, padx=25, pady=35, sticky="ew")
+        self.settings_save_button.grid(row=6, column=0, columnspan=2, padx=25, pady=35, sticky="ew")
 
         self.settings_window.wait_window() # Wait for settings window to close
 
@@ -724,8 +967,17 @@ class MediaConverterApp(ctk.CTk):
 
     def save_settings_and_close(self):
         """Saves settings and closes the settings window."""
+        try:
+            download_limit_kib = int(self.download_limit_entry.get().strip() or 0)
+            if download_limit_kib < 0:
+                raise ValueError
+        except ValueError:
+            self.update_status("Error: The download limit must be a whole number of KiB/s (0 for unlimited).", "error")
+            return
         self.settings["default_output_directory"] = self.default_output_entry.get()
-        # self.settings["show_verbose_ffmpeg_output"] = self.verbose_checkbox.get() # For future
+        self.settings["show_verbose_ffmpeg_output"] = bool(self.verbose_checkbox.get())
+        self.settings["download_limit_kib"] = download_limit_kib
+        set_download_limit(download_limit_kib * 1024) # Applies to running downloads too
         self.save_settings()
         self.update_status("Settings saved successfully!", "success")
         self.close_settings()
@@ -748,40 +1000,39 @@ class MediaConverterApp(ctk.CTk):
         self.status_label.configure(text=message)
         self.update_idletasks()
 
-    def start_conversion_thread(self):
-        """Starts the conversion process in a separate thread."""
-        input_path = self.input_path_entry.get()
-        output_dir = self.output_dir_entry.get()
-        output_format = self.output_format_option.get()
-        link_input = self.link_input_entry.get()
-
-        # Image specific options
-        image_quality = None
-        image_scale_width = None
-        image_scale_height = None
-        image_scale_percentage = None
-
-        # Video specific options
-        video_quality_preset = None
-        video_scale_width = None
-        video_scale_height = None
-        video_scale_percentage = None
-
+    def _read_conversion_options(self):
+        """Reads the current mode's options from the GUI. Returns convert_media keyword arguments, or None if a value is invalid."""
+        options = {}
 
         if self.current_mode == "image":
-            image_quality = int(self.quality_slider.get())
+            options["image_quality"] = int(self.quality_slider.get())
+            options["image_speed_tier"] = SPEED_TIER_LABELS[self.image_speed_option.get()]
+            if self.output_format_option.get() == "gif":
+                options["gif_dither"] = self.gif_dither_option.get()
+                fps_str = self.gif_fps_entry.get().strip()
+                if fps_str:
+                    try:
+                        options["gif_fps"] = float(fps_str)
+                        if not (0 < options["gif_fps"] <= 60):
+                            raise ValueError
+                    except ValueError:
+                        self.update_status("Error: GIF FPS must be a number between 0 and 60.", "error")
+                        return None
             rescale_mode = self.rescale_mode_var.get()
             if rescale_mode == "percentage":
                 try:
                     image_scale_percentage = float(self.percentage_entry.get())
                     if not (0 < image_scale_percentage <= 1000): # Allow up to 10x scaling
                         self.update_status("Error: Percentage must be between 0 and 1000.", "error")
-                        return
+                        return None
+                    options["scale_percentage"] = image_scale_percentage
                 except ValueError:
                     self.update_status("Error: Invalid percentage value for image.", "error")
-                    return
+                    return None
             elif rescale_mode == "pixels":
                 try:
+                    image_scale_width = None
+                    image_scale_height = None
                     width_str = self.width_entry.get()
                     height_str = self.height_entry.get()
                     if width_str:
@@ -793,24 +1044,30 @@ class MediaConverterApp(ctk.CTk):
                        (image_scale_width is not None and image_scale_width <= 0) or \
                        (image_scale_height is not None and image_scale_height <= 0):
                         self.update_status("Error: Enter valid positive pixel dimensions (width or height) for image.", "error")
-                        return
+                        return None
+                    options["scale_width"] = image_scale_width
+                    options["scale_height"] = image_scale_height
                 except ValueError:
                     self.update_status("Error: Invalid pixel dimension for image (must be an integer).", "error")
-                    return
+                    return None
         elif self.current_mode == "video":
-            video_quality_preset = self.video_quality_option.get()
+            options["video_quality_preset"] = VIDEO_QUALITY_PRESET_LABELS[self.video_quality_option.get()]
+            options["video_speed_tier"] = SPEED_TIER_LABELS[self.video_speed_option.get()]
             rescale_mode = self.video_rescale_mode_var.get()
             if rescale_mode == "percentage":
                 try:
                     video_scale_percentage = float(self.video_percentage_entry.get())
                     if not (0 < video_scale_percentage <= 1000): # Allow up to 10x scaling
                         self.update_status("Error: Percentage must be between 0 and 1000 for video.", "error")
-                        return
+                        return None
+                    options["scale_percentage"] = video_scale_percentage
                 except ValueError:
                     self.update_status("Error: Invalid percentage value for video.", "error")
-                    return
+                    return None
             elif rescale_mode == "pixels":
                 try:
+                    video_scale_width = None
+                    video_scale_height = None
                     width_str = self.video_width_entry.get()
                     height_str = self.video_height_entry.get()
                     if width_str:
@@ -822,82 +1079,261 @@ class MediaConverterApp(ctk.CTk):
                        (video_scale_width is not None and video_scale_width <= 0) or \
                        (video_scale_height is not None and video_scale_height <= 0):
                         self.update_status("Error: Enter valid positive pixel dimensions (width or height) for video.", "error")
-                        return
+                        return None
+                    options["scale_width"] = video_scale_width
+                    options["scale_height"] = video_scale_height
                 except ValueError:
                     self.update_status("Error: Invalid pixel dimension for video (must be an integer).", "error")
-                    return
+                    return None
 
+            target_str = self.target_size_entry.get().strip()
+            if target_str:
+                try:
+                    target_mb = float(target_str)
+                except ValueError:
+                    target_mb = 0
+                if target_mb <= 0:
+                    self.update_status("Error: Target size must be a positive number of MB.", "error")
+                    return None
+                options["target_size"] = int(target_mb * 1024 * 1024)
+
+            # Clip range
+            start_str = self.clip_start_entry.get().strip()
+            end_str = self.clip_end_entry.get().strip()
+            if start_str or end_str:
+                try:
+                    if start_str:
+                        options["start_time"] = parse_timestamp(start_str)
+                    if end_str:
+                        options["end_time"] = parse_timestamp(end_str)
+                except ValueError:
+                    self.update_status("Error: Invalid clip time. Use seconds (e.g., 90) or mm:ss / hh:mm:ss.", "error")
+                    return None
+                if end_str and options["end_time"] <= options.get("start_time", 0.0):
+                    self.update_status("Error: The clip end must be after its start.", "error")
+                    return None
+                if self.lossless_cut_checkbox.get():
+                    if rescale_mode != "none":
+                        self.update_status("Error: A lossless cut can't be rescaled. Turn off 'Lossless cut' or set Rescale Video to None.", "error")
+                        return None
+                    if "target_size" in options:
+                        self.update_status("Error: A lossless cut can't aim for a target size. Turn off 'Lossless cut' or clear the target size.", "error")
+                        return None
+                    # Leave the encoder options out so convert_media copies the streams
+                    options.pop("video_quality_preset")
+                    options.pop("video_speed_tier")
+        elif self.current_mode == "audio":
+            # Map only the audio stream and copy it when the output format allows
+            options["audio_only"] = True
+
+        if self.settings.get("scratch_directory"):
+            options["scratch_dir"] = self.settings["scratch_directory"]
+        if self.settings.get("show_verbose_ffmpeg_output", False):
+            # Detailed FFmpeg output goes to a rotating log file; errors in the status bar only quote the tail
+            options["log_level"] = "verbose"
+            options["log_file"] = self.verbose_log_path()
+        return options
+
+    def verbose_log_path(self):
+        """Returns the log file used when detailed logs are enabled."""
+        return os.path.join(default_cache_dir(), "logs", "conversion.log")
+
+    def start_conversion_thread(self):
+        """Starts the conversion process in a separate thread."""
+        input_path = self.input_path_entry.get()
+        output_dir = self.output_dir_entry.get()
+        output_format = self.output_format_option.get()
+        link_input = self.link_input_entry.get()
+
+        # Image/video specific options
+        options = self._read_conversion_options()
+        if options is None:
+            return
 
         if not output_dir:
             self.update_status("Error: Please select an output directory.", "error")
             return
 
-        if link_input:
+        # URL lists, playlists and folders run in the bulk lane and leave the Convert button free:
+        # a single conversion started meanwhile runs in the interactive lane and pauses their encodes
+        if link_input and link_input == self.url_list_text:
+            # Handle an imported URL list: concurrent downloads, each converted as soon as it arrives
+            self.update_status(f"Downloading {len(self.url_list_entries)} URLs in the background...", "blue")
+            threading.Thread(
+                target=self._run_in_lane,
+                args=("bulk", self._run_url_list_conversion, list(self.url_list_entries), self.current_mode,
+                      output_dir, output_format, options)
+            ).start()
+            self.link_input_entry.delete(0, ctk.END) # The link field is free for other links while the list runs
+            self.url_list_entries = []
+            self.url_list_text = None
+        elif link_input and self.playlist_checkbox.get():
+            # Handle a playlist or channel: list its entries, then download and convert them like a URL list
+            self.update_status("Listing playlist entries in the background...", "blue")
+            threading.Thread(
+                target=self._run_in_lane,
+                args=("bulk", self._run_playlist_conversion, link_input, self.current_mode, output_dir, output_format, options)
+            ).start()
+            self.link_input_entry.delete(0, ctk.END)
+        elif link_input:
             # Handle URL download and then conversion
             self.update_status("Downloading media from URL... (This may take a while)", "blue")
             self.convert_button.configure(state="disabled", text="Downloading...")
+            # Only the conversion step runs in the interactive lane (see _run_url_conversion)
             threading.Thread(
                 target=self._run_url_conversion,
-                args=(link_input, output_dir, output_format, image_quality, image_scale_width, image_scale_height, image_scale_percentage,
-                      video_quality_preset, video_scale_width, video_scale_height, video_scale_percentage)
+                args=(link_input, output_dir, output_format, options)
+            ).start()
+        elif input_path and os.path.isdir(input_path):
+            # Handle folder conversion, mirroring the folder tree in the output directory
+            self.update_status("Scanning folder in the background...", "blue")
+            threading.Thread(
+                target=self._run_in_lane,
+                args=("bulk", self._run_folder_conversion, input_path, output_dir, output_format, options)
             ).start()
         elif input_path:
             # Handle local file conversion
             self.update_status("Conversion started... Please wait.", "blue")
             self.convert_button.configure(state="disabled", text="Converting...")
             threading.Thread(
-                target=self._run_local_conversion,
-                args=(input_path, output_dir, output_format, image_quality, image_scale_width, image_scale_height, image_scale_percentage,
-                      video_quality_preset, video_scale_width, video_scale_height, video_scale_percentage)
+                target=self._run_in_lane,
+                args=("interactive", self._run_local_conversion, input_path, output_dir, output_format, options)
             ).start()
         else:
             self.update_status("Error: Please select an input file or paste a URL.", "error")
 
+    def start_preview_thread(self):
+        """Encodes short samples of the selected input in a separate thread and reports the projected size and time."""
+        input_path = self.input_path_entry.get()
+        output_format = self.output_format_option.get()
+        if not input_path:
+            self.update_status("Error: Please select an input file to preview.", "error")
+            return
+
+        options = self._read_conversion_options()
+        if options is None:
+            return
+
+        options["draft"] = self.preview_draft_checkbox.get() == 1
+        self.update_status("Encoding preview samples... Please wait.", "blue")
+        self.preview_button.configure(state="disabled", text="Previewing...")
+        threading.Thread(
+            target=self._run_in_lane,
+            args=("interactive", self._run_preview, input_path, output_format, options)
+        ).start()
+
+    def _run_in_lane(self, priority, target, *args):
+        """Runs a job method in a priority lane ('interactive' or 'bulk', see converter_core.job_priority)."""
+        with job_priority(priority):
+            target(*args)
+
+    def _run_preview(self, input_path, output_format, options):
+        """Internal method to run a preview and update GUI."""
+        success, result = self.converter.preview(input_path, output_format, self.update_status, **options)
+
+        if success:
+            estimate = "Rough estimate (quick draft)" if result["draft"] else "Estimated output"
+            self.update_status(
+                f"{estimate}: {result['projected_bytes'] / (1024*1024):.1f} MiB, "
+                f"encoding at {result['encode_speed']:.2f}x realtime, about {result['projected_seconds'] / 60:.1f} min in total.",
+                "success"
+            )
+        else:
+            self.update_status(f"Preview failed: {result}", "error")
 
-    def _run_local_conversion(self, input_path, output_dir, output_format,
-                               image_quality=None, scale_width=None, scale_height=None, scale_percentage=None,
-                               video_quality_preset=None, video_scale_width=None, video_scale_height=None, video_scale_percentage=None):
+        self.preview_button.configure(state="normal", text="Preview Estimate")
+
+
+    def _run_local_conversion(self, input_path, output_dir, output_format, options):
         """Internal method to run local file conversion and update GUI."""
-        success, message = convert_media(
-            input_path, output_dir, output_format, self.update_status,
-            image_quality=image_quality, scale_width=scale_width, scale_height=scale_height, scale_percentage=scale_percentage,
-            video_quality_preset=video_quality_preset, video_scale_width=video_scale_width, video_scale_height=video_scale_height, video_scale_percentage=video_scale_percentage
-        )
+        usage = {}
+        success, message = self.converter.convert(input_path, output_dir, output_format, self.update_status, usage=usage, **options)
 
         if success:
-            self.update_status(f"Conversion complete! Output: {message}", "success")
+            self.update_status(f"Conversion complete! Output: {message} ({format_usage(usage)})", "success")
+        elif options.get("log_file"):
+            self.update_status(f"Conversion failed: {message}\nFull log: {options['log_file']}", "error")
         else:
             self.update_status(f"Conversion failed: {message}", "error")
 
         self.convert_button.configure(state="normal", text="Convert Media")
 
-    def _run_url_conversion(self, url, output_dir, output_format,
-                            image_quality=None, scale_width=None, scale_height=None, scale_percentage=None,
-                            video_quality_preset=None, video_scale_width=None, video_scale_height=None, video_scale_percentage=None):
+    def _run_folder_conversion(self, input_dir, output_dir, output_format, options):
+        """Internal method to convert a folder tree and update GUI."""
+        success, result = self.converter.convert_directory(input_dir, output_dir, output_format, self.update_status,
+                                                           mode=self.current_mode, **options)
+
+        if not success:
+            self.update_status(f"Folder conversion failed: {result}", "error")
+        else:
+            failed = [message for _, ok, message in result["results"] if not ok]
+            converted = len(result["results"]) - len(failed)
+            summary = f"{converted} converted, {len(result['skipped'])} already up to date, {len(failed)} failed."
+            if failed:
+                self.update_status(f"Folder conversion finished with errors: {summary}\nFirst error: {failed[0]}", "error")
+            else:
+                self.update_status(f"Folder conversion complete! {summary}", "success")
+
+    def _run_url_list_conversion(self, entries, mode, output_dir, output_format, options):
+        """Internal method to download and convert a URL list, write a report and update GUI."""
+        try:
+            results = self.converter.convert_url_list(entries, output_dir, mode, output_format, self.update_status, **options)
+            self._report_url_results(results, output_dir)
+        except Exception as e:
+            self.update_status(f"An unexpected error occurred during URL list processing: {e}", "error")
+
+    def _run_playlist_conversion(self, url, mode, output_dir, output_format, options):
+        """Internal method to download and convert a playlist, write a report and update GUI."""
+        try:
+            success, result = self.converter.convert_playlist(url, output_dir, mode, output_format, self.update_status, **options)
+            if success:
+                self._report_url_results(result["results"], output_dir, len(result["skipped"]))
+            else:
+                self.update_status(f"Playlist failed: {result}", "error")
+        except Exception as e:
+            self.update_status(f"An unexpected error occurred during playlist processing: {e}", "error")
+
+    def _report_url_results(self, results, output_dir, skipped=0):
+        """Writes a CSV report of URL list or playlist results to the output folder and shows a summary."""
+        failed = [(url, message) for url, success, message in results if not success]
+        summary = f"{len(results) - len(failed)} of {len(results)} URLs converted"
+        if skipped:
+            summary += f", {skipped} already converted earlier"
+        report_path = os.path.join(output_dir, f"url-report-{time.strftime('%Y%m%d-%H%M%S')}.csv")
+        report_success, report_message = write_url_report(report_path, results)
+        summary += f". Report: {report_message}" if report_success else f". {report_message}"
+        if failed:
+            self.update_status(f"{summary}\nFirst failure: {failed[0][0]}: {failed[0][1]}", "error")
+        else:
+            self.update_status(f"All done! {summary}", "success")
+
+    def _run_url_conversion(self, url, output_dir, output_format, options):
         """Internal method to download from URL, then convert, and clean up."""
         temp_download_dir = None
         try:
-            # Create a temporary directory for the downloaded file
-            temp_download_dir = tempfile.mkdtemp(prefix="media_converter_download_")
+            # Download next to the output, so the finished file never has to cross filesystems
+            temp_download_dir = make_scratch_dir(".download_", output_dir)
             self.update_status(f"Downloading to temporary folder: {temp_download_dir}", "blue")
 
             # Download the media
-            download_success, downloaded_file_path = download_media_from_url(url, temp_download_dir, self.current_mode, self.update_status)
+            download_success, downloaded_file_path = self.converter.download(url, temp_download_dir, self.current_mode, self.update_status,
+                                                                             log_file=options.get("log_file"))
 
             if not download_success:
                 self.update_status(f"Download failed: {downloaded_file_path}", "error")
                 return # Exit if download failed
 
             self.update_status(f"Download complete. Converting {os.path.basename(downloaded_file_path)}...", "blue")
-            # Now convert the downloaded file
-            conversion_success, conversion_message = convert_media(
-                downloaded_file_path, output_dir, output_format, self.update_status,
-                image_quality=image_quality, scale_width=scale_width, scale_height=scale_height, scale_percentage=scale_percentage,
-                video_quality_preset=video_quality_preset, video_scale_width=video_scale_width, video_scale_height=video_scale_height, video_scale_percentage=video_scale_percentage
-            )
+            # Now convert the downloaded file. The download above is network-bound, so only this
+            # step runs in the interactive lane and pauses background encodes.
+            usage = {}
+            with job_priority("interactive"):
+                conversion_success, conversion_message = self.converter.convert(
+                    downloaded_file_path, output_dir, output_format, self.update_status, usage=usage, **options
+                )
 
             if conversion_success:
-                self.update_status(f"Conversion complete! Output: {conversion_message}", "success")
+                self.update_status(f"Conversion complete! Output: {conversion_message} ({format_usage(usage)})", "success")
             else:
                 self.update_status(f"Conversion failed: {conversion_message}", "error")
 
@@ -919,3 +1355,4 @@ class MediaConverterApp(ctk.CTk):
 if __name__ == "__main__":
     app = MediaConverterApp()
     app.mainloop()
+    app.converter.close()
@@ -0,0 +1,56 @@
+import time
+import threading
+
+from converter_core import BandwidthLimiter, DOWNLOAD_LIMIT_MAX_SLEEP
+
+RATE = 200_000 # Bytes per second
+
+
+def _consume(limiter, total, chunk=10_000):
+    for _ in range(total // chunk):
+        limiter.consume(chunk)
+
+
+def _timed(function, *args):
+    started = time.monotonic()
+    function(*args)
+    return time.monotonic() - started
+
+
+def test_unlimited_does_not_wait():
+    assert _timed(_consume, BandwidthLimiter(), 10 * RATE) < 0.1
+
+
+def test_holds_a_download_to_the_rate():
+    # The bucket starts empty, so one second's worth takes about a second
+    elapsed = _timed(_consume, BandwidthLimiter(RATE), RATE)
+    assert 0.9 <= elapsed < 1.5
+
+
+def test_rate_is_shared_by_all_downloads():
+    limiter = BandwidthLimiter(RATE)
+    threads = [threading.Thread(target=_consume, args=(limiter, RATE // 2)) for _ in range(2)]
+    def run_all():
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert 0.9 <= _timed(run_all) < 1.5
+
+
+def test_removing_the_limit_releases_waiting_downloads():
+    limiter = BandwidthLimiter(RATE)
+    thread = threading.Thread(target=limiter.consume, args=(100 * RATE,)) # 100 seconds at this rate
+    thread.start()
+    time.sleep(0.1)
+    limiter.set_rate(None)
+    thread.join(timeout=DOWNLOAD_LIMIT_MAX_SLEEP + 1)
+    assert not thread.is_alive()
+
+
+def test_share_splits_the_rate_between_running_streams():
+    limiter = BandwidthLimiter(RATE)
+    assert limiter.share() == RATE
+    with limiter.stream(), limiter.stream():
+        assert limiter.share() == RATE / 2
+    assert BandwidthLimiter().share() is None
@@ -0,0 +1,28 @@
+import pytest
+
+import converter_core
+from converter_core import _child_command, _job_local
+
+
+@pytest.fixture(autouse=True)
+def plain_commands(monkeypatch):
+    monkeypatch.setattr(converter_core, 'CHILD_NICENESS', 0) # No ionice/nice prefix
+    monkeypatch.setattr(_job_local, 'log_level', None, raising=False)
+    monkeypatch.setattr(_job_local, 'session', None, raising=False)
+
+
+def test_quiet_jobs_turn_off_ffmpeg_stats():
+    assert _child_command(['ffmpeg', '-i', 'in.mp4', 'out.webm']) == \
+        ['ffmpeg', '-loglevel', converter_core.FFMPEG_LOGLEVEL, '-nostats', '-i', 'in.mp4', 'out.webm']
+
+
+def test_verbose_jobs_keep_ffmpeg_stats():
+    _job_local.log_level = 'verbose'
+    assert _child_command(['ffmpeg', '-i', 'in.mp4', 'out.webm']) == \
+        ['ffmpeg', '-loglevel', 'verbose', '-i', 'in.mp4', 'out.webm']
+
+
+def test_commands_keep_their_own_settings():
+    assert _child_command(['ffmpeg', '-v', 'info', '-stats', '-i', 'in.mp4', 'out.webm']) == \
+        ['ffmpeg', '-v', 'info', '-stats', '-i', 'in.mp4', 'out.webm']
+    assert _child_command(['ffprobe', '-v', 'error', 'in.mp4']) == ['ffprobe', '-v', 'error', 'in.mp4']
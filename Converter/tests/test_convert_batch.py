@@ -0,0 +1,134 @@
+import os
+import subprocess
+
+import pytest
+
+import converter_core
+from converter_core import convert_batch
+
+
+class FakeFFmpeg:
+    """
+    Stands in for _run_child and convert_media. Grouped commands are recorded and write every
+    '.part' output they name, except for the inputs listed in fail (the whole process fails)
+    or skip (that one output is missing). Single conversions are recorded by input path.
+    """
+
+    def __init__(self):
+        self.commands = []
+        self.singles = []
+        self.fail = set()
+        self.skip = set()
+
+    def run_child(self, command, *args, **kwargs):
+        self.commands.append(command)
+        inputs = [command[position + 1] for position, argument in enumerate(command) if argument == '-i']
+        if self.fail & set(inputs):
+            for argument in command:
+                if '.part.' in argument:
+                    open(argument, 'wb').close() # A partial output left behind by the crash
+            raise subprocess.CalledProcessError(1, command, stderr="boom")
+        outputs = [argument for argument in command if '.part.' in argument]
+        for input_path, output_path in zip(inputs, outputs):
+            if input_path not in self.skip:
+                with open(output_path, 'wb') as f:
+                    f.write(b'grouped')
+
+    def convert_media(self, input_path, output_directory, output_format, usage=None, **options):
+        self.singles.append(input_path)
+        output_path = os.path.join(output_directory, f"{os.path.splitext(os.path.basename(input_path))[0]}.{output_format}")
+        with open(output_path, 'wb') as f:
+            f.write(b'single')
+        return True, output_path
+
+    def grouped_inputs(self):
+        return [[command[position + 1] for position, argument in enumerate(command) if argument == '-i']
+                for command in self.commands]
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeFFmpeg()
+    monkeypatch.setattr(converter_core, '_run_child', fake.run_child)
+    monkeypatch.setattr(converter_core, 'convert_media', fake.convert_media)
+    return fake
+
+
+def _inputs(directory, count, size=10):
+    directory.mkdir(exist_ok=True)
+    paths = []
+    for index in range(count):
+        path = directory / f"image{index}.png"
+        path.write_bytes(bytes([index]) * size) # Distinct content, so nothing is deduplicated
+        paths.append(str(path))
+    return paths
+
+
+def test_small_files_are_grouped_and_large_ones_run_alone(tmp_path, fake):
+    inputs = _inputs(tmp_path / 'in', 5)
+    (tmp_path / 'in' / 'image4.png').write_bytes(b'x' * 100)
+    output_directory = str(tmp_path / 'out')
+    results = convert_batch(inputs, output_directory, 'png', group_size=2, small_file_bytes=50)
+
+    assert fake.grouped_inputs() == [inputs[0:2], inputs[2:4]]
+    assert fake.singles == [inputs[4]]
+    for command in fake.commands:
+        first, second = command[3], command[5]
+        assert command[:2] == ['ffmpeg', '-nostdin']
+        assert command[2:6] == ['-i', first, '-i', second]
+        # One -map per output, pointing at its own input
+        assert command[6:8] == ['-map', '0:v:0'] and command[9:11] == ['-map', '1:v:0']
+        assert '.part.' in command[8] and '.part.' in command[11] and len(command) == 12
+    assert results == [(path, True, os.path.join(output_directory, f"image{index}.png"))
+                       for index, path in enumerate(inputs)]
+    assert sorted(os.listdir(output_directory)) == [f"image{index}.png" for index in range(5)]
+
+
+def test_groups_respect_the_command_length(tmp_path, fake, monkeypatch):
+    inputs = _inputs(tmp_path / 'in', 5)
+    output_directory = str(tmp_path / 'out')
+    job_chars = len(inputs[0]) + len(os.path.join(output_directory, 'image0.png')) + 200
+    monkeypatch.setattr(converter_core, 'BATCH_MAX_COMMAND_CHARS', 2 * job_chars)
+    convert_batch(inputs, output_directory, 'png', group_size=16)
+    assert fake.grouped_inputs() == [inputs[0:2], inputs[2:4], inputs[4:5]]
+
+
+def test_failed_group_is_cleaned_up_and_retried_one_by_one(tmp_path, fake):
+    inputs = _inputs(tmp_path / 'in', 4)
+    output_directory = str(tmp_path / 'out')
+    fake.fail = {inputs[3]}
+    results = convert_batch(inputs, output_directory, 'png', group_size=2)
+
+    assert fake.grouped_inputs() == [inputs[0:2], inputs[2:4]]
+    assert fake.singles == inputs[2:4]
+    assert [result[1] for result in results] == [True] * 4
+    assert not [name for name in os.listdir(output_directory) if '.part' in name]
+    with open(results[0][2], 'rb') as f:
+        assert f.read() == b'grouped'
+    with open(results[3][2], 'rb') as f:
+        assert f.read() == b'single'
+
+
+def test_missing_group_output_is_retried_alone(tmp_path, fake):
+    inputs = _inputs(tmp_path / 'in', 3)
+    fake.skip = {inputs[1]}
+    results = convert_batch(inputs, str(tmp_path / 'out'), 'png')
+    assert fake.grouped_inputs() == [inputs]
+    assert fake.singles == [inputs[1]]
+    assert all(result[1] for result in results)
+
+
+def test_video_outputs_and_clips_are_never_grouped(tmp_path, fake):
+    inputs = _inputs(tmp_path / 'in', 3)
+    convert_batch(inputs, str(tmp_path / 'video'), 'mp4')
+    convert_batch(inputs, str(tmp_path / 'clips'), 'mp3', audio_only=True, start_time=1.0)
+    assert fake.commands == []
+    assert fake.singles == inputs + inputs
+
+
+def test_audio_groups_map_audio_streams(tmp_path, fake):
+    inputs = _inputs(tmp_path / 'in', 2)
+    convert_batch(inputs, str(tmp_path / 'out'), 'mp3', audio_only=True)
+    command = fake.commands[0]
+    maps = [command[position + 1] for position, argument in enumerate(command) if argument == '-map']
+    assert maps == ['0:a:0', '1:a:0']
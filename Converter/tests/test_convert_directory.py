@@ -0,0 +1,139 @@
+import os
+
+import pytest
+
+from converter_core import SYNC_MANIFEST_NAME, convert_directory
+
+
+class FakeScheduler:
+    """
+    Stands in for ConversionScheduler: every job writes its output at once, except for the
+    inputs listed in fail. The jobs of each run are recorded.
+    """
+
+    def __init__(self):
+        self.jobs = []
+        self.fail = set()
+
+    def run(self, jobs, progress_callback=None):
+        results = []
+        for job in jobs:
+            self.jobs.append(job)
+            if job['input_path'] in self.fail:
+                results.append((job['input_path'], False, "boom"))
+                continue
+            os.makedirs(job['output_directory'], exist_ok=True)
+            name = os.path.splitext(os.path.basename(job['input_path']))[0]
+            output_path = os.path.join(job['output_directory'], f"{name}.{job['output_format']}")
+            with open(output_path, 'wb') as f:
+                f.write(b'converted')
+            results.append((job['input_path'], True, output_path))
+        return results
+
+    def converted(self):
+        inputs = [job['input_path'] for job in self.jobs]
+        self.jobs = []
+        return inputs
+
+
+@pytest.fixture
+def tree(tmp_path):
+    input_root = tmp_path / 'in'
+    (input_root / 'album').mkdir(parents=True)
+    paths = []
+    for relative in ('a.png', 'album/b.png'):
+        path = input_root / relative
+        path.write_bytes(b'image')
+        os.utime(path, ns=(1_000_000_000, 1_000_000_000)) # Older than any output written below
+        paths.append(str(path))
+    return str(input_root), str(tmp_path / 'out'), paths
+
+
+@pytest.fixture
+def scheduler():
+    return FakeScheduler()
+
+
+def _sync(tree, scheduler, **options):
+    input_root, output_root, _ = tree
+    success, summary = convert_directory(input_root, output_root, 'webp', mode='image', scheduler=scheduler, **options)
+    assert success, summary
+    return summary
+
+
+def test_second_sync_skips_everything(tree, scheduler):
+    _, output_root, paths = tree
+    summary = _sync(tree, scheduler)
+    assert scheduler.converted() == paths
+    assert [result[1] for result in summary['results']] == [True, True]
+    assert os.path.isfile(os.path.join(output_root, 'album', 'b.webp'))
+    assert os.path.isfile(os.path.join(output_root, SYNC_MANIFEST_NAME))
+
+    summary = _sync(tree, scheduler)
+    assert scheduler.converted() == []
+    assert summary == {'results': [], 'skipped': paths}
+
+
+def test_missing_manifest_converts_again(tree, scheduler):
+    _, output_root, paths = tree
+    _sync(tree, scheduler)
+    scheduler.converted()
+    os.remove(os.path.join(output_root, SYNC_MANIFEST_NAME))
+    _sync(tree, scheduler)
+    assert scheduler.converted() == paths
+
+
+@pytest.mark.parametrize('change', ['size', 'mtime'])
+def test_changed_source_converts_again(tree, scheduler, change):
+    _, _, paths = tree
+    _sync(tree, scheduler)
+    scheduler.converted()
+    if change == 'size':
+        with open(paths[1], 'ab') as f:
+            f.write(b'more')
+        os.utime(paths[1], ns=(1_000_000_000, 1_000_000_000))
+    else:
+        os.utime(paths[1], ns=(2_000_000_000, 2_000_000_000))
+    summary = _sync(tree, scheduler)
+    assert scheduler.converted() == [paths[1]]
+    assert summary['skipped'] == [paths[0]]
+
+
+def test_changed_settings_convert_again(tree, scheduler):
+    _, _, paths = tree
+    _sync(tree, scheduler, image_quality=80)
+    scheduler.converted()
+    _sync(tree, scheduler, image_quality=80, threads=4) # threads doesn't change the output
+    assert scheduler.converted() == []
+    _sync(tree, scheduler, image_quality=60)
+    assert scheduler.converted() == paths
+
+
+def test_deleted_output_converts_again(tree, scheduler):
+    _, output_root, paths = tree
+    _sync(tree, scheduler)
+    scheduler.converted()
+    os.remove(os.path.join(output_root, 'a.webp'))
+    _sync(tree, scheduler)
+    assert scheduler.converted() == [paths[0]]
+
+
+def test_failed_conversion_is_retried(tree, scheduler):
+    _, _, paths = tree
+    scheduler.fail = {paths[0]}
+    summary = _sync(tree, scheduler)
+    assert [result[1] for result in summary['results']] == [False, True]
+    scheduler.converted()
+    scheduler.fail = set()
+    _sync(tree, scheduler)
+    assert scheduler.converted() == [paths[0]]
+
+
+def test_inputs_claiming_the_same_output_convert_once(tree, scheduler):
+    input_root, _, paths = tree
+    duplicate = os.path.join(input_root, 'a.tiff') # Sorts after a.png, which keeps the name
+    with open(duplicate, 'wb') as f:
+        f.write(b'photo')
+    summary = _sync(tree, scheduler)
+    assert scheduler.converted() == paths
+    assert summary['results'][0] == (duplicate, False, "Skipped: another input in this folder already converts to a.webp")
@@ -0,0 +1,37 @@
+import os
+
+from converter_core import DEDUP_PARTIAL_BYTES, find_duplicate_inputs
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_groups_identical_content_under_any_name(tmp_path):
+    first = _write(tmp_path / 'a.mp4', b'same content')
+    other = _write(tmp_path / 'b.mp4', b'different!!!') # Same size, different bytes
+    copy = _write(tmp_path / 'copy of a.mkv', b'same content')
+    assert find_duplicate_inputs([first, other, copy, first]) == [0, 1, 0, 0]
+
+
+def test_hard_links_are_duplicates(tmp_path):
+    first = _write(tmp_path / 'a.mp4', b'linked')
+    os.link(first, tmp_path / 'link.mp4')
+    assert find_duplicate_inputs([first, str(tmp_path / 'link.mp4')]) == [0, 0]
+
+
+def test_same_ends_different_middle_are_not_duplicates(tmp_path):
+    # The partial hash only reads the start and the end, so only the full hash can tell these apart
+    edge = b'x' * DEDUP_PARTIAL_BYTES
+    first = _write(tmp_path / 'a.mp4', edge + b'middle one' + edge)
+    second = _write(tmp_path / 'b.mp4', edge + b'middle two' + edge)
+    third = _write(tmp_path / 'c.mp4', edge + b'middle one' + edge)
+    assert find_duplicate_inputs([first, second, third]) == [0, 1, 0]
+
+
+def test_missing_and_empty_files_stay_separate(tmp_path):
+    missing = str(tmp_path / 'missing.mp4')
+    empty = _write(tmp_path / 'empty.mp4', b'')
+    also_empty = _write(tmp_path / 'also empty.mp4', b'')
+    assert find_duplicate_inputs([missing, missing, empty, also_empty]) == [0, 1, 2, 3]
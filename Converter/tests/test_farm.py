@@ -0,0 +1,200 @@
+import os
+import time
+import threading
+
+import pytest
+import requests
+
+import farm
+from farm import FarmCoordinator, FarmWorker
+
+
+@pytest.fixture
+def input_root(tmp_path):
+    root = tmp_path / 'inputs'
+    root.mkdir()
+    (root / 'clip.mp4').write_bytes(b'input data')
+    return root
+
+
+@pytest.fixture
+def coordinator(tmp_path, input_root):
+    with FarmCoordinator(str(tmp_path / 'outputs'), port=0, input_root=str(input_root)) as coordinator:
+        yield coordinator
+
+
+def test_refuses_public_host_without_token(tmp_path):
+    with pytest.raises(ValueError):
+        FarmCoordinator(str(tmp_path), host='0.0.0.0', port=0)
+    with pytest.raises(ValueError):
+        FarmCoordinator(str(tmp_path), host='', port=0)
+
+
+def test_loopback_host_needs_no_token(tmp_path):
+    FarmCoordinator(str(tmp_path), host='localhost', port=0).server.server_close()
+    FarmCoordinator(str(tmp_path), host='0.0.0.0', port=0, token='secret').server.server_close()
+
+
+def test_requests_need_the_token(tmp_path):
+    with FarmCoordinator(str(tmp_path / 'outputs'), port=0, token='secret') as coordinator:
+        url = f"{coordinator.url}/jobs"
+        assert requests.get(url, timeout=5).status_code == 401
+        assert requests.get(url, headers={'Authorization': 'Bearer wrong'}, timeout=5).status_code == 401
+        assert requests.get(url, headers={'Authorization': 'Bearer sécret'.encode('utf-8')}, timeout=5).status_code == 401
+        assert requests.get(url, headers={'Authorization': 'Bearer secret'}, timeout=5).status_code == 200
+
+
+def test_submit_accepts_inputs_below_root(coordinator, input_root):
+    job_id = coordinator.submit(str(input_root / 'clip.mp4'), 'WEBM')
+    assert coordinator.jobs[job_id]['output_format'] == 'webm'
+
+
+def test_submit_rejects_inputs_outside_root(coordinator, tmp_path, input_root):
+    outside = tmp_path / 'secret.txt'
+    outside.write_bytes(b'not yours')
+    with pytest.raises(ValueError):
+        coordinator.submit(str(outside), 'mp4')
+    with pytest.raises(ValueError):
+        coordinator.submit(str(input_root / '..' / 'secret.txt'), 'mp4')
+    os.symlink(outside, input_root / 'link.mp4')
+    with pytest.raises(ValueError):
+        coordinator.submit(str(input_root / 'link.mp4'), 'mp4')
+
+
+@pytest.mark.parametrize('output_format', ['../../x', 'mp4/../../x', 'exe', '', 'psd', 'rmvb', 'dss']) # Last three are input-only
+def test_submit_rejects_unknown_output_formats(coordinator, input_root, output_format):
+    with pytest.raises(ValueError):
+        coordinator.submit(str(input_root / 'clip.mp4'), output_format)
+
+
+def test_http_submit_reports_rejections(coordinator, input_root):
+    response = requests.post(f"{coordinator.url}/jobs", json={'input_path': str(input_root / 'clip.mp4'),
+                                                             'output_format': '../x'}, timeout=5)
+    assert response.status_code == 400
+    assert not coordinator.jobs
+
+
+def _register(coordinator, slots=1):
+    response = requests.post(f"{coordinator.url}/workers", json={'name': 'test', 'slots': slots}, timeout=5)
+    return response.json()['worker_id']
+
+
+def _lease(coordinator, worker_id):
+    response = requests.post(f"{coordinator.url}/workers/{worker_id}/lease", timeout=5)
+    return response.json() if response.status_code == 200 else None
+
+
+def _upload(coordinator, job, data=b'output data'):
+    return requests.put(f"{coordinator.url}/jobs/{job['id']}/output", params={'lease': job['lease']}, data=data,
+                        timeout=5)
+
+
+def _wait_for_state(coordinator, job_id, state, timeout=5):
+    deadline = time.monotonic() + timeout
+    while coordinator.jobs[job_id]['state'] != state:
+        assert time.monotonic() < deadline, coordinator.jobs[job_id]
+        time.sleep(0.02)
+
+
+def test_expired_lease_is_requeued_and_stale_upload_rejected(tmp_path, input_root):
+    with FarmCoordinator(str(tmp_path / 'outputs'), port=0, lease_seconds=0.2,
+                         input_root=str(input_root)) as coordinator:
+        job_id = coordinator.submit(str(input_root / 'clip.mp4'), 'webm')
+        first_worker, second_worker = _register(coordinator), _register(coordinator)
+        first = _lease(coordinator, first_worker)
+        assert first['id'] == job_id
+        assert _lease(coordinator, second_worker) is None
+
+        _wait_for_state(coordinator, job_id, 'pending') # No heartbeat from the first worker
+        second = _lease(coordinator, second_worker)
+        assert second['id'] == job_id and second['lease'] != first['lease']
+        assert coordinator.jobs[job_id]['attempts'] == 2
+
+        assert _upload(coordinator, first, b'stale').status_code == 409
+        response = _upload(coordinator, second)
+        assert response.status_code == 200
+        output_path = response.json()['output']
+        assert output_path == str(tmp_path / 'outputs' / 'clip.webm')
+        with open(output_path, 'rb') as f:
+            assert f.read() == b'output data'
+        assert coordinator.wait(timeout=1) == [(str(input_root / 'clip.mp4'), True, output_path)]
+        assert [name for name in os.listdir(tmp_path / 'outputs')] == ['clip.webm'] # No '.part' left behind
+
+
+def test_job_fails_after_max_attempts(tmp_path, input_root):
+    with FarmCoordinator(str(tmp_path / 'outputs'), port=0, lease_seconds=0.1, max_attempts=2,
+                         input_root=str(input_root)) as coordinator:
+        job_id = coordinator.submit(str(input_root / 'clip.mp4'), 'mp3')
+        worker_id = _register(coordinator)
+        assert _lease(coordinator, worker_id)
+        _wait_for_state(coordinator, job_id, 'pending')
+        assert _lease(coordinator, worker_id)
+        _wait_for_state(coordinator, job_id, 'failed')
+        assert 'Lease expired' in coordinator.jobs[job_id]['message']
+
+
+def test_heartbeat_keeps_lease(tmp_path, input_root):
+    with FarmCoordinator(str(tmp_path / 'outputs'), port=0, lease_seconds=0.3,
+                         input_root=str(input_root)) as coordinator:
+        job_id = coordinator.submit(str(input_root / 'clip.mp4'), 'webm')
+        worker_id = _register(coordinator)
+        job = _lease(coordinator, worker_id)
+        for _ in range(6):
+            time.sleep(0.1)
+            requests.post(f"{coordinator.url}/workers/{worker_id}/heartbeat", timeout=5).raise_for_status()
+        assert coordinator.jobs[job_id]['state'] == 'running'
+        assert _upload(coordinator, job).status_code == 200
+
+
+class _FakeConverter:
+    """
+    Stands in for converter_core.Converter: "converts" by copying the input with a marker prefix.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def convert(self, input_path, output_directory, output_format, **options):
+        os.makedirs(output_directory, exist_ok=True)
+        output_path = os.path.join(output_directory, f"result.{output_format}")
+        with open(input_path, 'rb') as source, open(output_path, 'wb') as target:
+            target.write(b'converted:' + source.read())
+        return True, output_path
+
+
+def test_worker_converts_and_uploads(tmp_path, input_root, monkeypatch):
+    monkeypatch.setattr(farm, 'Converter', _FakeConverter)
+    monkeypatch.setattr(farm, 'FARM_POLL_SECONDS', 0.05)
+    (input_root / 'other.mp4').write_bytes(b'more input')
+    with FarmCoordinator(str(tmp_path / 'outputs'), port=0, token='secret',
+                         input_root=str(input_root)) as coordinator:
+        coordinator.submit(str(input_root / 'clip.mp4'), 'webm')
+        coordinator.submit(str(input_root / 'other.mp4'), 'mkv')
+        worker = FarmWorker(coordinator.url, slots=2, token='secret', scratch_dir=str(tmp_path / 'scratch'))
+        thread = threading.Thread(target=worker.run, daemon=True)
+        thread.start()
+        try:
+            results = coordinator.wait(timeout=10)
+        finally:
+            worker.stop()
+            thread.join(timeout=5)
+    assert [success for _, success, _ in results] == [True, True]
+    with open(tmp_path / 'outputs' / 'clip.webm', 'rb') as f:
+        assert f.read() == b'converted:input data'
+    with open(tmp_path / 'outputs' / 'other.mkv', 'rb') as f:
+        assert f.read() == b'converted:more input'
+    assert not os.listdir(tmp_path / 'scratch')
+
+
+def test_worker_threads_get_their_own_session():
+    worker = FarmWorker('http://127.0.0.1:1', token='secret')
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(worker.http))
+    thread.start()
+    thread.join()
+    assert worker.http is worker.http
+    assert sessions[0] is not worker.http
+    assert sessions[0].headers['Authorization'] == worker.http.headers['Authorization'] == 'Bearer secret'
@@ -0,0 +1,31 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import converter_core
+from converter_core import _gif_palette
+
+pytestmark = pytest.mark.skipif(not shutil.which('ffmpeg'), reason="needs ffmpeg")
+
+
+@pytest.fixture(scope='module')
+def source(tmp_path_factory):
+    path = tmp_path_factory.mktemp('source') / 'source.mp4'
+    subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=size=64x48:rate=10:duration=2',
+                    '-pix_fmt', 'yuv420p', str(path)], check=True)
+    return str(path)
+
+
+def test_palette_cache_keeps_the_most_recently_used(source, tmp_path, monkeypatch):
+    monkeypatch.setattr(converter_core, 'GIF_PALETTE_CACHE_MAX_FILES', 2)
+    cache_dir = str(tmp_path)
+    palettes = {}
+    for colors in (16, 32, 64):
+        palettes[colors] = _gif_palette(source, 10, colors, [], [], cache_dir)
+        if colors == 32:
+            os.utime(palettes[16], ns=(0, 0)) # Used long ago...
+            assert _gif_palette(source, 10, 16, [], [], cache_dir) == palettes[16] # ...until this hit
+            os.utime(palettes[32], ns=(0, 0))
+    assert sorted(os.listdir(cache_dir)) == sorted(os.path.basename(palettes[colors]) for colors in (16, 64))
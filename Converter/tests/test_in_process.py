@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+av = pytest.importorskip('av')
+
+import converter_core
+from converter_core import IMAGE_SPEED_TIERS, build_ffmpeg_command, convert_media, _convert_in_process
+
+# Output format -> encoder the file must be written with
+FORMATS = {'webp': 'webp', 'png': 'png', 'tiff': 'tiff', 'jpg': 'mjpeg'}
+
+
+def _write_image(path, width=64, height=48, frames=1):
+    with av.open(str(path), mode='w', format='apng' if frames > 1 else 'image2') as container:
+        stream = container.add_stream('apng' if frames > 1 else 'png', rate=10)
+        stream.width, stream.height, stream.pix_fmt = width, height, 'rgb24'
+        for index in range(frames):
+            frame = av.VideoFrame(width, height, 'rgb24')
+            frame.pts = index
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return str(path)
+
+
+@pytest.fixture
+def image(tmp_path):
+    return _write_image(tmp_path / 'input.png')
+
+
+@pytest.fixture
+def no_ffmpeg(monkeypatch):
+    # Any fallback to the ffmpeg CLI fails the test
+    def run_child(command, *args, **kwargs):
+        raise AssertionError(f"ffmpeg was started: {command}")
+    monkeypatch.setattr(converter_core, '_run_child', run_child)
+
+
+@pytest.mark.parametrize('tier', IMAGE_SPEED_TIERS)
+@pytest.mark.parametrize('output_format', sorted(FORMATS))
+def test_every_tier_converts_in_process(image, tmp_path, no_ffmpeg, output_format, tier):
+    success, output_path = convert_media(image, str(tmp_path / 'out'), output_format, image_speed_tier=tier)
+    assert success, output_path
+    with av.open(output_path) as container:
+        stream = container.streams.video[0]
+        assert stream.codec_context.name == FORMATS[output_format]
+        assert (stream.codec_context.width, stream.codec_context.height) == (64, 48)
+
+
+def test_jpeg_gets_full_range_like_ffmpeg(image, tmp_path):
+    output_path = str(tmp_path / 'out.jpg')
+    assert _convert_in_process(build_ffmpeg_command(image, output_path, 'jpg', image_speed_tier='balanced'))
+    with av.open(output_path) as container:
+        assert container.streams.video[0].codec_context.pix_fmt.startswith('yuvj')
+
+
+def test_scaling_runs_in_process(image, tmp_path, no_ffmpeg):
+    success, output_path = convert_media(image, str(tmp_path), 'webp', scale_width=32, image_speed_tier='fast')
+    assert success, output_path
+    with av.open(output_path) as container:
+        assert container.streams.video[0].codec_context.width == 32
+
+
+@pytest.mark.parametrize('command_options', [
+    ['-metadata', 'title=x'], # Not an option the in-process backend knows
+    ['-frames:v', '1'],
+])
+def test_unknown_options_are_handed_back(image, tmp_path, command_options):
+    output_path = str(tmp_path / 'out.png')
+    command = build_ffmpeg_command(image, output_path, 'png', image_speed_tier='fast')
+    command[-1:-1] = command_options
+    assert _convert_in_process(command) is False
+    assert not os.path.exists(output_path)
+
+
+def test_animated_input_is_handed_back(tmp_path):
+    animation = _write_image(tmp_path / 'input.apng', frames=3)
+    output_path = str(tmp_path / 'out.webp')
+    assert _convert_in_process(build_ffmpeg_command(animation, output_path, 'webp', image_speed_tier='fast')) is False
+    assert not os.path.exists(output_path)
+
+
+def test_missing_encoder_is_handed_back(image, tmp_path):
+    command = build_ffmpeg_command(image, str(tmp_path / 'out.png'), 'png', image_speed_tier='fast')
+    command[command.index('-c:v') + 1] = 'no-such-encoder'
+    assert _convert_in_process(command) is False
@@ -0,0 +1,45 @@
+from converter_core import parse_url_list
+
+
+def test_separators():
+    text = "https://a.example/1, webm\nhttps://a.example/2\twebm\nhttps://a.example/3   webm\nhttps://a.example/4"
+    entries, invalid = parse_url_list(text, 'video')
+    assert entries == [('https://a.example/1', 'webm'), ('https://a.example/2', 'webm'),
+                       ('https://a.example/3', 'webm'), ('https://a.example/4', None)]
+    assert invalid == []
+
+
+def test_csv_export_with_header_quotes_and_comments():
+    text = '\n'.join([
+        'url,format',
+        '# exported playlist',
+        '',
+        '"https://a.example/watch?v=1&t=2",MP4',
+        'https://a.example/2,.mkv',
+        'https://a.example/3,',
+    ])
+    entries, invalid = parse_url_list(text, 'video')
+    assert entries == [('https://a.example/watch?v=1&t=2', 'mp4'), ('https://a.example/2', 'mkv'),
+                       ('https://a.example/3', None)]
+    assert invalid == []
+
+
+def test_invalid_lines_are_reported_with_their_line_numbers():
+    text = '\n'.join([
+        'https://a.example/1, exe', # Not an output format at all
+        'https://a.example/2, mp3', # An audio format in video mode
+        'https://a.example/3, psd', # Readable, but ffmpeg can't write it
+        'ftp://a.example/4',
+        'not a url',
+        'https://a.example/5, webm',
+    ])
+    entries, invalid = parse_url_list(text, 'video')
+    assert entries == [('https://a.example/5', 'webm')]
+    assert [line_number for line_number, _ in invalid] == [1, 2, 3, 4, 5]
+    assert invalid[0] == (1, 'https://a.example/1, exe')
+
+
+def test_without_a_mode_any_output_format_is_accepted():
+    entries, invalid = parse_url_list("https://a.example/1, mp3\nhttps://a.example/2, webp\nhttps://a.example/3, exe")
+    assert entries == [('https://a.example/1', 'mp3'), ('https://a.example/2', 'webp')]
+    assert invalid == [(3, 'https://a.example/3, exe')]
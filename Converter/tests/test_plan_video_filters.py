@@ -0,0 +1,66 @@
+import pytest
+
+from converter_core import plan_video_filters
+
+
+def test_no_request_means_no_filters():
+    assert plan_video_filters('mp4') == []
+    assert plan_video_filters('mp4', scale_percentage=100) == []
+
+
+@pytest.mark.parametrize('output_format, scale', [
+    ('mp4', "scale=640:360"), # Video encoders need even dimensions
+    ('png', "scale=641:361"),
+])
+def test_fixed_size_is_even_for_video_only(output_format, scale):
+    assert plan_video_filters(output_format, scale_width=641, scale_height=361) == [scale]
+
+
+def test_relative_scale_is_even_for_video_only():
+    assert plan_video_filters('webm', scale_percentage=50) == ["scale=w='trunc(iw*0.5/2)*2':h='trunc(ih*0.5/2)*2'"]
+    assert plan_video_filters('webp', scale_width=320) == ["scale=w='trunc(iw*320/iw)':h='trunc(ih*320/iw)'"]
+
+
+def test_bounding_box_caps_a_fixed_size():
+    assert plan_video_filters('mp4', scale_width=3840, scale_height=2160, bounding_box=(1920, 1080)) == \
+        ["scale=1920:1080"]
+    # Already inside the box: left alone rather than grown to fill it
+    assert plan_video_filters('mp4', scale_width=640, scale_height=480, bounding_box=(1920, 1080)) == \
+        ["scale=640:480"]
+
+
+def test_bounding_box_never_upscales():
+    factor = "min(1280/iw,min(720/ih,1))"
+    assert plan_video_filters('mp4', bounding_box=(1280, 720)) == \
+        [f"scale=w='trunc(iw*{factor}/2)*2':h='trunc(ih*{factor}/2)*2'"]
+    factor = "min(2.0,min(1280/iw,min(720/ih,1)))"
+    assert plan_video_filters('png', scale_percentage=200, bounding_box=(1280, 720)) == \
+        [f"scale=w='trunc(iw*{factor})':h='trunc(ih*{factor})'"]
+
+
+def test_extra_scale_and_scaler():
+    assert plan_video_filters('png', scale_width=400, scale_height=300, extra_scale=0.5, scaler='bicubic') == \
+        ["scale=200:150:flags=bicubic"]
+    with pytest.raises(ValueError):
+        plan_video_filters('png', scaler='nearest-ish')
+
+
+def test_frame_filters_run_before_the_scale():
+    filters = plan_video_filters('mp4', scale_percentage=50, extra_filters=['hqdn3d', 'fps=10', 'select=not(mod(n\\,2))'])
+    assert filters[:2] == ['fps=10', 'select=not(mod(n\\,2))']
+    assert filters[2].startswith('scale=') and filters[3] == 'hqdn3d'
+
+
+def test_known_upscale_runs_after_the_other_filters():
+    filters = plan_video_filters('mp4', scale_percentage=200, extra_filters=['hqdn3d', 'fps=10'])
+    assert filters[:2] == ['fps=10', 'hqdn3d'] and filters[2].startswith('scale=')
+
+
+def test_width_alone_is_treated_as_a_downscale():
+    # The input size isn't known here, so even a large width scales first (see the docstring)
+    filters = plan_video_filters('mp4', scale_width=3840, extra_filters=['hqdn3d'])
+    assert filters[0].startswith('scale=') and filters[1] == 'hqdn3d'
+
+
+def test_duplicate_filters_are_dropped():
+    assert plan_video_filters('mp4', extra_filters=['fps=10', 'hqdn3d', 'fps=10', 'hqdn3d']) == ['fps=10', 'hqdn3d']
@@ -0,0 +1,88 @@
+import sys
+import threading
+import time
+
+import pytest
+
+import converter_core
+
+
+def _process_state(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        return f.read().rsplit(') ', 1)[1][0]
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def lanes(monkeypatch):
+    lanes = converter_core.PriorityLanes()
+    monkeypatch.setattr(converter_core, 'priority_lanes', lanes)
+    monkeypatch.setattr(converter_core, 'PREEMPTED_PROGRAMS', ('sleep', 'true'))
+    return lanes
+
+
+def _run_bulk(command, results):
+    with converter_core.job_priority('bulk'):
+        results.append(converter_core._run_child(command).returncode)
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        with converter_core.job_priority('urgent'):
+            pass
+
+
+def test_nested_bulk_child_does_not_wait_for_its_own_interactive_lane(lanes):
+    results = []
+    worker = threading.Thread(target=lambda: _nested(results), daemon=True)
+    worker.start()
+    worker.join(timeout=5)
+    assert not worker.is_alive(), "a bulk child inside the thread's own interactive lane deadlocked"
+    assert results == [0]
+
+
+def _nested(results):
+    with converter_core.job_priority('interactive'):
+        _run_bulk(['true'], results)
+
+
+def test_bulk_child_waits_for_interactive_job_of_another_thread(lanes):
+    results = []
+    release = threading.Event()
+
+    def interactive():
+        with converter_core.job_priority('interactive'):
+            release.wait()
+
+    holder = threading.Thread(target=interactive, daemon=True)
+    holder.start()
+    _wait_for(lambda: lanes.interactive_jobs == 1)
+    worker = threading.Thread(target=_run_bulk, args=(['true'], results), daemon=True)
+    worker.start()
+    time.sleep(0.3)
+    assert results == [] # Held back while the other thread's interactive job runs
+    release.set()
+    worker.join(timeout=5)
+    assert results == [0]
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="reads process states from /proc")
+def test_running_bulk_child_is_paused_and_resumed(lanes):
+    results = []
+    worker = threading.Thread(target=_run_bulk, args=(['sleep', '1'], results), daemon=True)
+    worker.start()
+    _wait_for(lambda: lanes._bulk_children)
+    process = next(iter(lanes._bulk_children))
+    with converter_core.job_priority('interactive'):
+        _wait_for(lambda: _process_state(process.pid) == 'T')
+    _wait_for(lambda: process.returncode is not None or _process_state(process.pid) != 'T')
+    worker.join(timeout=5)
+    assert results == [0]
+    assert not lanes._bulk_children
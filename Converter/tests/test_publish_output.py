@@ -0,0 +1,62 @@
+import os
+import threading
+
+from converter_core import output_part_path, publish_output
+
+
+def _part(final_path, data):
+    part_path = output_part_path(final_path)
+    with open(part_path, 'wb') as f:
+        f.write(data)
+    return part_path
+
+
+def test_part_path_is_hidden_and_keeps_the_extension(tmp_path):
+    final_path = str(tmp_path / 'out.mp4')
+    part_path = output_part_path(final_path)
+    assert os.path.dirname(part_path) == str(tmp_path)
+    assert os.path.basename(part_path).startswith('.out.')
+    assert part_path.endswith('.part.mp4')
+    assert output_part_path(final_path) != part_path
+
+
+def test_publish_takes_the_free_name(tmp_path):
+    final_path = str(tmp_path / 'out.mp4')
+    part_path = _part(final_path, b'new')
+    assert publish_output(part_path, final_path) == final_path
+    assert not os.path.exists(part_path)
+    with open(final_path, 'rb') as f:
+        assert f.read() == b'new'
+
+
+def test_publish_without_overwrite_numbers_the_name(tmp_path):
+    final_path = str(tmp_path / 'out.mp4')
+    (tmp_path / 'out.mp4').write_bytes(b'old')
+    assert publish_output(_part(final_path, b'one'), final_path) == str(tmp_path / 'out (1).mp4')
+    assert publish_output(_part(final_path, b'two'), final_path) == str(tmp_path / 'out (2).mp4')
+    assert (tmp_path / 'out.mp4').read_bytes() == b'old'
+    assert (tmp_path / 'out (1).mp4').read_bytes() == b'one'
+    assert sorted(os.listdir(tmp_path)) == ['out (1).mp4', 'out (2).mp4', 'out.mp4']
+
+
+def test_publish_with_overwrite_replaces(tmp_path):
+    final_path = str(tmp_path / 'out.mp4')
+    (tmp_path / 'out.mp4').write_bytes(b'old')
+    assert publish_output(_part(final_path, b'new'), final_path, overwrite=True) == final_path
+    assert (tmp_path / 'out.mp4').read_bytes() == b'new'
+    assert os.listdir(tmp_path) == ['out.mp4']
+
+
+def test_concurrent_publishes_get_distinct_names(tmp_path):
+    final_path = str(tmp_path / 'out.mp4')
+    parts = [_part(final_path, str(index).encode()) for index in range(8)]
+    published = []
+    threads = [threading.Thread(target=lambda part_path=part_path: published.append(publish_output(part_path, final_path)))
+               for part_path in parts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(published)) == 8
+    assert sorted((tmp_path / name).read_bytes() for name in os.listdir(tmp_path)) == \
+        sorted(str(index).encode() for index in range(8))
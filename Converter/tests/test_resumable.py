@@ -0,0 +1,123 @@
+import os
+import json
+import subprocess
+
+import pytest
+
+import converter_core
+from converter_core import convert_media
+
+SEGMENT_SECONDS = 10
+
+
+class FakeEncoder:
+    """
+    Stands in for _run_child and probe_media: a 40 second video with audio, and ffmpeg commands
+    that write their last argument. crash_at makes the command whose output contains that text fail.
+    """
+
+    def __init__(self):
+        self.outputs = []
+        self.crash_at = None
+
+    def probe_media(self, input_path):
+        return True, {'streams': [{'codec_type': 'video', 'codec_name': 'h264'}, {'codec_type': 'audio'}],
+                      'format': {'duration': '40.0'}}
+
+    def run_child(self, command, *args, **kwargs):
+        output_path = command[-1]
+        if self.crash_at and self.crash_at in os.path.basename(output_path):
+            raise subprocess.CalledProcessError(1, command, stderr="killed")
+        self.outputs.append(os.path.basename(output_path))
+        with open(output_path, 'wb') as f:
+            f.write(b'piece')
+
+    def encoded_segments(self):
+        return [name for name in self.outputs if name.startswith('partial_video_')]
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    encoder = FakeEncoder()
+    monkeypatch.setattr(converter_core, 'RESUMABLE_SEGMENT_SECONDS', SEGMENT_SECONDS)
+    monkeypatch.setattr(converter_core, 'probe_media', encoder.probe_media)
+    monkeypatch.setattr(converter_core, '_run_child', encoder.run_child)
+    return encoder
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'in.mp4'
+    path.write_bytes(b'video')
+    return str(path)
+
+
+def _convert(source, output_directory, **options):
+    return convert_media(source, output_directory, 'mp4', resumable=True, **options)
+
+
+def _checkpoint_dir(output_directory):
+    return os.path.join(output_directory, '.in.mp4.resume')
+
+
+def test_crash_keeps_finished_segments_in_the_manifest(tmp_path, source, encoder):
+    output_directory = str(tmp_path / 'out')
+    encoder.crash_at = 'video_00002'
+    success, message = _convert(source, output_directory, threads=1)
+    assert not success and 'run the conversion again to resume' in message
+
+    with open(os.path.join(_checkpoint_dir(output_directory), 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert manifest['done'] == {'video_00000.mp4': 5, 'video_00001.mp4': 5}
+    assert not os.path.exists(os.path.join(_checkpoint_dir(output_directory), 'manifest.json.tmp'))
+
+
+def test_resume_with_other_threads_reencodes_nothing_finished(tmp_path, source, encoder):
+    output_directory = str(tmp_path / 'out')
+    encoder.crash_at = 'video_00002'
+    _convert(source, output_directory, threads=1)
+
+    encoder.crash_at = None
+    encoder.outputs = []
+    success, output_path = _convert(source, output_directory, threads=2)
+    assert success, output_path
+    assert encoder.encoded_segments() == ['partial_video_00002.mp4', 'partial_video_00003.mp4']
+    assert 'partial_audio.mp4' in encoder.outputs
+    assert output_path == os.path.join(output_directory, 'in.mp4')
+    assert not os.path.exists(_checkpoint_dir(output_directory)) # Removed once the output is complete
+
+
+def test_changed_settings_discard_old_segments(tmp_path, source, encoder):
+    output_directory = str(tmp_path / 'out')
+    encoder.crash_at = 'video_00002'
+    _convert(source, output_directory, video_speed_tier='fast')
+
+    encoder.crash_at = 'video_00001'
+    encoder.outputs = []
+    _convert(source, output_directory, video_speed_tier='small')
+    # Segment 0 was encoded again, and segment 1 from the fast run is gone
+    assert encoder.encoded_segments() == ['partial_video_00000.mp4']
+    assert sorted(os.listdir(_checkpoint_dir(output_directory))) == ['manifest.json', 'video_00000.mp4']
+
+
+def test_damaged_segment_is_encoded_again(tmp_path, source, encoder):
+    output_directory = str(tmp_path / 'out')
+    encoder.crash_at = 'video_00002'
+    _convert(source, output_directory)
+    with open(os.path.join(_checkpoint_dir(output_directory), 'video_00001.mp4'), 'ab') as f:
+        f.write(b'garbage') # Size no longer matches the manifest
+
+    encoder.crash_at = None
+    encoder.outputs = []
+    assert _convert(source, output_directory)[0]
+    assert encoder.encoded_segments() == ['partial_video_00001.mp4', 'partial_video_00002.mp4',
+                                          'partial_video_00003.mp4']
+
+
+def test_short_inputs_run_in_one_pass(tmp_path, source, encoder, monkeypatch):
+    monkeypatch.setattr(converter_core, 'probe_media',
+                        lambda path: (True, {'streams': [{'codec_type': 'video'}], 'format': {'duration': '8.0'}}))
+    output_directory = str(tmp_path / 'out')
+    assert _convert(source, output_directory)[0]
+    assert encoder.encoded_segments() == []
+    assert not os.path.exists(_checkpoint_dir(output_directory))
@@ -0,0 +1,102 @@
+import time
+import threading
+
+import pytest
+
+import converter_core
+from converter_core import ConversionScheduler
+
+
+class FakeJobs:
+    """
+    Stands in for estimate_job_resources and convert_media: plans come from a table, and each
+    "conversion" sleeps briefly while the peak number of concurrent jobs is recorded.
+    """
+
+    def __init__(self, plans):
+        self.plans = plans
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.started = []
+        self.threads = {}
+
+    def estimate(self, input_path, output_format, **options):
+        return dict(self.plans[input_path])
+
+    def convert(self, input_path, output_directory, output_format, threads=None, usage=None, **options):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            self.started.append(input_path)
+            self.threads[input_path] = threads
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        if input_path.startswith('broken'):
+            raise RuntimeError("encoder crashed")
+        return True, f"{output_directory}/{input_path}.{output_format}"
+
+
+@pytest.fixture
+def fake_jobs(monkeypatch):
+    def install(plans):
+        fake = FakeJobs(plans)
+        monkeypatch.setattr(converter_core, 'estimate_job_resources', fake.estimate)
+        monkeypatch.setattr(converter_core, 'convert_media', fake.convert)
+        return fake
+    return install
+
+
+def _jobs(names, output_format='png'):
+    return [{'input_path': name, 'output_directory': 'out', 'output_format': output_format} for name in names]
+
+
+def _image(memory=1, cost=1.0):
+    return {'kind': 'image', 'memory': memory, 'cost': cost}
+
+
+def test_results_in_job_order_with_most_expensive_started_first(fake_jobs):
+    fake = fake_jobs({'cheap': _image(cost=1), 'costly': _image(cost=9), 'middle': _image(cost=5)})
+    results = ConversionScheduler(cores=1, memory_bytes=None).run(_jobs(['cheap', 'costly', 'middle']))
+    assert [result[0] for result in results] == ['cheap', 'costly', 'middle']
+    assert all(result[1] for result in results)
+    assert fake.started == ['costly', 'middle', 'cheap']
+    assert fake.peak == 1
+
+
+def test_admits_up_to_the_core_budget(fake_jobs):
+    fake = fake_jobs({f"image{index}": _image() for index in range(8)})
+    ConversionScheduler(cores=3, memory_bytes=None).run(_jobs([f"image{index}" for index in range(8)]))
+    assert fake.peak == 3
+
+
+def test_memory_budget_limits_concurrency(fake_jobs):
+    fake = fake_jobs({name: _image(memory=60) for name in ('a', 'b', 'c')})
+    results = ConversionScheduler(cores=8, memory_bytes=100).run(_jobs(['a', 'b', 'c']))
+    assert fake.peak == 1
+    assert all(result[1] for result in results)
+
+
+def test_job_over_budget_runs_alone(fake_jobs):
+    fake = fake_jobs({'huge': _image(memory=500, cost=9), 'small': _image(memory=10)})
+    results = ConversionScheduler(cores=8, memory_bytes=100).run(_jobs(['huge', 'small']))
+    assert all(result[1] for result in results)
+    assert fake.peak == 1
+
+
+def test_failed_job_releases_its_share(fake_jobs):
+    fake = fake_jobs({'broken': _image(memory=60, cost=9), 'a': _image(memory=60), 'b': _image(memory=60)})
+    results = ConversionScheduler(cores=8, memory_bytes=100).run(_jobs(['broken', 'a', 'b']))
+    assert results[0][1] is False and 'encoder crashed' in results[0][2]
+    assert results[1][1] and results[2][1]
+    assert fake.peak == 1
+
+
+def test_video_jobs_split_the_cores(fake_jobs):
+    video = {'kind': 'video', 'memory': 1, 'cost': 1.0}
+    fake = fake_jobs({name: dict(video) for name in ('a', 'b', 'c')})
+    ConversionScheduler(cores=4 * converter_core.VIDEO_MIN_THREADS, memory_bytes=None).run(_jobs(['a', 'b', 'c'], 'mp4'))
+    expected = 4 * converter_core.VIDEO_MIN_THREADS // 3
+    assert fake.threads == {'a': expected, 'b': expected, 'c': expected}
+    assert fake.peak == 3
@@ -0,0 +1,36 @@
+import shutil
+import subprocess
+
+import pytest
+
+from converter_core import convert_media, probe_media
+
+pytestmark = pytest.mark.skipif(not (shutil.which('ffmpeg') and shutil.which('ffprobe')),
+                                reason="needs ffmpeg and ffprobe")
+
+
+@pytest.fixture(scope='module')
+def source(tmp_path_factory):
+    # 6 seconds with a keyframe every 2 seconds, plus an audio track
+    path = tmp_path_factory.mktemp('source') / 'source.webm'
+    subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=25:duration=6',
+                    '-f', 'lavfi', '-i', 'sine=frequency=440:duration=6', '-c:v', 'libvpx-vp9', '-g', '50',
+                    '-keyint_min', '50', '-deadline', 'realtime', '-c:a', 'libopus', '-shortest', str(path)], check=True)
+    return str(path)
+
+
+def _stream_types(path):
+    success, info = probe_media(path)
+    assert success, info
+    return sorted(stream['codec_type'] for stream in info['streams'])
+
+
+@pytest.mark.parametrize('start, end', [
+    (0.5, 1.5), # No keyframe inside: the whole clip is re-encoded
+    (1.0, 5.0), # Edges re-encoded, the GOP in between copied
+    (2.0, 4.0), # On keyframes: plain copy
+])
+def test_clip_keeps_audio(source, tmp_path, start, end):
+    success, output_path = convert_media(source, str(tmp_path), 'webm', start_time=start, end_time=end)
+    assert success, output_path
+    assert _stream_types(output_path) == ['audio', 'video']
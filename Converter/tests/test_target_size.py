@@ -0,0 +1,99 @@
+import pytest
+
+import converter_core
+from converter_core import TARGET_SIZE_MIN_VIDEO_BITRATE, TARGET_SIZE_TOLERANCE, \
+    _corrected_target_bitrate, _plan_target_bitrate
+
+AUDIO_RATE = 128_000 # bits/s the fake audio samples come out at
+OVERSHOOT = 1.2 # The fake encoder's video comes out this much above the requested bitrate
+
+
+class FakeSamples:
+    """
+    Stands in for probe_media and preview_conversion: a 100 second input, audio samples at
+    AUDIO_RATE and video samples OVERSHOOT times the requested bitrate.
+    """
+
+    def __init__(self, has_audio=True):
+        self.has_audio = has_audio
+        self.calls = []
+
+    def probe_media(self, input_path):
+        streams = [{'codec_type': 'video'}] + ([{'codec_type': 'audio'}] if self.has_audio else [])
+        return True, {'streams': streams, 'format': {'duration': '100.0'}}
+
+    def preview_conversion(self, input_path, output_format, sample_count=None, sample_seconds=None, **options):
+        self.calls.append(options)
+        seconds = sample_count * sample_seconds
+        audio_rate = AUDIO_RATE if self.has_audio else 0
+        rate = audio_rate if options.get('audio_only') else OVERSHOOT * options['video_bitrate'] + audio_rate
+        return True, {'sample_bytes': rate * seconds / 8, 'sampled_seconds': seconds}
+
+
+@pytest.fixture
+def samples(monkeypatch):
+    def install(has_audio=True):
+        fake = FakeSamples(has_audio)
+        monkeypatch.setattr(converter_core, 'probe_media', fake.probe_media)
+        monkeypatch.setattr(converter_core, 'preview_conversion', fake.preview_conversion)
+        return fake
+    return install
+
+
+def _plan(target_size, start_time=None, duration=None):
+    return _plan_target_bitrate('in.mp4', 'mp4', target_size, {'video_speed_tier': 'fast'}, start_time, duration)
+
+
+def test_plan_leaves_room_for_audio_and_corrects_for_the_encoder(samples):
+    fake = samples()
+    success, plan = _plan(10_000_000) # 800 kbit/s over 100 seconds
+    assert success, plan
+    first_guess = 800_000 - AUDIO_RATE
+    assert fake.calls[0]['audio_only'] is True
+    assert fake.calls[1]['video_bitrate'] == pytest.approx(first_guess)
+    assert fake.calls[1]['video_speed_tier'] == 'fast' # Samples use the job's settings
+    assert plan['video_bitrate'] == pytest.approx(first_guess / OVERSHOOT)
+    assert plan['audio_rate'] == pytest.approx(AUDIO_RATE)
+    assert plan['duration'] == 100
+
+
+def test_plan_uses_the_clip_length(samples):
+    samples(has_audio=False)
+    success, plan = _plan(1_000_000, start_time=90.0, duration=20.0) # Only 10 seconds are left
+    assert success, plan
+    assert plan['duration'] == 10
+    assert plan['video_bitrate'] == pytest.approx(800_000 / OVERSHOOT)
+
+
+def test_plan_refuses_targets_the_audio_already_fills(samples):
+    samples()
+    success, message = _plan(int((AUDIO_RATE + TARGET_SIZE_MIN_VIDEO_BITRATE - 1) * 100 / 8))
+    assert not success and 'too small' in message
+
+
+PLAN = {'video_bitrate': 560_000, 'audio_rate': AUDIO_RATE, 'duration': 100}
+TARGET = 10_000_000
+
+
+def _corrected(tmp_path, actual_size, plan=PLAN):
+    output_path = tmp_path / 'out.mp4'
+    output_path.write_bytes(b'\0' * actual_size)
+    return _corrected_target_bitrate(str(output_path), TARGET, plan)
+
+
+@pytest.mark.parametrize('miss', [0, 0.5 * TARGET_SIZE_TOLERANCE, -0.99 * TARGET_SIZE_TOLERANCE, TARGET_SIZE_TOLERANCE])
+def test_no_correction_within_tolerance(tmp_path, miss):
+    assert _corrected(tmp_path, int(TARGET * (1 + miss))) is None
+
+
+def test_correction_scales_only_the_video(tmp_path):
+    actual_size = int(TARGET * (1 + 2 * TARGET_SIZE_TOLERANCE)) # 10% over
+    wanted_video = TARGET * 8 / 100 - AUDIO_RATE
+    actual_video = actual_size * 8 / 100 - AUDIO_RATE
+    assert _corrected(tmp_path, actual_size) == pytest.approx(560_000 * wanted_video / actual_video)
+    assert _corrected(tmp_path, int(TARGET * (1 - 2 * TARGET_SIZE_TOLERANCE))) > 560_000 # Under target: more bits
+
+
+def test_no_correction_at_the_minimum_bitrate(tmp_path):
+    plan = dict(PLAN, video_bitrate=TARGET_SIZE_MIN_VIDEO_BITRATE)
+    assert _corrected(tmp_path, int(TARGET * 1.5), plan) is None
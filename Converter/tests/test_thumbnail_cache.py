@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+import converter_core
+from converter_core import thumbnail
+
+Image = pytest.importorskip('PIL.Image')
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for index in range(4):
+        path = tmp_path / f"image{index}.png"
+        Image.new('RGB', (64, 48), (index * 60, 0, 0)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def _age(cache_dir, seconds):
+    # Makes every cached file look older, so the next writes and hits sort after them
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - seconds * 1_000_000_000))
+
+
+def test_cache_keeps_the_most_recently_used(tmp_path, images, monkeypatch):
+    monkeypatch.setattr(converter_core, 'THUMBNAIL_CACHE_MAX_FILES', 2)
+    cache_dir = str(tmp_path / 'cache')
+    first = thumbnail(images[0], size=(32, 24), cache_dir=cache_dir)[1]
+    _age(cache_dir, 30)
+    second = thumbnail(images[1], size=(32, 24), cache_dir=cache_dir)[1]
+    _age(cache_dir, 30)
+    assert thumbnail(images[0], size=(32, 24), cache_dir=cache_dir) == (True, first) # A hit refreshes it
+    _age(cache_dir, 30)
+
+    third = thumbnail(images[2], size=(32, 24), cache_dir=cache_dir)[1]
+    assert sorted(os.listdir(cache_dir)) == sorted(os.path.basename(path) for path in (first, third))
+    assert not os.path.exists(second)
+
+
+def test_cache_size_limit(tmp_path, images, monkeypatch):
+    monkeypatch.setattr(converter_core, 'THUMBNAIL_CACHE_MAX_BYTES', 1) # Only the newest thumbnail survives
+    cache_dir = str(tmp_path / 'cache')
+    for path in images:
+        success, thumb_path = thumbnail(path, size=(32, 24), cache_dir=cache_dir)
+        assert success and os.path.exists(thumb_path)
+        _age(cache_dir, 30)
+    assert len(os.listdir(cache_dir)) == 1